@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the training pipeline on a synthetic, offline dataset
+
+Generates a JPEG corpus locally, serves stand-ins for the Unsplash and
+Pexels search APIs from a local HTTP stub, and times each stage:
+
+  download        download_food_images.py against the stub (no rate-limit sleeps)
+  organize        collect_images.organize_images
+  scan            scan_dataset, cold and with a warm scan cache
+  input_pipeline  training generator throughput (decode + augmentation)
+  train_steps     a few training steps (random-init backbone, no weight download)
+  convert         convert_to_tflite with quantization
+  inference       TFLite single-image latency
+
+Results are written as JSON; pass a previous results file with --baseline to
+flag stages that got slower. Stages whose dependencies are missing (e.g.
+TensorFlow) are recorded as skipped.
+
+Usage:
+    python benchmark_pipeline.py --output benchmark_results.json
+    python benchmark_pipeline.py --classes 10 --images 100 --image-size 1920x1080
+    python benchmark_pipeline.py --baseline benchmark_results.json --tolerance 0.25
+"""
+import io
+import os
+import sys
+import json
+import time
+import struct
+import zlib
+import argparse
+import platform
+import tempfile
+import threading
+import contextlib
+import subprocess
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+RESULTS_VERSION = 1
+
+
+def parse_sizes(value: str) -> List[Tuple[int, int]]:
+    """Parse 'WxH[,WxH...]'"""
+    try:
+        sizes = [tuple(int(part) for part in item.lower().split('x')) for item in value.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WxH[,WxH...], got '{value}'")
+    if any(len(size) != 2 or min(size) <= 0 for size in sizes):
+        raise argparse.ArgumentTypeError(f"expected WxH[,WxH...], got '{value}'")
+    return sizes
+
+
+def synthetic_jpeg(size: Tuple[int, int], colour: Tuple[int, int, int], quality: int = 85) -> bytes:
+    """A flat colour blended with random noise, so every image has unique content"""
+    noise = Image.effect_noise(size, 60).convert('RGB')
+    image = Image.blend(Image.new('RGB', size, colour), noise, 0.35)
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def make_corpus(root: str, classes: int, images_per_class: int,
+                sizes: List[Tuple[int, int]]) -> Dict[str, int]:
+    """Write root/<class>/<n>.jpg; returns image count and total bytes"""
+    total_bytes = 0
+    for class_idx in range(classes):
+        class_dir = os.path.join(root, f'food_{class_idx:03d}')
+        os.makedirs(class_dir, exist_ok=True)
+        colour = ((class_idx * 67) % 256, (class_idx * 131) % 256, (class_idx * 29) % 256)
+        for image_idx in range(images_per_class):
+            data = synthetic_jpeg(sizes[image_idx % len(sizes)], colour)
+            with open(os.path.join(class_dir, f'{image_idx:05d}.jpg'), 'wb') as f:
+                f.write(data)
+            total_bytes += len(data)
+    return {'images': classes * images_per_class, 'bytes': total_bytes}
+
+
+class StubImageAPI:
+    """
+    Local stand-in for the Unsplash and Pexels search APIs
+
+    Search responses point at /images/<id>.jpg on the same server. Image
+    bodies come from a small pool of pre-encoded JPEGs with the photo id
+    written into a comment segment, so every photo has distinct bytes and
+    survives duplicate detection.
+    """
+
+    def __init__(self, image_size: Tuple[int, int] = (1080, 720), pool_size: int = 8):
+        self.pool = [synthetic_jpeg(image_size, (120 + i * 10, 80, 40)) for i in range(pool_size)]
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def image_bytes(self, photo_id: str) -> bytes:
+        data = self.pool[zlib.crc32(photo_id.encode()) % len(self.pool)]
+        comment = photo_id.encode()
+        return data[:2] + b'\xff\xfe' + struct.pack('>H', len(comment) + 2) + comment + data[2:]
+
+    def _search(self, source: str, params: Dict[str, List[str]]) -> Dict:
+        query = params.get('query', [''])[0]
+        page = int(params.get('page', ['1'])[0])
+        per_page = int(params.get('per_page', ['10'])[0])
+        prefix = f"{source}-{zlib.crc32(query.encode()):08x}-{page}"
+        ids = [f"{prefix}-{i}" for i in range(per_page)]
+        if source == 'unsplash':
+            return {'results': [{'id': photo_id, 'urls': {'regular': f'{self.base_url}/images/{photo_id}.jpg'}}
+                                for photo_id in ids]}
+        return {'photos': [{'id': photo_id, 'src': {'large': f'{self.base_url}/images/{photo_id}.jpg'}}
+                           for photo_id in ids]}
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = parse_qs(url.query)
+                if url.path == '/search/photos':
+                    body, content_type = json.dumps(stub._search('unsplash', params)).encode(), 'application/json'
+                elif url.path == '/v1/search':
+                    body, content_type = json.dumps(stub._search('pexels', params)).encode(), 'application/json'
+                elif url.path.startswith('/images/'):
+                    body, content_type = stub.image_bytes(url.path[len('/images/'):-len('.jpg')]), 'image/jpeg'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with stub.lock:
+                    stub.requests += 1
+                    stub.bytes_sent += len(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def quiet():
+    """Swallow the stage's own progress output"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def run_stage(name: str, results: Dict, func: Callable[[], Dict], state: Optional[Dict] = None,
+              requires: Optional[Tuple[str, str]] = None):
+    """
+    Time func() and store its metrics under results[name]
+    requires: (state key, stage name) that must have succeeded first
+    """
+    print(f"  {name}...", end=' ', flush=True)
+    if requires and requires[0] not in state:
+        results[name] = {'skipped': f"needs {requires[1]}"}
+        print(f"skipped (needs {requires[1]})")
+        return
+    start_time = time.perf_counter()
+    try:
+        metrics = func() or {}
+    except ImportError as e:
+        results[name] = {'skipped': f"missing dependency: {e.name}"}
+        print(f"skipped ({e.name} not installed)")
+        return
+    elapsed = time.perf_counter() - start_time
+    metrics = {'seconds': round(metrics.pop('seconds', elapsed), 4), **metrics}
+    if metrics.get('items'):
+        metrics['items_per_sec'] = round(metrics['items'] / max(metrics['seconds'], 1e-9), 2)
+    results[name] = metrics
+    print(f"{metrics['seconds']:.2f}s")
+
+
+def stage_download(stub: StubImageAPI, output_dir: str, classes: int, per_class: int,
+                   keep_delays: bool) -> Dict:
+    import download_food_images as downloader
+
+    downloader.UNSPLASH_API_URL = stub.base_url
+    downloader.PEXELS_API_URL = stub.base_url
+    if not keep_delays:
+        downloader.IMAGE_DELAY = downloader.PAGE_DELAY = downloader.QUERY_DELAY = 0
+    os.environ.setdefault('UNSPLASH_ACCESS_KEY', 'benchmark')
+    os.environ.setdefault('PEXELS_API_KEY', 'benchmark')
+
+    start_time = time.perf_counter()
+    with quiet():
+        for class_idx in range(classes):
+            downloader.download_food_images(f'food_{class_idx:03d}', per_class, Path(output_dir))
+    elapsed = time.perf_counter() - start_time
+
+    images = sum(len(files) for _, _, files in os.walk(output_dir))
+    return {'seconds': elapsed, 'items': images, 'http_requests': stub.requests,
+            'megabytes': round(stub.bytes_sent / 1024 / 1024, 2),
+            'seconds_per_food': round(elapsed / max(classes, 1), 3),
+            'rate_limit_delays': keep_delays}
+
+
+def stage_organize(source_dir: str, dataset_dir: str, min_size: int) -> Dict:
+    from collect_images import organize_images
+
+    with quiet():
+        organize_images(source_dir, dataset_dir, min_images=1, min_size=min_size)
+    return {'items': sum(len(files) for _, _, files in os.walk(dataset_dir))}
+
+
+def stage_scan(dataset_dir: str) -> Dict:
+    from dataset_scanner import CACHE_FILENAME
+    from train_uzbek_food_model import scan_dataset
+
+    cache_path = os.path.join(dataset_dir, CACHE_FILENAME)
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+
+    start_time = time.perf_counter()
+    with quiet():
+        report = scan_dataset(dataset_dir)
+    cold = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    with quiet():
+        scan_dataset(dataset_dir)
+    warm = time.perf_counter() - start_time
+    return {'seconds': cold, 'items': report['total_images'], 'warm_seconds': round(warm, 4)}
+
+
+def stage_input_pipeline(dataset_dir: str, batch_size: int, batches: int, state: Dict) -> Dict:
+    from train_uzbek_food_model import create_data_generators
+
+    with quiet():
+        train_gen, _ = create_data_generators(dataset_dir, batch_size)
+    state['train_gen'] = train_gen
+
+    batches = min(batches, len(train_gen))
+    start_time = time.perf_counter()
+    images = sum(len(train_gen[i][0]) for i in range(batches))
+    return {'seconds': time.perf_counter() - start_time, 'items': images, 'batches': batches}
+
+
+def stage_train_steps(steps: int, state: Dict) -> Dict:
+    import tensorflow as tf
+    from train_uzbek_food_model import create_model
+
+    train_gen = state['train_gen']
+    with quiet():
+        model = create_model(len(train_gen.class_indices), weights=None)
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=0.0001),
+                  loss='categorical_crossentropy', metrics=['accuracy'])
+    state['model'] = model
+
+    # The first step traces the graph; report it separately
+    start_time = time.perf_counter()
+    model.train_on_batch(*train_gen[0])
+    first_step = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    images = 0
+    for step in range(steps):
+        x, y = train_gen[(step + 1) % len(train_gen)]
+        model.train_on_batch(x, y)
+        images += len(x)
+    elapsed = time.perf_counter() - start_time
+    return {'seconds': elapsed, 'items': images, 'steps': steps,
+            'first_step_seconds': round(first_step, 4),
+            'seconds_per_step': round(elapsed / max(steps, 1), 4)}
+
+
+def stage_convert(output_file: str, state: Dict) -> Dict:
+    from train_uzbek_food_model import convert_to_tflite
+
+    with quiet():
+        convert_to_tflite(state['model'], quantize=True, output_file=output_file)
+    state['tflite_path'] = output_file
+    return {'megabytes': round(os.path.getsize(output_file) / 1024 / 1024, 2)}
+
+
+def stage_inference(runs: int, state: Dict) -> Dict:
+    from train_uzbek_food_model import benchmark_tflite_model
+
+    latency_ms = benchmark_tflite_model(state['tflite_path'], runs=runs)
+    return {'seconds': latency_ms * runs / 1000, 'items': runs, 'ms_per_image': round(latency_ms, 3)}
+
+
+def environment_info() -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    info = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'git_commit': commit or None,
+    }
+    for module in ('tensorflow', 'numpy', 'PIL'):
+        try:
+            info[module] = __import__(module).__version__
+        except ImportError:
+            info[module] = None
+    return info
+
+
+def run_benchmark(args, workdir: str) -> Dict:
+    results = {}
+    state = {}
+    raw_dir = os.path.join(workdir, 'raw_images')
+    dataset_dir = os.path.join(workdir, 'dataset')
+    download_dir = os.path.join(workdir, 'downloaded')
+
+    print(f"Generating corpus: {args.classes} classes × {args.images} images "
+          f"({', '.join(f'{w}x{h}' for w, h in args.image_size)})")
+    start_time = time.perf_counter()
+    corpus = make_corpus(raw_dir, args.classes, args.images, args.image_size)
+    corpus['seconds'] = round(time.perf_counter() - start_time, 4)
+    corpus['megabytes'] = round(corpus.pop('bytes') / 1024 / 1024, 2)
+    print(f"  {corpus['images']} images, {corpus['megabytes']} MB in {corpus['seconds']:.1f}s\n")
+
+    print("Stages:")
+    if args.download_images:
+        with StubImageAPI(args.image_size[0]) as stub:
+            run_stage('download', results, lambda: stage_download(
+                stub, download_dir, args.classes, args.download_images, args.keep_delays))
+    run_stage('organize', results, lambda: stage_organize(raw_dir, dataset_dir, args.min_size))
+    run_stage('scan', results, lambda: stage_scan(dataset_dir))
+    run_stage('input_pipeline', results, lambda: stage_input_pipeline(
+        dataset_dir, args.batch_size, args.batches, state))
+    run_stage('train_steps', results, lambda: stage_train_steps(args.train_steps, state),
+              state, requires=('train_gen', 'input_pipeline'))
+    run_stage('convert', results, lambda: stage_convert(os.path.join(workdir, 'model.tflite'), state),
+              state, requires=('model', 'train_steps'))
+    run_stage('inference', results, lambda: stage_inference(args.runs, state),
+              state, requires=('tflite_path', 'convert'))
+
+    return {
+        'version': RESULTS_VERSION,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': environment_info(),
+        'config': {
+            'classes': args.classes,
+            'images_per_class': args.images,
+            'image_sizes': [f'{w}x{h}' for w, h in args.image_size],
+            'download_images_per_class': args.download_images,
+            'batch_size': args.batch_size,
+            'batches': args.batches,
+            'train_steps': args.train_steps,
+            'inference_runs': args.runs,
+        },
+        'corpus': corpus,
+        'stages': results,
+    }
+
+
+def compare_results(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Print per-stage change against a baseline; returns the stages that regressed"""
+    regressions = []
+    if current['config'] != baseline.get('config'):
+        print("⚠️  Baseline was run with a different configuration; timings may not be comparable")
+
+    print(f"\n{'Stage':<16s} {'Baseline':>10s} {'Current':>10s} {'Change':>8s}")
+    for name, metrics in current['stages'].items():
+        before = baseline.get('stages', {}).get(name, {})
+        if 'seconds' not in metrics or 'seconds' not in before:
+            continue
+        change = metrics['seconds'] / max(before['seconds'], 1e-9) - 1
+        status = "❌" if change > tolerance else "✓"
+        print(f"{name:<16s} {before['seconds']:>9.2f}s {metrics['seconds']:>9.2f}s {change:>+7.0%} {status}")
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the training pipeline on synthetic data')
+    parser.add_argument('--classes', type=int, default=5,
+                        help='Number of synthetic food classes')
+    parser.add_argument('--images', type=int, default=40,
+                        help='Synthetic images per class')
+    parser.add_argument('--image-size', type=parse_sizes, default=parse_sizes('1024x768,640x480'),
+                        help='Image sizes as WxH[,WxH...] (cycled through)')
+    parser.add_argument('--min-size', type=int, default=224,
+                        help='Minimum image size passed to organize_images')
+    parser.add_argument('--download-images', type=int, default=10,
+                        help='Images per class to download from the stub API (0 = skip)')
+    parser.add_argument('--keep-delays', action='store_true',
+                        help="Keep the downloader's rate-limit sleeps (measures real wall time per food)")
+    parser.add_argument('--batch-size', type=int, default=16,
+                        help='Batch size for the input pipeline and training steps')
+    parser.add_argument('--batches', type=int, default=10,
+                        help='Batches to read in the input pipeline stage')
+    parser.add_argument('--train-steps', type=int, default=5,
+                        help='Timed training steps (after one warm-up step)')
+    parser.add_argument('--runs', type=int, default=50,
+                        help='TFLite inference runs')
+    parser.add_argument('--workdir', type=str, default=None,
+                        help='Keep generated data here instead of a temporary directory')
+    parser.add_argument('--output', type=str, default='benchmark_results.json',
+                        help='Write results to this JSON file')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='Compare against a previous results file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown per stage vs --baseline before failing (0.25 = 25%%)')
+
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("Pipeline Benchmark".center(70))
+    print("=" * 70)
+
+    if args.workdir:
+        if os.path.exists(args.workdir) and os.listdir(args.workdir):
+            print(f"❌ ERROR: --workdir '{args.workdir}' is not empty")
+            return 1
+        os.makedirs(args.workdir, exist_ok=True)
+        results = run_benchmark(args, args.workdir)
+    else:
+        with tempfile.TemporaryDirectory(prefix='food_benchmark_') as workdir:
+            results = run_benchmark(args, workdir)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ Slower than baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
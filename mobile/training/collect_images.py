@@ -4,28 +4,59 @@ Helper script to organize and validate food images for training
 
 Usage:
     python collect_images.py --source ./raw_images --output ./dataset --min-images 20
+    python collect_images.py --source food-101.tar.gz --output ./dataset --label-map food101_map.json
+    python collect_images.py --benchmark-validation 40
 """
 
+import io
 import os
+import json
+import time
 import argparse
 import shutil
+import tarfile
+import zipfile
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from PIL import Image
-import hashlib
+
+from dataset_scanner import scan_dataset_tree, probe_image_header, probe_image_file, IMAGE_EXTENSIONS
+from hash_index import HashIndex, file_digest, bytes_digest, parse_dir_tag
+
+ARCHIVE_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz', '.zip')
 
 def get_image_hash(image_path):
     """
     Compute hash of image to detect duplicates
     """
-    with open(image_path, 'rb') as f:
-        return hashlib.md5(f.read()).hexdigest()
+    return file_digest(image_path).hex()
 
-def validate_image(image_path, min_size=224):
+VALIDATION_LEVELS = ('header', 'draft', 'full')
+
+def validate_image(image_path, min_size=224, level='draft'):
     """
     Validate that image is readable and large enough
+    image_path may also be a seekable binary file (e.g. io.BytesIO)
     Returns (is_valid, error_message)
+    
+    level:
+      'header' - dimensions, mode and end marker from the file headers only
+      'draft'  - also decode JPEGs at reduced scale (DCT scaling, no smaller
+                 than min_size) and check PNG chunk CRCs; this still catches
+                 truncated and corrupt files
+      'full'   - decode every pixel at full resolution
     """
     try:
+        if level == 'header':
+            # Checks the end-of-image marker, so truncated files fail here too
+            if isinstance(image_path, (str, os.PathLike)):
+                probe_image_header(image_path)
+            else:
+                probe_image_file(image_path)
+                image_path.seek(0)
+        
         img = Image.open(image_path)
         width, height = img.size
         
@@ -36,14 +67,61 @@ def validate_image(image_path, min_size=224):
             return False, f"Unsupported mode: {img.mode}"
         
         # Try to load the image data
-        img.load()
+        if level == 'draft':
+            if img.format == 'JPEG':
+                img.draft(img.mode, (min_size, min_size))
+                img.load()
+            else:
+                img.verify()
+        elif level == 'full':
+            img.load()
         img.close()
         
         return True, None
     except Exception as e:
         return False, str(e)
 
-def organize_images(source_dir, output_dir, min_images=20, min_size=224):
+def make_synthetic_corpus(output_dir, count=40, size=(4032, 3024), truncated_every=5):
+    """
+    Write phone-sized noise JPEGs for benchmarking; every truncated_every-th
+    file is cut in half. Returns (paths, number of truncated files)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    base = Image.merge('RGB', [Image.effect_noise(size, sigma) for sigma in (40, 60, 80)])
+    
+    paths = []
+    truncated = 0
+    for i in range(count):
+        path = os.path.join(output_dir, f'synthetic_{i:04d}.jpg')
+        base.save(path, 'JPEG', quality=70 + i % 25)
+        if truncated_every and i % truncated_every == truncated_every - 1:
+            with open(path, 'r+b') as f:
+                f.truncate(os.path.getsize(path) // 2)
+            truncated += 1
+        paths.append(path)
+    return paths, truncated
+
+def benchmark_validation(count=40, min_size=224):
+    """
+    Report files/sec and rejections for each validation level
+    """
+    print(f"Validation benchmark: {count} synthetic 4032x3024 JPEGs")
+    print("=" * 70)
+    
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        paths, truncated = make_synthetic_corpus(corpus_dir, count)
+        print(f"  Corpus: {len(paths)} files ({truncated} truncated)\n")
+        
+        for level in VALIDATION_LEVELS:
+            start_time = time.perf_counter()
+            rejected = sum(1 for path in paths if not validate_image(path, min_size, level)[0])
+            elapsed = time.perf_counter() - start_time
+            status = "✓" if rejected == truncated else "⚠️"
+            print(f"  {status} {level:>6s}: {len(paths) / elapsed:8.1f} files/sec, "
+                  f"rejected {rejected}/{truncated} truncated")
+
+def organize_images(source_dir, output_dir, min_images=20, min_size=224, hash_index=None,
+                    recheck_rejected=False, validation='draft'):
     """
     Organize images from source directory into training structure
     Expected source structure:
@@ -53,25 +131,29 @@ def organize_images(source_dir, output_dir, min_images=20, min_size=224):
           img2.jpg
         samsa/
           ...
+    
+    hash_index: Persistent HashIndex; images already in the dataset, validation
+        or test folders (or rejected on an earlier run) are skipped without
+        decoding. Defaults to an in-memory index for this run only.
+    recheck_rejected: Validate previously rejected images again
+    validation: validate_image level ('header', 'draft' or 'full')
+    
+    Returns the run totals (see new_stats())
     """
     print(f"Organizing images from {source_dir} to {output_dir}")
     print(f"Minimum images per class: {min_images}")
     print(f"Minimum image size: {min_size}x{min_size}")
+    print(f"Validation: {validation}")
     print("=" * 70)
     
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
     
-    stats = {
-        'total_classes': 0,
-        'total_images': 0,
-        'skipped_images': 0,
-        'duplicates': 0,
-        'invalid_images': 0
-    }
+    stats = new_stats()
     
     # Track image hashes to detect duplicates
-    seen_hashes = {}
+    index = hash_index if hash_index is not None else HashIndex()
+    added = set()  # Digests written by this run
     
     # Process each food class
     for food_class in sorted(os.listdir(source_dir)):
@@ -87,9 +169,7 @@ def organize_images(source_dir, output_dir, min_images=20, min_size=224):
         os.makedirs(output_class_dir, exist_ok=True)
         
         # Process images in this class
-        valid_images = 0
-        class_duplicates = 0
-        class_invalid = 0
+        counts = new_class_counts()
         
         for filename in sorted(os.listdir(class_path)):
             file_path = os.path.join(class_path, filename)
@@ -98,52 +178,112 @@ def organize_images(source_dir, output_dir, min_images=20, min_size=224):
             if not filename.lower().endswith(('.jpg', '.jpeg', '.png')):
                 continue
             
-            # Validate image
-            is_valid, error = validate_image(file_path, min_size)
+            # Check for duplicates first: hashing is much cheaper than decoding
+            digest = file_digest(file_path)
+            seen = index.get(digest)
             
-            if not is_valid:
-                print(f"  ⚠️  Skipping {filename}: {error}")
-                class_invalid += 1
+            if seen == 'rejected' and not recheck_rejected:
+                print(f"  ⚠️  Skipping {filename}: rejected on an earlier run")
+                counts['invalid'] += 1
+                continue
+            if seen == 'dataset' and digest not in added:
+                counts['existing'] += 1
+                continue
+            if seen and seen != 'rejected':
+                print(f"  ⚠️  Duplicate: {filename} (already in {seen})")
+                counts['duplicates'] += 1
                 continue
             
-            # Check for duplicates
-            img_hash = get_image_hash(file_path)
+            # Validate image
+            is_valid, error = validate_image(file_path, min_size, validation)
             
-            if img_hash in seen_hashes:
-                print(f"  ⚠️  Duplicate: {filename} (same as {seen_hashes[img_hash]})")
-                class_duplicates += 1
+            if not is_valid:
+                print(f"  ⚠️  Skipping {filename}: {error}")
+                index.set(digest, 'rejected')
+                counts['invalid'] += 1
                 continue
             
-            seen_hashes[img_hash] = f"{food_class}/{filename}"
-            
             # Copy image to output directory
             output_path = os.path.join(output_class_dir, filename)
             shutil.copy2(file_path, output_path)
-            valid_images += 1
+            index.set(digest, 'dataset')
+            added.add(digest)
+            counts['added'] += 1
         
         # Report stats for this class
-        status = "✓" if valid_images >= min_images else "⚠️"
-        print(f"  {status} Valid images: {valid_images}")
-        
-        if class_duplicates > 0:
-            print(f"     Duplicates removed: {class_duplicates}")
-        if class_invalid > 0:
-            print(f"     Invalid images: {class_invalid}")
-        
-        if valid_images < min_images:
-            print(f"     ⚠️  Warning: Need {min_images - valid_images} more images!")
-        
-        stats['total_classes'] += 1
-        stats['total_images'] += valid_images
-        stats['duplicates'] += class_duplicates
-        stats['invalid_images'] += class_invalid
+        report_class(stats, counts, output_class_dir, min_images)
     
-    # Print summary
+    print_summary(stats, min_images, output_dir)
+    return stats
+
+def new_stats():
+    """
+    Run totals: images added, already in the dataset (from an earlier run),
+    duplicates and invalid images skipped, plus images now in the output folders
+    """
+    return {
+        'total_classes': 0,
+        'total_images': 0,
+        'added_images': 0,
+        'existing_images': 0,
+        'duplicates': 0,
+        'invalid_images': 0,
+        'incomplete_classes': 0
+    }
+
+def new_class_counts():
+    return {'added': 0, 'existing': 0, 'duplicates': 0, 'invalid': 0}
+
+def count_images(class_dir):
+    """
+    Number of images in an output class folder
+    """
+    if not os.path.isdir(class_dir):
+        return 0
+    with os.scandir(class_dir) as entries:
+        return sum(1 for entry in entries
+                   if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS))
+
+def report_class(stats, counts, class_dir, min_images):
+    """
+    Print one class's counts and add them to the run totals
+    
+    Readiness is judged on the images in class_dir, so images imported on an
+    earlier run count even though this run skipped them.
+    """
+    total = count_images(class_dir)
+    status = "✓" if total >= min_images else "⚠️"
+    print(f"  {status} Images in dataset: {total} ({counts['added']} added)")
+    
+    if counts['existing'] > 0:
+        print(f"     Already in dataset: {counts['existing']}")
+    if counts['duplicates'] > 0:
+        print(f"     Duplicates removed: {counts['duplicates']}")
+    if counts['invalid'] > 0:
+        print(f"     Invalid images: {counts['invalid']}")
+    
+    if total < min_images:
+        print(f"     ⚠️  Warning: Need {min_images - total} more images!")
+        stats['incomplete_classes'] += 1
+    
+    stats['total_classes'] += 1
+    stats['total_images'] += total
+    stats['added_images'] += counts['added']
+    stats['existing_images'] += counts['existing']
+    stats['duplicates'] += counts['duplicates']
+    stats['invalid_images'] += counts['invalid']
+
+def print_summary(stats, min_images, output_dir):
+    """
+    Print run totals and whether the dataset is ready for training
+    """
     print("\n" + "=" * 70)
     print("Summary".center(70))
     print("=" * 70)
     print(f"  Total classes: {stats['total_classes']}")
-    print(f"  Total valid images: {stats['total_images']}")
+    print(f"  Total images in dataset: {stats['total_images']}")
+    print(f"  Added this run: {stats['added_images']}")
+    print(f"  Already in dataset: {stats['existing_images']}")
     print(f"  Duplicates removed: {stats['duplicates']}")
     print(f"  Invalid images skipped: {stats['invalid_images']}")
     print(f"  Average images per class: {stats['total_images'] / max(stats['total_classes'], 1):.1f}")
@@ -154,14 +294,189 @@ def organize_images(source_dir, output_dir, min_images=20, min_size=224):
     if stats['total_images'] == 0:
         print("❌ No valid images found!")
         print("   Check that source directory contains images in subdirectories.")
-    elif stats['total_images'] < min_images * stats['total_classes']:
+    elif stats['incomplete_classes']:
         print("⚠️  Dataset incomplete!")
-        print(f"   Need at least {min_images} images per class.")
-        print(f"   Add more images to classes with fewer than {min_images} images.")
+        print(f"   {stats['incomplete_classes']} classes have fewer than {min_images} images.")
+        print(f"   Add more images to those classes.")
     else:
         print("✓ Dataset is ready for training!")
         print(f"  Run: python train_uzbek_food_model.py --dataset {output_dir}")
 
+def is_archive(path):
+    return os.path.isfile(path) and path.lower().endswith(ARCHIVE_SUFFIXES)
+
+def iter_archive_images(archive_path, select):
+    """
+    Stream (label, filename, data) for images stored as .../<class>/<file>
+    in a .tar(.gz/.bz2/.xz) or .zip archive
+    
+    select(class_folder) returns the output label, or None to skip the
+    member without reading its data
+    """
+    def accept(name):
+        parts = name.rstrip('/').split('/')
+        if len(parts) < 2 or parts[-1].startswith('.'):
+            return None, None
+        if not parts[-1].lower().endswith(IMAGE_EXTENSIONS):
+            return None, None
+        return select(parts[-2]), parts[-1]
+    
+    if archive_path.lower().endswith('.zip'):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                label, filename = accept(info.filename) if not info.is_dir() else (None, None)
+                if label:
+                    yield label, filename, archive.read(info)
+    else:
+        # 'r|*' reads the (compressed) stream front to back without seeking
+        with tarfile.open(archive_path, 'r|*') as archive:
+            for member in archive:
+                label, filename = accept(member.name) if member.isfile() else (None, None)
+                if label:
+                    yield label, filename, archive.extractfile(member).read()
+
+def prepare_image_bytes(data, min_size=224, validation='draft', max_side=None):
+    """
+    Validate image bytes and optionally downscale them
+    
+    With max_side, images are shrunk so the longer side is at most max_side
+    (but the shorter side stays >= min_size) and re-encoded as JPEG.
+    Returns (is_valid, error_message, output_bytes, resized)
+    """
+    is_valid, error = validate_image(io.BytesIO(data), min_size, validation)
+    if not is_valid or not max_side:
+        return is_valid, error, data, False
+    
+    try:
+        img = Image.open(io.BytesIO(data))
+        width, height = img.size
+        scale = max(max_side / max(width, height), min_size / min(width, height))
+        if scale >= 1:
+            return True, None, data, False
+        
+        new_size = (round(width * scale), round(height * scale))
+        img.draft('RGB', new_size)  # DCT scaling for JPEGs; no-op otherwise
+        img = img.convert('RGB').resize(new_size, Image.LANCZOS)
+        output = io.BytesIO()
+        img.save(output, 'JPEG', quality=90)
+        return True, None, output.getvalue(), True
+    except Exception as e:
+        return False, str(e), None, False
+
+def import_archive(archive_path, output_dir, min_images=20, min_size=224, hash_index=None,
+                   recheck_rejected=False, validation='draft', label_map=None, labels=None,
+                   max_side=None, workers=8):
+    """
+    Import images straight from a dataset archive (e.g. food-101.tar.gz)
+    
+    Members are streamed in one pass and only accepted images are written,
+    so nothing is extracted to disk first. Duplicates are detected on the
+    main thread from the member bytes before any decoding; validation and
+    resizing run in a thread pool with a bounded number of images in flight.
+    
+    label_map: {archive class folder: output label}; unmapped folders keep their name
+    labels: Only import images whose output label is in this collection (e.g. labels.txt)
+    max_side: Downscale so the longer side is at most this many pixels
+    
+    Returns the run totals (see new_stats())
+    """
+    print(f"Importing images from archive {archive_path} to {output_dir}")
+    print(f"Minimum images per class: {min_images}")
+    print(f"Minimum image size: {min_size}x{min_size}")
+    print(f"Validation: {validation}")
+    if max_side:
+        print(f"Resizing to at most: {max_side}px")
+    print("=" * 70)
+    
+    os.makedirs(output_dir, exist_ok=True)
+    
+    label_map = label_map or {}
+    labels = set(labels) if labels is not None else None
+    index = hash_index if hash_index is not None else HashIndex()
+    added = set()  # Digests written by this run
+    class_counts = {}
+    skipped_folders = set()
+    
+    def select(folder):
+        label = label_map.get(folder, folder)
+        if labels is not None and label not in labels:
+            skipped_folders.add(folder)
+            return None
+        return label
+    
+    def save(entry):
+        future, label, filename, digest = entry
+        in_flight.discard(digest)
+        counts = class_counts[label]
+        is_valid, error, data, resized = future.result()
+        
+        if not is_valid:
+            print(f"  ⚠️  Skipping {label}/{filename}: {error}")
+            index.set(digest, 'rejected')
+            counts['invalid'] += 1
+            return
+        
+        class_dir = os.path.join(output_dir, label)
+        os.makedirs(class_dir, exist_ok=True)
+        if resized:
+            filename = os.path.splitext(filename)[0] + '.jpg'
+        output_path = os.path.join(class_dir, filename)
+        if os.path.exists(output_path):
+            output_path = os.path.join(class_dir, f"{digest.hex()[:8]}_{filename}")
+        with open(output_path, 'wb') as f:
+            f.write(data)
+        index.set(digest, 'dataset')
+        added.add(digest)
+        counts['added'] += 1
+    
+    pending = deque()
+    in_flight = set()
+    max_pending = max(1, workers) * 4
+    read = 0
+    start_time = time.perf_counter()
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for label, filename, data in iter_archive_images(archive_path, select):
+            read += 1
+            if read % 5000 == 0:
+                print(f"  Read {read} images ({read / (time.perf_counter() - start_time):.0f} images/sec)")
+            
+            counts = class_counts.setdefault(label, new_class_counts())
+            digest = bytes_digest(data)
+            seen = index.get(digest)
+            
+            if seen == 'dataset' and digest not in added and digest not in in_flight:
+                counts['existing'] += 1
+                continue
+            if digest in in_flight or (seen and seen != 'rejected'):
+                counts['duplicates'] += 1
+                continue
+            if seen == 'rejected' and not recheck_rejected:
+                counts['invalid'] += 1
+                continue
+            
+            in_flight.add(digest)
+            future = pool.submit(prepare_image_bytes, data, min_size, validation, max_side)
+            pending.append((future, label, filename, digest))
+            while len(pending) >= max_pending:
+                save(pending.popleft())
+        
+        while pending:
+            save(pending.popleft())
+    
+    elapsed = time.perf_counter() - start_time
+    print(f"\nRead {read} images in {elapsed:.1f}s ({read / max(elapsed, 1e-9):.0f} images/sec)")
+    if skipped_folders:
+        print(f"Skipped {len(skipped_folders)} class folders not in the label list")
+    
+    stats = new_stats()
+    for label in sorted(class_counts):
+        print(f"\n{label}")
+        report_class(stats, class_counts[label], os.path.join(output_dir, label), min_images)
+    
+    print_summary(stats, min_images, output_dir)
+    return stats
+
 def augment_small_classes(dataset_dir, min_images=20):
     """
     Suggest which classes need more images
@@ -170,18 +485,15 @@ def augment_small_classes(dataset_dir, min_images=20):
     print("=" * 70)
     
     needs_more = []
+    report = scan_dataset_tree(dataset_dir)
     
-    for food_class in sorted(os.listdir(dataset_dir)):
-        class_path = os.path.join(dataset_dir, food_class)
-        
-        if not os.path.isdir(class_path):
-            continue
-        
-        image_count = len([f for f in os.listdir(class_path) 
-                          if f.lower().endswith(('.jpg', '.jpeg', '.png'))])
+    for food_class, info in report['classes'].items():
+        image_count = info['count']
         
         if image_count < min_images:
             needs_more.append((food_class, image_count, min_images - image_count))
+        if info['corrupt']:
+            print(f"  ❌ {food_class}: {len(info['corrupt'])} corrupt images")
     
     if needs_more:
         print("Classes needing more images:\n")
@@ -194,8 +506,8 @@ def augment_small_classes(dataset_dir, min_images=20):
 
 def main():
     parser = argparse.ArgumentParser(description='Organize and validate food images')
-    parser.add_argument('--source', type=str, required=True,
-                       help='Source directory with raw images')
+    parser.add_argument('--source', type=str,
+                       help='Source directory with raw images, or a .tar/.tar.gz/.zip archive of class folders')
     parser.add_argument('--output', type=str, default='dataset',
                        help='Output directory for organized dataset')
     parser.add_argument('--min-images', type=int, default=20,
@@ -204,13 +516,75 @@ def main():
                        help='Minimum image dimension (width or height)')
     parser.add_argument('--analyze-only', action='store_true',
                        help='Only analyze existing dataset without organizing')
+    parser.add_argument('--hash-index', type=str, default=None,
+                       help='Persistent duplicate index file, kept across runs (e.g. dataset_hashes.idx)')
+    parser.add_argument('--index-dir', type=parse_dir_tag, action='append', default=[],
+                       help='Also index DIR[:TAG] before organizing, e.g. test_images:test')
+    parser.add_argument('--recheck-rejected', action='store_true',
+                       help='Validate images rejected on earlier runs again')
+    parser.add_argument('--validation', choices=VALIDATION_LEVELS, default='draft',
+                       help='header: headers only; draft: reduced-scale decode (default); full: full decode')
+    parser.add_argument('--label-map', type=str, default=None,
+                       help='JSON {archive class folder: our label} for archive sources')
+    parser.add_argument('--labels', type=str, default=None,
+                       help='Only import classes listed in this labels.txt (archive sources)')
+    parser.add_argument('--max-side', type=int, default=None,
+                       help='Downscale archive images so the longer side is at most this many pixels')
+    parser.add_argument('--workers', type=int, default=8,
+                       help='Threads validating and resizing archive images')
+    parser.add_argument('--benchmark-validation', type=int, metavar='N', default=0,
+                       help='Benchmark each validation level on N synthetic images and exit')
     
     args = parser.parse_args()
     
+    if args.benchmark_validation:
+        benchmark_validation(args.benchmark_validation, args.min_size)
+        return
+    
     if args.analyze_only:
         augment_small_classes(args.output, args.min_images)
-    else:
-        organize_images(args.source, args.output, args.min_images, args.min_size)
+        return
+    
+    if not args.source:
+        parser.error('--source is required (unless using --analyze-only or --benchmark-validation)')
+    
+    hash_index = None
+    if args.hash_index:
+        hash_index = HashIndex(args.hash_index)
+        index_dirs = list(args.index_dir)
+        if len(hash_index) == 0 and os.path.isdir(args.output):
+            # First run with this index: pick up what is already in the dataset
+            index_dirs.insert(0, (args.output, 'dataset'))
+        for directory, tag in index_dirs:
+            added = hash_index.index_directory(directory, tag)
+            print(f"Indexed {directory} as {tag}: {added} new images")
+        print(f"Hash index {args.hash_index}: {len(hash_index)} images\n")
+    elif args.index_dir:
+        hash_index = HashIndex()
+        for directory, tag in args.index_dir:
+            hash_index.index_directory(directory, tag)
+    
+    try:
+        if is_archive(args.source):
+            label_map = None
+            if args.label_map:
+                with open(args.label_map, 'r', encoding='utf-8') as f:
+                    label_map = json.load(f)
+            labels = None
+            if args.labels:
+                with open(args.labels, 'r', encoding='utf-8') as f:
+                    labels = [line.strip() for line in f if line.strip()]
+            import_archive(args.source, args.output, args.min_images, args.min_size,
+                           hash_index=hash_index, recheck_rejected=args.recheck_rejected,
+                           validation=args.validation, label_map=label_map, labels=labels,
+                           max_side=args.max_side, workers=args.workers)
+        else:
+            organize_images(args.source, args.output, args.min_images, args.min_size,
+                            hash_index=hash_index, recheck_rejected=args.recheck_rejected,
+                            validation=args.validation)
+    finally:
+        if hash_index is not None:
+            hash_index.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Find likely mislabeled images and cross-class near-duplicates
+
+Embeds every image with MobileNetV2 (ImageNet weights, global average
+pooled), reduces the embeddings with PCA, builds an inverted-file (IVF)
+approximate nearest-neighbour index over NumPy arrays and checks each
+image's neighbours:
+  - Suspected mislabels: most neighbours belong to one other class
+    (e.g. generic rice photos filed under plov)
+  - Cross-class near-duplicates: near-identical images filed under
+    different classes
+
+Embeddings are cached in dataset/.audit_embeddings.npz keyed by the content
+hashes from the split manifest, so re-audits only embed new images.
+
+Usage:
+    python dataset_audit.py --dataset ./dataset
+    python train_uzbek_food_model.py audit --dataset ./dataset --output audit_report.json
+    python dataset_audit.py --synthetic 300000   # Index benchmark on random vectors
+"""
+import os
+import json
+import time
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from dataset_splits import update_split_manifest
+
+EMBEDDING_CACHE_FILENAME = '.audit_embeddings.npz'
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def compute_embeddings(paths: List[str], batch_size: int = 64, image_size: int = 224) -> np.ndarray:
+    """MobileNetV2 pooled embeddings (N, 1280) as float16, decoded in parallel with tf.data"""
+    import tensorflow as tf
+    from tensorflow.keras.applications import MobileNetV2
+    from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
+
+    model = MobileNetV2(input_shape=(image_size, image_size, 3), include_top=False,
+                        weights='imagenet', pooling='avg')
+
+    def load(path):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        image = tf.image.resize(image, (image_size, image_size))
+        return preprocess_input(image)
+
+    dataset = (tf.data.Dataset.from_tensor_slices(paths)
+               .map(load, num_parallel_calls=tf.data.AUTOTUNE)
+               .batch(batch_size)
+               .prefetch(tf.data.AUTOTUNE))
+
+    embeddings = np.empty((len(paths), model.output_shape[-1]), dtype=np.float16)
+    offset = 0
+    start_time = time.perf_counter()
+    for batch in dataset:
+        output = model(batch, training=False).numpy()
+        embeddings[offset:offset + len(output)] = output
+        offset += len(output)
+        if offset % (batch_size * 20) < batch_size:
+            rate = offset / (time.perf_counter() - start_time)
+            print(f"  Embedded {offset}/{len(paths)} images ({rate:.0f} images/sec)")
+    return embeddings
+
+
+def load_embeddings(dataset_dir: str, files: Dict[str, Dict], batch_size: int = 64,
+                    image_size: int = 224, use_cache: bool = True) -> Tuple[List[str], np.ndarray]:
+    """
+    Embeddings for every manifest entry, computing only hashes not in the cache
+    Returns (relative paths, (N, 1280) float16 embeddings)
+    """
+    cache_path = os.path.join(dataset_dir, EMBEDDING_CACHE_FILENAME)
+    cached = {}
+    if use_cache and os.path.exists(cache_path):
+        with np.load(cache_path) as data:
+            if int(data['image_size']) == image_size:
+                cached = dict(zip(data['hashes'].tolist(), data['embeddings']))
+
+    relpaths = list(files)
+    missing = {}
+    for relpath in relpaths:
+        digest = files[relpath]['hash']
+        if digest not in cached and digest not in missing:
+            missing[digest] = os.path.join(dataset_dir, *relpath.split('/'))
+
+    print(f"Embeddings: {len(relpaths) - len(missing)} cached, {len(missing)} to compute")
+    if missing:
+        computed = compute_embeddings(list(missing.values()), batch_size, image_size)
+        cached.update(zip(missing, computed))
+        if use_cache:
+            tmp_path = cache_path + '.tmp.npz'
+            hashes = list(cached)
+            np.savez(tmp_path, hashes=np.array(hashes), image_size=np.int64(image_size),
+                     embeddings=np.stack([cached[h] for h in hashes]))
+            os.replace(tmp_path, cache_path)
+
+    return relpaths, np.stack([cached[files[relpath]['hash']] for relpath in relpaths])
+
+
+def pca_reduce(vectors: np.ndarray, dims: int = 128, sample_size: int = 20000,
+               seed: int = 0) -> np.ndarray:
+    """Project onto the top principal components (fitted on a sample) and L2-normalise"""
+    vectors = vectors.astype(np.float32)
+    if vectors.shape[1] <= dims:
+        return _normalize(vectors)
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), min(len(vectors), sample_size), replace=False)]
+    mean = sample.mean(axis=0)
+    _, _, components = np.linalg.svd(sample - mean, full_matrices=False)
+    return _normalize((vectors - mean) @ components[:dims].T)
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index (cosine similarity)
+
+    Vectors must be L2-normalised. k-means (fitted on a sample) splits them
+    into n_lists cells; a query only scans the n_probe cells whose centroids
+    are closest, so a self-join costs roughly N * n_probe * N / n_lists dot
+    products instead of N².
+    """
+
+    def __init__(self, n_lists: Optional[int] = None, n_probe: int = 8, iterations: int = 10,
+                 seed: int = 0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.iterations = iterations
+        self.seed = seed
+
+    def _nearest(self, vectors: np.ndarray, centroids: np.ndarray, count: int = 1,
+                 chunk: int = 8192) -> np.ndarray:
+        """Indices of the count most similar centroids for each vector"""
+        result = np.empty((len(vectors), count), dtype=np.int64)
+        for start in range(0, len(vectors), chunk):
+            sims = vectors[start:start + chunk] @ centroids.T
+            if count == 1:
+                result[start:start + chunk, 0] = sims.argmax(axis=1)
+            else:
+                result[start:start + chunk] = np.argpartition(-sims, count - 1, axis=1)[:, :count]
+        return result
+
+    def build(self, vectors: np.ndarray):
+        rng = np.random.default_rng(self.seed)
+        n = len(vectors)
+        n_lists = min(self.n_lists or max(1, int(4 * np.sqrt(n))), n)
+        sample = vectors[rng.choice(n, min(n, n_lists * 32), replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+
+        for _ in range(self.iterations):
+            assign = self._nearest(sample, centroids)[:, 0]
+            order = np.argsort(assign, kind='stable')
+            counts = np.bincount(assign, minlength=n_lists)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            filled = counts > 0
+            sums = np.add.reduceat(sample[order], starts[filled], axis=0)
+            centroids = centroids.copy()
+            centroids[filled] = _normalize(sums)
+            # Re-seed empty cells with random sample points
+            centroids[~filled] = sample[rng.choice(len(sample), int((~filled).sum()))]
+
+        self.vectors = vectors
+        self.centroids = centroids
+        assign = self._nearest(vectors, centroids)[:, 0]
+        self.members = np.argsort(assign, kind='stable')
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))])
+        return self
+
+    def search(self, queries: np.ndarray, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate k nearest neighbours for each query
+        Returns (similarities, indices), both (Q, k), most similar first;
+        indices are -1 where fewer than k candidates were scanned
+        """
+        n_probe = min(self.n_probe, len(self.centroids))
+        probe = self._nearest(queries, self.centroids, n_probe)
+
+        # Group queries by probed cell, then scan one cell for all its queries at once
+        flat_cells = probe.ravel()
+        flat_queries = np.repeat(np.arange(len(queries)), n_probe)
+        order = np.argsort(flat_cells, kind='stable')
+        cell_counts = np.bincount(flat_cells, minlength=len(self.centroids))
+        cell_starts = np.concatenate([[0], np.cumsum(cell_counts)])
+
+        best_sims = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        best_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for cell in np.flatnonzero(cell_counts):
+            members = self.members[self.offsets[cell]:self.offsets[cell + 1]]
+            if not len(members):
+                continue
+            query_ids = flat_queries[order[cell_starts[cell]:cell_starts[cell + 1]]]
+            sims = queries[query_ids] @ self.vectors[members].T
+
+            cell_k = min(k, len(members))
+            top = np.argpartition(-sims, cell_k - 1, axis=1)[:, :cell_k]
+            merged_sims = np.concatenate([best_sims[query_ids], np.take_along_axis(sims, top, axis=1)], axis=1)
+            merged_ids = np.concatenate([best_ids[query_ids], members[top]], axis=1)
+            keep = np.argpartition(-merged_sims, k - 1, axis=1)[:, :k]
+            best_sims[query_ids] = np.take_along_axis(merged_sims, keep, axis=1)
+            best_ids[query_ids] = np.take_along_axis(merged_ids, keep, axis=1)
+
+        order = np.argsort(-best_sims, axis=1)
+        return np.take_along_axis(best_sims, order, axis=1), np.take_along_axis(best_ids, order, axis=1)
+
+
+def self_neighbours(index: IVFIndex, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """k nearest neighbours of every indexed vector, excluding itself"""
+    sims, ids = index.search(index.vectors, k + 1)
+    is_self = ids == np.arange(len(ids))[:, None]
+    # Rows where the vector itself was not returned drop their last neighbour instead
+    is_self[~is_self.any(axis=1), -1] = True
+    keep = ~is_self
+    return sims[keep].reshape(len(ids), k), ids[keep].reshape(len(ids), k)
+
+
+def find_suspects(relpaths: List[str], labels: np.ndarray, classes: List[str], sims: np.ndarray,
+                  ids: np.ndarray, min_share: float = 0.6, dup_threshold: float = 0.97) -> Dict:
+    """
+    Flag images whose neighbours are mostly one other class, and
+    cross-class pairs with similarity >= dup_threshold
+    """
+    valid = ids >= 0
+    neighbour_labels = np.where(valid, labels[np.maximum(ids, 0)], -1)
+
+    # Majority label per row: compare every neighbour with every other one (k is small)
+    agree = (neighbour_labels[:, :, None] == neighbour_labels[:, None, :]) & valid[:, None, :]
+    votes = np.where(valid, agree.sum(axis=2), 0)
+    majority_col = votes.argmax(axis=1)
+    rows = np.arange(len(labels))
+    majority_label = neighbour_labels[rows, majority_col]
+    majority_share = votes[rows, majority_col] / np.maximum(valid.sum(axis=1), 1)
+    own_share = ((neighbour_labels == labels[:, None]) & valid).sum(axis=1) / np.maximum(valid.sum(axis=1), 1)
+
+    suspect_rows = np.flatnonzero((majority_label != labels) & (majority_label >= 0)
+                                  & (majority_share >= min_share))
+    suspects = sorted((
+        {
+            'file': relpaths[i],
+            'label': classes[labels[i]],
+            'neighbour_label': classes[majority_label[i]],
+            'neighbour_share': round(float(majority_share[i]), 3),
+            'own_share': round(float(own_share[i]), 3),
+        }
+        for i in suspect_rows
+    ), key=lambda item: -item['neighbour_share'])
+
+    duplicates = []
+    pair_rows, pair_cols = np.nonzero(valid & (sims >= dup_threshold)
+                                      & (neighbour_labels != labels[:, None]))
+    for i, j in zip(pair_rows, ids[pair_rows, pair_cols]):
+        if i < j or i not in ids[j]:  # Report each pair once
+            duplicates.append({
+                'a': relpaths[i],
+                'b': relpaths[j],
+                'similarity': round(float(sims[i, ids[i] == j][0]), 4),
+            })
+    duplicates.sort(key=lambda item: -item['similarity'])
+
+    return {'suspected_mislabels': suspects, 'cross_class_duplicates': duplicates}
+
+
+def audit_dataset(dataset_dir: str, k: int = 10, min_share: float = 0.6, dup_threshold: float = 0.97,
+                  dims: int = 128, batch_size: int = 64, image_size: int = 224,
+                  use_cache: bool = True) -> Dict:
+    """Embed, index and check the whole dataset; returns the audit report"""
+    manifest, _ = update_split_manifest(dataset_dir)
+    classes = manifest['classes']
+    class_index = {name: idx for idx, name in enumerate(classes)}
+
+    start_time = time.perf_counter()
+    relpaths, embeddings = load_embeddings(dataset_dir, manifest['files'], batch_size,
+                                           image_size, use_cache)
+    embed_s = time.perf_counter() - start_time
+    if len(relpaths) < 2:
+        raise ValueError("Need at least two images to audit")
+    labels = np.array([class_index[relpath.split('/', 1)[0]] for relpath in relpaths])
+
+    start_time = time.perf_counter()
+    vectors = pca_reduce(embeddings, dims)
+    index = IVFIndex().build(vectors)
+    build_s = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    sims, ids = self_neighbours(index, min(k, len(relpaths) - 1))
+    search_s = time.perf_counter() - start_time
+
+    report = find_suspects(relpaths, labels, classes, sims, ids, min_share, dup_threshold)
+    report.update({
+        'dataset_dir': dataset_dir,
+        'images': len(relpaths),
+        'classes': len(classes),
+        'k': k,
+        'min_share': min_share,
+        'dup_threshold': dup_threshold,
+        'timings_s': {'embed': round(embed_s, 2), 'index': round(build_s, 2), 'search': round(search_s, 2)},
+    })
+    return report
+
+
+def print_audit(report: Dict, limit: int = 20):
+    suspects = report['suspected_mislabels']
+    duplicates = report['cross_class_duplicates']
+    timings = report['timings_s']
+
+    print(f"\nAudited {report['images']} images in {report['classes']} classes "
+          f"(embed {timings['embed']:.1f}s, index {timings['index']:.1f}s, search {timings['search']:.1f}s)")
+
+    print(f"\nSuspected mislabels: {len(suspects)}")
+    for item in suspects[:limit]:
+        print(f"  ⚠️  {item['file']}: {item['neighbour_share']:.0%} of neighbours are "
+              f"{item['neighbour_label']}")
+
+    print(f"\nCross-class near-duplicates: {len(duplicates)}")
+    for item in duplicates[:limit]:
+        print(f"  ⚠️  {item['a']} ≈ {item['b']} ({item['similarity']:.3f})")
+
+    if len(suspects) > limit or len(duplicates) > limit:
+        print(f"\n  (showing first {limit}; see the JSON report for all)")
+
+
+def benchmark_index(count: int, dims: int = 128, k: int = 10, num_classes: int = 200):
+    """Build and self-join the index on clustered random vectors, reporting recall on a sample"""
+    rng = np.random.default_rng(0)
+    centers = _normalize(rng.standard_normal((num_classes, dims)).astype(np.float32))
+    vectors = _normalize(centers[rng.integers(num_classes, size=count)]
+                         + 0.6 * rng.standard_normal((count, dims)).astype(np.float32) / np.sqrt(dims))
+
+    print(f"Index benchmark: {count} vectors × {dims} dims, k={k}")
+    start_time = time.perf_counter()
+    index = IVFIndex().build(vectors)
+    print(f"  Build: {time.perf_counter() - start_time:.1f}s ({len(index.centroids)} lists)")
+
+    start_time = time.perf_counter()
+    _, ids = self_neighbours(index, k)
+    elapsed = time.perf_counter() - start_time
+    print(f"  Self-join: {elapsed:.1f}s ({count / elapsed:,.0f} queries/sec)")
+
+    sample = rng.choice(count, min(count, 500), replace=False)
+    exact = np.argsort(-(vectors[sample] @ vectors.T), axis=1)[:, 1:k + 1]
+    recall = np.mean([len(set(exact[r]) & set(ids[i])) / k for r, i in enumerate(sample)])
+    print(f"  Recall@{k} vs exact search: {recall:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Audit a food image dataset for mislabels and duplicates')
+    parser.add_argument('--dataset', type=str, default='dataset',
+                        help='Dataset directory with one folder per class')
+    parser.add_argument('--output', type=str, default='audit_report.json',
+                        help='Write the full report to this JSON file')
+    parser.add_argument('--neighbours', type=int, default=10,
+                        help='Nearest neighbours checked per image')
+    parser.add_argument('--min-share', type=float, default=0.6,
+                        help='Flag an image when at least this share of neighbours is one other class')
+    parser.add_argument('--dup-threshold', type=float, default=0.97,
+                        help='Cosine similarity for cross-class near-duplicates')
+    parser.add_argument('--dims', type=int, default=128,
+                        help='PCA dimensions for the index')
+    parser.add_argument('--batch-size', type=int, default=64,
+                        help='Embedding batch size')
+    parser.add_argument('--image-size', type=int, default=224,
+                        help='Embedding input size (smaller is faster, e.g. 160)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Recompute all embeddings')
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='Benchmark the index on this many random vectors instead')
+
+    args = parser.parse_args()
+
+    if args.synthetic:
+        benchmark_index(args.synthetic, args.dims, args.neighbours)
+        return
+
+    report = audit_dataset(args.dataset, k=args.neighbours, min_share=args.min_share,
+                           dup_threshold=args.dup_threshold, dims=args.dims,
+                           batch_size=args.batch_size, image_size=args.image_size,
+                           use_cache=not args.no_cache)
+    print_audit(report)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nReport saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
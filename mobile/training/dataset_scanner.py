@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Fast dataset scanner shared by the training and collection scripts
+
+Walks class folders with os.scandir, reads image dimensions from the JPEG/PNG
+headers without decoding pixels, scans class folders in parallel and caches
+per-folder results keyed by the folder's mtime, so unchanged classes are not
+rescanned on the next run.
+
+Note: a folder's mtime changes when files are added, removed or renamed, but
+not when an existing file is overwritten in place. Use --no-cache after
+editing images in place.
+
+Usage:
+    python dataset_scanner.py --dataset ./dataset
+    python dataset_scanner.py --dataset ./dataset --json scan_report.json
+"""
+import os
+import json
+import time
+import struct
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+CACHE_FILENAME = '.scan_cache.json'
+CACHE_VERSION = 1
+
+# Histogram buckets by the shorter image side
+SIZE_BINS = [(0, 224, '<224'), (224, 512, '224-511'), (512, 1024, '512-1023'),
+             (1024, 2048, '1024-2047'), (2048, float('inf'), '2048+')]
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# SOF markers carrying frame dimensions (excludes DHT, JPG and DAC)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                    0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Some encoders pad after the end-of-image marker, so look a little further back
+TAIL_BYTES = 32
+
+
+def _probe_jpeg(f) -> Tuple[int, int]:
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        if not byte:
+            raise ValueError("No JPEG frame header found")
+        if byte != b'\xff':
+            continue
+        marker = f.read(1)
+        while marker == b'\xff':
+            marker = f.read(1)
+        if not marker:
+            raise ValueError("No JPEG frame header found")
+        code = marker[0]
+        if code == 0xD8 or code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue  # Standalone markers have no length field
+        if code == 0xD9:
+            raise ValueError("JPEG ended before frame header")
+        segment = f.read(2)
+        if len(segment) < 2:
+            raise ValueError("Truncated JPEG segment")
+        length = struct.unpack('>H', segment)[0]
+        if code in JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                raise ValueError("Truncated JPEG frame header")
+            height, width = struct.unpack('>xHH', frame)
+            break
+        f.seek(length - 2, os.SEEK_CUR)
+
+    f.seek(-TAIL_BYTES, os.SEEK_END)
+    if b'\xff\xd9' not in f.read():
+        raise ValueError("Missing JPEG end marker (truncated file?)")
+    return width, height
+
+
+def _probe_png(f) -> Tuple[int, int]:
+    header = f.read(8)  # Chunk length + type, right after the signature
+    if len(header) < 8 or header[4:8] != b'IHDR':
+        raise ValueError("Missing PNG IHDR chunk")
+    size = f.read(8)
+    if len(size) < 8:
+        raise ValueError("Truncated PNG header")
+    width, height = struct.unpack('>II', size)
+
+    f.seek(-TAIL_BYTES, os.SEEK_END)
+    if b'IEND' not in f.read():
+        raise ValueError("Missing PNG IEND chunk (truncated file?)")
+    return width, height
+
+
+def probe_image_file(f) -> Tuple[int, int]:
+    """
+    Same as probe_image_header for an open, seekable binary file
+    (e.g. io.BytesIO of an archive member)
+    """
+    f.seek(0, os.SEEK_END)
+    if f.tell() < TAIL_BYTES:
+        raise ValueError("File too small to be an image")
+    f.seek(0)
+    signature = f.read(8)
+    if signature[:2] == b'\xff\xd8':
+        width, height = _probe_jpeg(f)
+    elif signature == PNG_SIGNATURE:
+        width, height = _probe_png(f)
+    else:
+        raise ValueError("Not a JPEG or PNG file")
+    if width == 0 or height == 0:
+        raise ValueError(f"Invalid dimensions: {width}x{height}")
+    return width, height
+
+
+def probe_image_header(path: str) -> Tuple[int, int]:
+    """
+    Read (width, height) from a JPEG or PNG header without decoding pixels
+    Raises ValueError for unreadable, truncated or non-image files
+    """
+    with open(path, 'rb') as f:
+        return probe_image_file(f)
+
+
+def scan_class_dir(class_path: str) -> Dict[str, Any]:
+    """
+    Probe every image in one class folder
+    Returns {'mtime_ns', 'images': [[name, w, h]], 'corrupt': [[name, reason]]}
+    """
+    images = []
+    corrupt = []
+    mtime_ns = os.stat(class_path).st_mtime_ns
+
+    with os.scandir(class_path) as entries:
+        for entry in entries:
+            if not entry.name.lower().endswith(IMAGE_EXTENSIONS) or not entry.is_file():
+                continue
+            try:
+                width, height = probe_image_header(entry.path)
+                images.append([entry.name, width, height])
+            except (OSError, ValueError, struct.error) as e:
+                corrupt.append([entry.name, str(e)])
+
+    images.sort()
+    corrupt.sort()
+    return {'mtime_ns': mtime_ns, 'images': images, 'corrupt': corrupt}
+
+
+def size_histogram(images: List[List]) -> Dict[str, int]:
+    """Count images per SIZE_BINS bucket of their shorter side"""
+    histogram = {label: 0 for _, _, label in SIZE_BINS}
+    for _, width, height in images:
+        short_side = min(width, height)
+        for low, high, label in SIZE_BINS:
+            if low <= short_side < high:
+                histogram[label] += 1
+                break
+    return histogram
+
+
+def _load_cache(cache_path: str) -> Dict[str, Any]:
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get('version') != CACHE_VERSION:
+        return {}
+    return cache.get('classes', {})
+
+
+def _save_cache(cache_path: str, classes: Dict[str, Any]):
+    tmp_path = cache_path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'classes': classes}, f,
+                      ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # Read-only dataset: scanning still works, just uncached
+
+
+def scan_dataset_tree(dataset_dir: str, workers: int = 8, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Scan a dataset/<class>/<image> tree and return a structured report
+
+    Report keys:
+        classes: {name: {'count', 'images', 'corrupt', 'size_histogram'}}
+        total_images, total_corrupt, size_histogram,
+        scanned_classes, cached_classes, elapsed_s
+    """
+    start_time = time.perf_counter()
+    cache_path = os.path.join(dataset_dir, CACHE_FILENAME)
+    cache = _load_cache(cache_path) if use_cache else {}
+
+    class_paths = {}
+    with os.scandir(dataset_dir) as entries:
+        for entry in entries:
+            if entry.is_dir() and not entry.name.startswith('.'):
+                class_paths[entry.name] = entry.path
+
+    results = {}
+    stale = []
+    for name, path in class_paths.items():
+        cached = cache.get(name)
+        if cached and cached.get('mtime_ns') == os.stat(path).st_mtime_ns:
+            results[name] = cached
+        else:
+            stale.append(name)
+
+    if stale:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for name, result in zip(stale, pool.map(scan_class_dir, [class_paths[n] for n in stale])):
+                results[name] = result
+        if use_cache:
+            _save_cache(cache_path, results)
+
+    report = {
+        'dataset_dir': dataset_dir,
+        'classes': {},
+        'total_images': 0,
+        'total_corrupt': 0,
+        'size_histogram': {label: 0 for _, _, label in SIZE_BINS},
+        'scanned_classes': len(stale),
+        'cached_classes': len(class_paths) - len(stale),
+    }
+    for name in sorted(results):
+        result = results[name]
+        histogram = size_histogram(result['images'])
+        report['classes'][name] = {
+            'count': len(result['images']),
+            'images': result['images'],
+            'corrupt': result['corrupt'],
+            'size_histogram': histogram,
+        }
+        report['total_images'] += len(result['images'])
+        report['total_corrupt'] += len(result['corrupt'])
+        for label, count in histogram.items():
+            report['size_histogram'][label] += count
+
+    report['elapsed_s'] = time.perf_counter() - start_time
+    return report
+
+
+def print_report(report: Dict[str, Any], min_images: int = 20):
+    """Print per-class counts, size histogram and corrupt files"""
+    for name, info in report['classes'].items():
+        status = "✓" if info['count'] >= min_images else "⚠️"
+        print(f"  {status} {name}: {info['count']} images")
+        for filename, reason in info['corrupt']:
+            print(f"     ❌ {filename}: {reason}")
+
+    print(f"\nImage sizes (shorter side):")
+    for label, count in report['size_histogram'].items():
+        print(f"  {label:>10s}: {count}")
+
+    print(f"\nScanned {report['scanned_classes']} classes, "
+          f"{report['cached_classes']} from cache in {report['elapsed_s'] * 1000:.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scan a food image dataset')
+    parser.add_argument('--dataset', type=str, default='dataset',
+                        help='Dataset directory with one folder per class')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Class folders scanned in parallel')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Ignore and do not update the scan cache')
+    parser.add_argument('--json', type=str, default=None,
+                        help='Write the full report to this JSON file')
+
+    args = parser.parse_args()
+
+    report = scan_dataset_tree(args.dataset, workers=args.workers, use_cache=not args.no_cache)
+    print_report(report)
+    print(f"\nTotal: {report['total_images']} images, {report['total_corrupt']} corrupt "
+          f"in {len(report['classes'])} classes")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Report saved to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
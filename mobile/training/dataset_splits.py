@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Deterministic train/validation/test splits keyed by image content
+
+Each image is assigned to a split from the MD5 of its bytes, and the result
+is frozen in a manifest (dataset/splits.json). Adding images never moves
+existing ones between splits, renamed or moved files keep their split, and
+identical images in different folders always land in the same split, so
+cached embeddings and evaluation results keyed to a split stay valid as the
+dataset grows.
+
+Hashes are cached in the manifest by file size and mtime, so refreshing it
+only reads new or modified images. The split fractions are frozen when the
+manifest is created; delete splits.json to choose new ones.
+
+Usage:
+    python dataset_splits.py --dataset ./dataset --val-fraction 0.15 --test-fraction 0.1
+    python train_uzbek_food_model.py split --dataset ./dataset
+"""
+import os
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from dataset_scanner import scan_dataset_tree
+from hash_index import file_digest
+
+MANIFEST_FILENAME = 'splits.json'
+MANIFEST_VERSION = 1
+SPLITS = ('train', 'validation', 'test')
+DEFAULT_FRACTIONS = {'validation': 0.2, 'test': 0.0}
+
+
+def manifest_path_for(dataset_dir: str) -> str:
+    return os.path.join(dataset_dir, MANIFEST_FILENAME)
+
+
+def assign_split(digest: str, fractions: Dict[str, float]) -> str:
+    """Map a hex digest to a split; depends only on the digest and the fractions"""
+    bucket = int(digest[:8], 16) / 0x100000000
+    cumulative = 0.0
+    for split in ('validation', 'test'):
+        cumulative += fractions.get(split, 0.0)
+        if bucket < cumulative:
+            return split
+    return 'train'
+
+
+def load_split_manifest(dataset_dir: str, manifest_path: Optional[str] = None) -> Optional[Dict]:
+    """Return the manifest for dataset_dir, or None if it does not exist yet"""
+    manifest_path = manifest_path or manifest_path_for(dataset_dir)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"{manifest_path} has an unsupported version; delete it to rebuild")
+    return manifest
+
+
+def _save_manifest(manifest_path: str, manifest: Dict):
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, manifest_path)
+
+
+def update_split_manifest(dataset_dir: str, val_fraction: Optional[float] = None,
+                          test_fraction: Optional[float] = None,
+                          manifest_path: Optional[str] = None,
+                          workers: int = 8) -> Tuple[Dict, Dict[str, int]]:
+    """
+    Bring the manifest in line with the dataset folder and save it
+
+    Existing entries keep their split; new or modified images are hashed and
+    assigned with the manifest's frozen fractions. val_fraction and
+    test_fraction only apply when the manifest is created (defaults:
+    DEFAULT_FRACTIONS). Corrupt images (as reported by dataset_scanner) are
+    left out.
+
+    Returns (manifest, changes) where changes counts added, modified, removed
+    and unchanged files.
+    """
+    manifest_path = manifest_path or manifest_path_for(dataset_dir)
+    manifest = load_split_manifest(dataset_dir, manifest_path)
+    requested = {'validation': val_fraction, 'test': test_fraction}
+    if manifest is None:
+        fractions = {split: DEFAULT_FRACTIONS[split] if value is None else value
+                     for split, value in requested.items()}
+        if min(fractions.values()) < 0 or sum(fractions.values()) >= 1:
+            raise ValueError("Validation and test fractions must be >= 0 and sum to less than 1")
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'fractions': fractions,
+            'classes': [],
+            'files': {},
+        }
+    elif any(value is not None and value != manifest['fractions'][split]
+             for split, value in requested.items()):
+        fractions = manifest['fractions']
+        print(f"⚠️  Keeping frozen split fractions from {manifest_path} "
+              f"(validation {fractions['validation']}, test {fractions['test']})")
+
+    report = scan_dataset_tree(dataset_dir)
+    old_files = manifest['files']
+    files = {}
+    to_hash = []
+    changes = {'added': 0, 'modified': 0, 'removed': 0, 'unchanged': 0}
+
+    for class_name, info in report['classes'].items():
+        for filename, _, _ in info['images']:
+            relpath = f"{class_name}/{filename}"
+            stat = os.stat(os.path.join(dataset_dir, class_name, filename))
+            entry = old_files.get(relpath)
+            if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                files[relpath] = entry
+                changes['unchanged'] += 1
+            else:
+                changes['modified' if entry else 'added'] += 1
+                to_hash.append((relpath, stat))
+
+    if to_hash:
+        paths = [os.path.join(dataset_dir, *relpath.split('/')) for relpath, _ in to_hash]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for (relpath, stat), digest in zip(to_hash, pool.map(file_digest, paths)):
+                digest = digest.hex()
+                files[relpath] = {
+                    'hash': digest,
+                    'split': assign_split(digest, manifest['fractions']),
+                    'size': stat.st_size,
+                    'mtime_ns': stat.st_mtime_ns,
+                }
+    changes['removed'] = len(set(old_files) - set(files))
+
+    manifest['classes'] = list(report['classes'])
+    manifest['files'] = dict(sorted(files.items()))
+    if changes['added'] or changes['modified'] or changes['removed'] or not os.path.exists(manifest_path):
+        _save_manifest(manifest_path, manifest)
+    return manifest, changes
+
+
+def split_entries(manifest: Dict, split: str) -> List[Tuple[str, str]]:
+    """(relative path, class name) for every image in split"""
+    return [(relpath, relpath.split('/', 1)[0])
+            for relpath, entry in manifest['files'].items() if entry['split'] == split]
+
+
+def replay_entries(manifest: Dict, split: str, classes: List[str], per_class: int) -> List[Tuple[str, str]]:
+    """
+    Up to per_class (relative path, class name) entries of split for each of classes
+
+    Images are taken in content-hash order, so every run replays the same ones.
+    """
+    chosen = {name: [] for name in classes}
+    for relpath, entry in sorted(manifest['files'].items(), key=lambda item: item[1]['hash']):
+        class_name = relpath.split('/', 1)[0]
+        if entry['split'] == split and class_name in chosen and len(chosen[class_name]) < per_class:
+            chosen[class_name].append(relpath)
+    return [(relpath, name) for name, relpaths in chosen.items() for relpath in relpaths]
+
+
+def split_counts(manifest: Dict) -> Dict[str, Dict[str, int]]:
+    """{class: {split: count}}"""
+    counts = {name: {split: 0 for split in SPLITS} for name in manifest['classes']}
+    for relpath, entry in manifest['files'].items():
+        counts[relpath.split('/', 1)[0]][entry['split']] += 1
+    return counts
+
+
+def print_split_summary(manifest: Dict, changes: Optional[Dict[str, int]] = None):
+    totals = {split: 0 for split in SPLITS}
+    for name, counts in split_counts(manifest).items():
+        status = "✓" if counts['validation'] else "⚠️"
+        print(f"  {status} {name}: " + ", ".join(f"{counts[s]} {s}" for s in SPLITS))
+        for split in SPLITS:
+            totals[split] += counts[split]
+
+    fractions = manifest['fractions']
+    print(f"\nSplits (validation {fractions['validation']:.0%}, test {fractions['test']:.0%}): "
+          + ", ".join(f"{totals[s]} {s}" for s in SPLITS))
+    if changes:
+        print(f"Manifest: {changes['added']} added, {changes['modified']} modified, "
+              f"{changes['removed']} removed, {changes['unchanged']} unchanged")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create or refresh the dataset split manifest')
+    parser.add_argument('--dataset', type=str, default='dataset',
+                        help='Dataset directory with one folder per class')
+    parser.add_argument('--val-fraction', type=float, default=None,
+                        help='Validation fraction when creating the manifest (default: 0.2)')
+    parser.add_argument('--test-fraction', type=float, default=None,
+                        help='Test fraction when creating the manifest (default: 0)')
+    parser.add_argument('--manifest', type=str, default=None,
+                        help=f'Manifest path (default: <dataset>/{MANIFEST_FILENAME})')
+
+    args = parser.parse_args()
+
+    manifest, changes = update_split_manifest(args.dataset, args.val_fraction, args.test_fraction,
+                                              manifest_path=args.manifest)
+    print_split_summary(manifest, changes)
+
+
+if __name__ == '__main__':
+    main()
@@ -25,6 +25,15 @@ from pathlib import Path
 from typing import List, Dict
 import urllib.parse
 
+# API base URLs can be pointed at a local stub (see benchmark_pipeline.py)
+UNSPLASH_API_URL = os.getenv('UNSPLASH_API_URL', 'https://api.unsplash.com')
+PEXELS_API_URL = os.getenv('PEXELS_API_URL', 'https://api.pexels.com')
+
+# Rate limiting delays in seconds
+IMAGE_DELAY = 0.1
+PAGE_DELAY = 1
+QUERY_DELAY = 2
+
 
 def download_from_unsplash(query: str, count: int, output_dir: Path) -> int:
     """Download images from Unsplash (free tier: 50/hour)"""
@@ -36,7 +45,7 @@ def download_from_unsplash(query: str, count: int, output_dir: Path) -> int:
     
     print(f"Downloading from Unsplash: {query}")
     
-    url = "https://api.unsplash.com/search/photos"
+    url = f"{UNSPLASH_API_URL}/search/photos"
     headers = {"Authorization": f"Client-ID {access_key}"}
     
     downloaded = 0
@@ -79,10 +88,10 @@ def download_from_unsplash(query: str, count: int, output_dir: Path) -> int:
                 downloaded += 1
                 print(f"  ✓ Downloaded {downloaded}/{count}: {filename.name}")
             
-            time.sleep(0.1)  # Rate limiting
+            time.sleep(IMAGE_DELAY)  # Rate limiting
         
         page += 1
-        time.sleep(1)  # Rate limiting between pages
+        time.sleep(PAGE_DELAY)  # Rate limiting between pages
     
     return downloaded
 
@@ -97,7 +106,7 @@ def download_from_pexels(query: str, count: int, output_dir: Path) -> int:
     
     print(f"Downloading from Pexels: {query}")
     
-    url = "https://api.pexels.com/v1/search"
+    url = f"{PEXELS_API_URL}/v1/search"
     headers = {"Authorization": api_key}
     
     downloaded = 0
@@ -140,10 +149,10 @@ def download_from_pexels(query: str, count: int, output_dir: Path) -> int:
                 downloaded += 1
                 print(f"  ✓ Downloaded {downloaded}/{count}: {filename.name}")
             
-            time.sleep(0.1)  # Rate limiting
+            time.sleep(IMAGE_DELAY)  # Rate limiting
         
         page += 1
-        time.sleep(1)  # Rate limiting between pages
+        time.sleep(PAGE_DELAY)  # Rate limiting between pages
     
     return downloaded
 
@@ -205,7 +214,7 @@ def download_food_images(food_label: str, count: int = 25, output_root: Path = P
         downloaded = download_from_pexels(query, per_source, output_dir)
         total_downloaded += downloaded
         
-        time.sleep(2)  # Rate limiting between queries
+        time.sleep(QUERY_DELAY)  # Rate limiting between queries
     
     final_count = existing + total_downloaded
     print(f"\n✓ {food_label}: {final_count}/{count} images")
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Compact multilingual prefix and fuzzy search over the food catalogue
+
+Built by generate_labels_from_database.py next to labels.txt. Every label
+and local name (en/ru/uz Cyrillic/uz Latin) is reduced to a search key:
+lowercased, Cyrillic transliterated to Uzbek Latin, and spelling variants
+folded (x/kh/h, q/k, apostrophes, doubled letters). So "плов", "palov" and
+"Plov" find the same food whatever script the query is typed in.
+
+The serialized index (search_index.json) holds:
+  - keys sorted for binary-search prefix lookup (a flattened trie), including
+    each word of multi-word names ("wedding plov" is found by "plov")
+  - a trigram inverted index over the keys for typo-tolerant matching,
+    verified with a bounded edit distance
+
+Queries do not need the raw database.
+
+Usage:
+    python food_search_index.py --index search_index.json --query "shashlk"
+    python food_search_index.py --index search_index.json --benchmark 10000
+    python food_search_index.py --synthetic 5000 --benchmark 10000
+"""
+import re
+import json
+import time
+import random
+import argparse
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List
+
+INDEX_VERSION = 1
+
+# Uzbek Cyrillic -> Latin (1995 alphabet), also used for Russian names
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'j',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'x', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'sh', 'ъ': "'", 'ы': 'i', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya', 'ў': "o'", 'қ': 'q', 'ғ': "g'", 'ҳ': 'h',
+}
+
+# Spelling variants that users mix up across transliteration schemes
+FOLDS = (("'", ''), ('kh', 'h'), ('x', 'h'), ('zh', 'j'), ('q', 'k'), ('gh', 'g'), ('w', 'v'))
+
+APOSTROPHES = re.compile("[ʻʼ‘’`´]")
+NON_WORD = re.compile(r"[^\w' ]+")
+REPEATS = re.compile(r'(.)\1+')
+
+MAX_PREFIX_MATCHES = 50
+MAX_FUZZY_CANDIDATES = 25
+
+
+def to_latin(text: str) -> str:
+    return ''.join(CYRILLIC_TO_LATIN.get(char, char) for char in text)
+
+
+def search_key(text: str) -> str:
+    """Script- and spelling-independent key for names and queries"""
+    text = unicodedata.normalize('NFKC', text).lower()
+    text = NON_WORD.sub(' ', APOSTROPHES.sub("'", text))
+    text = to_latin(text)
+    for old, new in FOLDS:
+        text = text.replace(old, new)
+    return ' '.join(REPEATS.sub(r'\1', text).split())
+
+
+def trigrams(key: str) -> List[str]:
+    padded = f"  {key} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def prefix_distance(query: str, key: str, limit: int) -> int:
+    """
+    Smallest edit distance between query and any prefix of key,
+    or limit + 1 as soon as it must exceed limit
+    """
+    key = key[:len(query) + limit]
+    previous = list(range(len(key) + 1))
+    for i, char in enumerate(query, 1):
+        current = [i]
+        best = i
+        for j, key_char in enumerate(key, 1):
+            cost = previous[j - 1] + (char != key_char)
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[-1] + 1 < cost:
+                cost = current[-1] + 1
+            current.append(cost)
+            if cost < best:
+                best = cost
+        if best > limit:
+            return limit + 1
+        previous = current
+    return min(previous)
+
+
+def typo_limit(query_key: str) -> int:
+    return 0 if len(query_key) < 3 else 1 if len(query_key) <= 5 else 2
+
+
+class FoodSearchIndex:
+    """
+    Prefix + trigram index over food names
+
+    search() returns foods ranked exact match, then prefix completions
+    (shortest first), then fuzzy matches by edit distance; matches that
+    start at a later word of a name rank just behind ones at its start.
+    """
+
+    def __init__(self, data: Dict):
+        self.labels = data['labels']
+        self.names = data['names']
+        self.name_food = data['name_food']
+        self.keys = data['keys']
+        self.key_name = data['key_name']
+        self.key_word = data['key_word']
+        self.postings = data['trigrams']
+
+    @classmethod
+    def build(cls, foods: List[Dict]):
+        """foods: [{'label': str, 'local_names': [str, ...]}, ...] in labels.txt order"""
+        labels, names, name_food, entries = [], [], [], set()
+        for food_id, food in enumerate(foods):
+            labels.append(food['label'])
+            seen_names = set()
+            for name in [food['label']] + list(food.get('local_names') or []):
+                if not name or name in seen_names:
+                    continue
+                seen_names.add(name)
+                name_id = len(names)
+                names.append(name)
+                name_food.append(food_id)
+                key = search_key(name)
+                words = key.split(' ')
+                # Full name plus every later word start, so "plov" finds "wedding plov"
+                for start in range(len(words)):
+                    entries.add((' '.join(words[start:]), name_id, min(start, 1)))
+
+        entries = sorted(entry for entry in entries if entry[0])
+        postings = {}
+        for key_id, (key, _, _) in enumerate(entries):
+            for gram in set(trigrams(key)):
+                postings.setdefault(gram, []).append(key_id)
+
+        return cls({
+            'labels': labels,
+            'names': names,
+            'name_food': name_food,
+            'keys': [key for key, _, _ in entries],
+            'key_name': [name_id for _, name_id, _ in entries],
+            'key_word': [word for _, _, word in entries],
+            'trigrams': postings,
+        })
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != INDEX_VERSION:
+            raise ValueError(f"{path} has an unsupported search index version")
+        return cls(data)
+
+    def save(self, path: str):
+        data = {
+            'version': INDEX_VERSION,
+            'labels': self.labels,
+            'names': self.names,
+            'name_food': self.name_food,
+            'keys': self.keys,
+            'key_name': self.key_name,
+            'key_word': self.key_word,
+            'trigrams': self.postings,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    def _add(self, results: Dict, key_id: int, score: float, match: str):
+        name_id = self.key_name[key_id]
+        food_id = self.name_food[name_id]
+        score += 0.5 * self.key_word[key_id]  # Match starts at a later word of the name
+        if food_id not in results or score < results[food_id]['score']:
+            results[food_id] = {
+                'label': self.labels[food_id],
+                'name': self.names[name_id],
+                'score': round(score, 3),
+                'match': match,
+            }
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """
+        Ranked matches as [{'label', 'name', 'score', 'match'}]
+        (match is 'exact', 'prefix' or 'fuzzy'; lower score is better)
+        """
+        key = search_key(query)
+        if not key:
+            return []
+        results = {}
+
+        start = bisect_left(self.keys, key)
+        for key_id in range(start, min(start + MAX_PREFIX_MATCHES, len(self.keys))):
+            candidate = self.keys[key_id]
+            if not candidate.startswith(key):
+                break
+            if candidate == key:
+                self._add(results, key_id, 0.0, 'exact')
+            else:
+                self._add(results, key_id, 1.0 + (len(candidate) - len(key)) / 100, 'prefix')
+
+        limit_distance = typo_limit(key)
+        exact = any(result['match'] == 'exact' for result in results.values())
+        if len(results) < limit and limit_distance and not exact:
+            # Drop the end-of-word gram so half-typed names still match longer keys;
+            # each edit breaks at most 3 trigrams
+            grams = set(trigrams(key)[:-1])
+            min_overlap = max(1, len(grams) - 3 * limit_distance)
+            overlap = Counter()
+            for gram in grams:
+                overlap.update(self.postings.get(gram, ()))
+            for key_id, shared in overlap.most_common(MAX_FUZZY_CANDIDATES):
+                if shared < min_overlap:
+                    break
+                candidate = self.keys[key_id]
+                distance = prefix_distance(key, candidate, limit_distance)
+                if distance <= limit_distance:
+                    extra = max(len(candidate) - len(key), 0) / 100
+                    self._add(results, key_id, 2.0 + distance + extra, 'fuzzy')
+
+        return sorted(results.values(), key=lambda item: item['score'])[:limit]
+
+
+def make_typo(text: str, rng: random.Random) -> str:
+    if len(text) < 4:
+        return text
+    i = rng.randrange(1, len(text) - 1)
+    edit = rng.choice(('drop', 'swap', 'replace'))
+    if edit == 'drop':
+        return text[:i] + text[i + 1:]
+    if edit == 'swap':
+        return text[:i - 1] + text[i] + text[i - 1] + text[i + 1:]
+    return text[:i] + rng.choice('aeioukmnrst') + text[i + 1:]
+
+
+def synthetic_foods(count: int, seed: int = 0) -> List[Dict]:
+    """Random Latin names with Cyrillic spellings, for benchmarking at scale"""
+    consonants = [('b', 'б'), ('d', 'д'), ('g', 'г'), ('j', 'ж'), ('k', 'к'), ('l', 'л'), ('m', 'м'),
+                  ('n', 'н'), ('p', 'п'), ('q', 'қ'), ('r', 'р'), ('s', 'с'), ('t', 'т'), ('x', 'х'),
+                  ('sh', 'ш'), ('ch', 'ч'), ('z', 'з'), ('v', 'в'), ('y', 'й')]
+    vowels = [('a', 'а'), ('o', 'о'), ('i', 'и'), ('u', 'у'), ('e', 'е')]
+    syllables = [(c[0] + v[0] + coda[0], c[1] + v[1] + coda[1])
+                 for c in consonants for v in vowels for coda in consonants + [('', '')]]
+    rng = random.Random(seed)
+    foods, seen = [], set()
+    while len(foods) < count:
+        parts = [rng.choice(syllables) for _ in range(rng.randint(2, 3))]
+        label = ''.join(latin for latin, _ in parts)
+        if rng.random() < 0.2:
+            label = f"{rng.choice(('fried', 'beef', 'wedding', 'green'))} {label}"
+        if label in seen:
+            continue
+        seen.add(label)
+        foods.append({'label': label, 'local_names': [''.join(cyr for _, cyr in parts)]})
+    return foods
+
+
+def benchmark(index: FoodSearchIndex, count: int, seed: int = 0):
+    """Time exact, prefix, cross-script and typo queries; report latency and top-5 hit rate"""
+    rng = random.Random(seed)
+    kinds = {'exact': [], 'prefix': [], 'typo': [], 'local name': []}
+    for _ in range(count):
+        name_id = rng.randrange(len(index.names))
+        name = index.names[name_id]
+        food = index.labels[index.name_food[name_id]]
+        kinds['exact'].append((name, food))
+        kinds['prefix'].append((name[:max(3, len(name) // 2)], food))
+        kinds['typo'].append((make_typo(name, rng), food))
+        if name != food:
+            kinds['local name'].append((name, food))
+
+    print(f"Search benchmark: {len(index.labels)} foods, {len(index.names)} names, {len(index.keys)} keys")
+    for kind, queries in kinds.items():
+        if not queries:
+            continue
+        latencies = []
+        hits = 0
+        for query, expected in queries:
+            start_time = time.perf_counter()
+            results = index.search(query, limit=5)
+            latencies.append((time.perf_counter() - start_time) * 1e6)
+            hits += any(result['label'] == expected for result in results)
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"  {kind:>10s}: {sum(latencies) / len(latencies):7.1f}µs avg, {p99:7.1f}µs p99, "
+              f"top-5 hit rate {hits / len(queries):.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query or benchmark the food search index')
+    parser.add_argument('--index', type=str, default='search_index.json',
+                        help='Search index from generate_labels_from_database.py')
+    parser.add_argument('--query', type=str, action='append', default=[],
+                        help='Query to run (repeatable)')
+    parser.add_argument('--limit', type=int, default=10, help='Results per query')
+    parser.add_argument('--benchmark', type=int, default=0,
+                        help='Run this many generated queries of each kind')
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='Build an index over this many synthetic foods instead of loading --index')
+
+    args = parser.parse_args()
+
+    if args.synthetic:
+        start_time = time.perf_counter()
+        index = FoodSearchIndex.build(synthetic_foods(args.synthetic))
+        print(f"Built synthetic index in {(time.perf_counter() - start_time) * 1000:.0f}ms")
+    else:
+        start_time = time.perf_counter()
+        index = FoodSearchIndex.load(args.index)
+        print(f"Loaded {args.index} in {(time.perf_counter() - start_time) * 1000:.1f}ms")
+
+    for query in args.query:
+        print(f"\n{query!r}:")
+        for result in index.search(query, args.limit):
+            print(f"  {result['label']:<30s} {result['name']:<30s} {result['match']:>6s} {result['score']}")
+
+    if args.benchmark:
+        benchmark(index, args.benchmark)
+
+
+if __name__ == '__main__':
+    main()
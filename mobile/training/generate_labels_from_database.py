@@ -2,12 +2,15 @@
 """
 Generate TFLite labels.txt from nutritionDatabase.ts
 Automatically sync food labels between database and AI model
+Also builds search_index.json (see food_search_index.py) over labels and local names
 """
 import json
 import re
 from pathlib import Path
 from typing import List, Dict
 
+from food_search_index import FoodSearchIndex
+
 
 def extract_foods_from_typescript(ts_file: str) -> List[Dict[str, any]]:
     """Extract food items from TypeScript nutrition database"""
@@ -24,19 +27,21 @@ def extract_foods_from_typescript(ts_file: str) -> List[Dict[str, any]]:
     # Extract individual food entries (simple regex approach)
     foods = []
     # Match { label: "...", local_names: [...], category: "...", ... }
-    food_pattern = r'\{\s*label:\s*"([^"]+)"[^}]+?category:\s*"([^"]+)"[^}]+?kcal_per_100g:\s*(\d+)[^}]+?protein_g:\s*([\d.]+)[^}]+?carbs_g:\s*([\d.]+)[^}]+?fat_g:\s*([\d.]+)[^}]+?notes:\s*"([^"]+)"'
+    food_pattern = r'\{\s*label:\s*"([^"]+)"(?:[^}]*?local_names:\s*\[([^\]]*)\])?[^}]+?category:\s*"([^"]+)"[^}]+?kcal_per_100g:\s*(\d+)[^}]+?protein_g:\s*([\d.]+)[^}]+?carbs_g:\s*([\d.]+)[^}]+?fat_g:\s*([\d.]+)[^}]+?notes:\s*"([^"]+)"'
     
     for match in re.finditer(food_pattern, array_content, re.DOTALL):
         label = match.group(1)
-        category = match.group(2)
-        kcal = int(match.group(3))
-        protein = float(match.group(4))
-        carbs = float(match.group(5))
-        fat = float(match.group(6))
-        notes = match.group(7)
+        local_names = re.findall(r'"([^"]+)"', match.group(2) or '')
+        category = match.group(3)
+        kcal = int(match.group(4))
+        protein = float(match.group(5))
+        carbs = float(match.group(6))
+        fat = float(match.group(7))
+        notes = match.group(8)
         
         foods.append({
             'label': label,
+            'local_names': local_names,
             'category': category,
             'kcal_per_100g': kcal,
             'protein_g': protein,
@@ -62,6 +67,7 @@ def generate_class_mapping_json(foods: List[Dict[str, any]], output_path: str):
     for idx, food in enumerate(foods):
         mapping[food['label']] = {
             'index': idx,
+            'local_names': food['local_names'],
             'category': food['category'],
             'kcal_per_100g': food['kcal_per_100g'],
             'protein_g': food['protein_g'],
@@ -75,6 +81,13 @@ def generate_class_mapping_json(foods: List[Dict[str, any]], output_path: str):
     print(f"✓ Generated {output_path} with nutrition info for {len(foods)} foods")
 
 
+def generate_search_index(foods: List[Dict[str, any]], output_path: str):
+    """Generate prefix/fuzzy search index over labels and local names"""
+    index = FoodSearchIndex.build(foods)
+    index.save(output_path)
+    print(f"✓ Generated {output_path} with {len(index.names)} names ({len(index.keys)} search keys)")
+
+
 def generate_category_report(foods: List[Dict[str, any]]):
     """Generate statistics report by category"""
     categories = {}
@@ -141,6 +154,7 @@ def main():
     # Generate outputs
     generate_labels_txt(foods, str(script_dir / 'labels.txt'))
     generate_class_mapping_json(foods, str(script_dir / 'class_mapping.json'))
+    generate_search_index(foods, str(script_dir / 'search_index.json'))
     generate_category_report(foods)
     
     print("\n" + "="*60)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Persistent, memory-mapped index of image content hashes
+
+Stores fixed-width 16-byte digests in an open-addressing hash table inside a
+memory-mapped file, so lookups are O(1) and the process's own memory use
+stays flat however many images are indexed (the OS pages the table in and
+out). Each entry carries a one-byte tag saying where the image was seen:
+dataset, validation, test, rejected or reference.
+
+File layout:
+    header (32 bytes): magic, version, capacity, count
+    capacity slots of 17 bytes: 16-byte digest + 1-byte tag (0 = empty)
+
+Usage:
+    python hash_index.py build --index dataset_hashes.idx --dir dataset:dataset --dir test_images:test
+    python hash_index.py stats --index dataset_hashes.idx
+"""
+import os
+import mmap
+import struct
+import hashlib
+import argparse
+from typing import Optional
+
+MAGIC = b'FHIX'
+VERSION = 1
+HEADER = struct.Struct('<4sIQQ8x')
+DIGEST_SIZE = 16
+SLOT_SIZE = DIGEST_SIZE + 1
+MAX_LOAD = 0.7
+INITIAL_CAPACITY = 1 << 16
+
+TAGS = {'dataset': 1, 'validation': 2, 'test': 3, 'rejected': 4, 'reference': 5}
+TAG_NAMES = {value: name for name, value in TAGS.items()}
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> bytes:
+    """16-byte MD5 digest of a file, read in chunks"""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def bytes_digest(data: bytes) -> bytes:
+    """16-byte MD5 digest of in-memory bytes (same key as file_digest)"""
+    return hashlib.md5(data).digest()
+
+
+class HashIndex:
+    """
+    Open-addressing hash table of digest -> tag in a memory-mapped file
+
+    With path=None the table lives in anonymous memory and is discarded on
+    close, which gives the same API for single-run deduplication.
+    """
+
+    def __init__(self, path: Optional[str] = None, capacity: int = INITIAL_CAPACITY):
+        self.path = path
+        if path and os.path.exists(path):
+            self._open(path)
+        else:
+            self._create(path, capacity)
+
+    def _create(self, path: Optional[str], capacity: int):
+        capacity = 1 << max(capacity - 1, 1).bit_length()  # Round up to a power of two
+        size = HEADER.size + capacity * SLOT_SIZE
+        if path:
+            with open(path, 'wb') as f:
+                f.truncate(size)
+            self._open(path, initialize=(capacity, 0))
+        else:
+            self.file = None
+            self.mm = mmap.mmap(-1, size)
+            self._write_header(capacity, 0)
+
+    def _open(self, path: str, initialize=None):
+        self.file = open(path, 'r+b')
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+        if initialize:
+            self._write_header(*initialize)
+            return
+        magic, version, self.capacity, self.count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a hash index (or has an unsupported version)")
+
+    def _write_header(self, capacity: int, count: int):
+        self.capacity = capacity
+        self.count = count
+        HEADER.pack_into(self.mm, 0, MAGIC, VERSION, capacity, count)
+
+    def _slot(self, digest: bytes) -> int:
+        """Offset of the slot holding digest, or of the empty slot where it belongs"""
+        mask = self.capacity - 1
+        index = int.from_bytes(digest[:8], 'little') & mask
+        mm = self.mm
+        while True:
+            offset = HEADER.size + index * SLOT_SIZE
+            if mm[offset + DIGEST_SIZE] == 0 or mm[offset:offset + DIGEST_SIZE] == digest:
+                return offset
+            index = (index + 1) & mask
+
+    def get(self, digest: bytes) -> Optional[str]:
+        """Return the tag name stored for digest, or None"""
+        offset = self._slot(digest)
+        tag = self.mm[offset + DIGEST_SIZE]
+        return TAG_NAMES.get(tag) if tag else None
+
+    def __contains__(self, digest: bytes) -> bool:
+        return self.get(digest) is not None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, digest: bytes, tag: str = 'dataset') -> Optional[str]:
+        """
+        Insert digest with tag unless already present
+        Returns the existing tag name if it was present, else None
+        """
+        if len(digest) != DIGEST_SIZE:
+            raise ValueError(f"Expected a {DIGEST_SIZE}-byte digest, got {len(digest)} bytes")
+        offset = self._slot(digest)
+        existing = self.mm[offset + DIGEST_SIZE]
+        if existing:
+            return TAG_NAMES.get(existing)
+
+        if (self.count + 1) > self.capacity * MAX_LOAD:
+            self._grow()
+            offset = self._slot(digest)
+        self.mm[offset:offset + SLOT_SIZE] = digest + bytes([TAGS[tag]])
+        self._write_header(self.capacity, self.count + 1)
+        return None
+
+    def set(self, digest: bytes, tag: str):
+        """Insert digest or replace its tag"""
+        if self.add(digest, tag) is not None:
+            offset = self._slot(digest)
+            self.mm[offset + DIGEST_SIZE] = TAGS[tag]
+
+    def _grow(self):
+        """Rehash into a table twice the size, streaming slot by slot"""
+        old_mm, old_file, old_capacity = self.mm, self.file, self.capacity
+        tmp_path = self.path + '.tmp' if self.path else None
+        self._create(tmp_path, old_capacity * 2)
+
+        for index in range(old_capacity):
+            offset = HEADER.size + index * SLOT_SIZE
+            tag = old_mm[offset + DIGEST_SIZE]
+            if tag:
+                digest = old_mm[offset:offset + DIGEST_SIZE]
+                new_offset = self._slot(digest)
+                self.mm[new_offset:new_offset + SLOT_SIZE] = old_mm[offset:offset + SLOT_SIZE]
+                self.count += 1
+        self._write_header(self.capacity, self.count)
+
+        old_mm.close()
+        if old_file:
+            old_file.close()
+        if self.path:
+            self.mm.flush()
+            self.mm.close()
+            self.file.close()
+            os.replace(tmp_path, self.path)
+            self._open(self.path)
+
+    def index_directory(self, root: str, tag: str) -> int:
+        """Add every image under root (recursively) with tag; returns new entries"""
+        added = 0
+        stack = [root]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        stack.append(entry.path)
+                    elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                        if self.add(file_digest(entry.path), tag) is None:
+                            added += 1
+        return added
+
+    def tag_counts(self):
+        counts = {name: 0 for name in TAGS}
+        for index in range(self.capacity):
+            tag = self.mm[HEADER.size + index * SLOT_SIZE + DIGEST_SIZE]
+            if tag:
+                counts[TAG_NAMES[tag]] += 1
+        return counts
+
+    def flush(self):
+        if self.file:
+            self.mm.flush()
+
+    def close(self):
+        if self.mm is not None:
+            self.flush()
+            self.mm.close()
+            self.mm = None
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def parse_dir_tag(value: str):
+    """Parse DIR[:TAG] (default tag: reference)"""
+    directory, _, tag = value.rpartition(':') if ':' in value else (value, '', 'reference')
+    if tag not in TAGS:
+        raise argparse.ArgumentTypeError(f"unknown tag '{tag}' (choose from {', '.join(TAGS)})")
+    return directory, tag
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Persistent image hash index')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help='Add image folders to the index')
+    build.add_argument('--index', type=str, required=True, help='Index file')
+    build.add_argument('--dir', type=parse_dir_tag, action='append', required=True,
+                       help=f"Folder to index as DIR[:TAG], TAG one of {', '.join(TAGS)}")
+
+    stats = subparsers.add_parser('stats', help='Show entry counts per tag')
+    stats.add_argument('--index', type=str, required=True, help='Index file')
+
+    args = parser.parse_args()
+
+    with HashIndex(args.index) as index:
+        if args.command == 'build':
+            for directory, tag in args.dir:
+                added = index.index_directory(directory, tag)
+                print(f"✓ {directory} ({tag}): {added} new images")
+        counts = index.tag_counts()
+        print(f"\nIndex {args.index}: {len(index)} entries, capacity {index.capacity}")
+        for name, count in counts.items():
+            print(f"  {name:>10s}: {count}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+"""
+Local batching inference server for the exported TFLite model
+
+Loads model.tflite, labels.txt and class_mapping.json once, keeps a pool of
+interpreters and groups concurrent requests into micro-batches (up to
+--max-batch images, waiting at most --max-wait-ms for a batch to fill).
+
+Usage:
+    python inference_server.py serve --model model.tflite --port 8080
+    python inference_server.py loadgen --url http://localhost:8080 --image plov.jpg \\
+        --requests 500 --concurrency 16
+
+API:
+    POST /classify?top_k=5&grams=250   body: raw JPEG/PNG bytes
+    POST /classify                     body: {"url": "<meals.photo_url>", "top_k": 5, "grams": 250}
+                                       (public http(s) hosts only; see --allowed-hosts)
+    GET  /health
+    GET  /metrics                      batching and prediction-cache hit/saved-time metrics
+"""
+import os
+import io
+import json
+import math
+import time
+import socket
+import ipaddress
+import http.client
+import queue
+import argparse
+import threading
+import urllib.request
+import urllib.parse
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from prediction_cache import PredictionCache
+from nutrition_engine import NutritionEngine
+
+IMG_SIZE = 224
+CACHED_TOP_K = 10
+MAX_BODY_BYTES = 20 * 1024 * 1024
+URL_TIMEOUT = 10
+
+
+def load_interpreter_class():
+    """Prefer the small tflite-runtime package, fall back to full TensorFlow"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+def load_labels(labels_path: str) -> List[str]:
+    with open(labels_path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f]
+
+
+def load_nutrition(mapping_path: Optional[str]) -> Dict[str, Dict]:
+    """
+    Load per-label nutrition from class_mapping.json
+    The training script writes a plain {label: index} mapping without
+    nutrition; only the generate_labels_from_database.py format has it.
+    """
+    if not mapping_path:
+        return {}
+    try:
+        with open(mapping_path, 'r', encoding='utf-8') as f:
+            mapping = json.load(f)
+    except OSError:
+        print(f"⚠️  {mapping_path} not found, serving without nutrition data")
+        return {}
+    return {label: {k: v for k, v in data.items() if k != 'index'}
+            for label, data in mapping.items() if isinstance(data, dict)}
+
+
+class ModelWorker:
+    """One interpreter plus the logic to run a batch of decoded images on it"""
+
+    def __init__(self, model_path: str):
+        self.interpreter = load_interpreter_class()(model_path=model_path)
+        self.input = self.interpreter.get_input_details()[0]
+        self.outputs = self.interpreter.get_output_details()
+        # Raw-input exports take uint8 frames of any size, one at a time
+        self.raw_input = self.input['dtype'] == np.uint8
+        self.batch_size = None
+
+    def preprocess(self, image: Image.Image) -> np.ndarray:
+        image = image.convert('RGB')
+        if self.raw_input:
+            return np.asarray(image, dtype=np.uint8)
+        # Nearest-neighbour matches load_img() used in training
+        image = image.resize((IMG_SIZE, IMG_SIZE), Image.NEAREST)
+        return np.asarray(image, dtype=np.float32) / 255.0
+
+    def _invoke(self, batch: np.ndarray):
+        if self.raw_input or self.batch_size != len(batch):
+            self.interpreter.resize_tensor_input(self.input['index'], batch.shape)
+            self.interpreter.allocate_tensors()
+            self.batch_size = None if self.raw_input else len(batch)
+        self.interpreter.set_tensor(self.input['index'], batch)
+        self.interpreter.invoke()
+
+        if len(self.outputs) == 1:
+            return self.interpreter.get_tensor(self.outputs[0]['index']), None
+        for detail in self.outputs:
+            if np.issubdtype(detail['dtype'], np.integer):
+                indices = self.interpreter.get_tensor(detail['index'])
+            else:
+                scores = self.interpreter.get_tensor(detail['index'])
+        return scores, indices
+
+    def run(self, arrays: List[np.ndarray], top_k: int):
+        """Return a list of (indices, scores) per image"""
+        if self.raw_input:
+            results = []
+            for array in arrays:
+                scores, indices = self._invoke(array[np.newaxis])
+                results.append((indices[0][:top_k], scores[0][:top_k]))
+            return results
+
+        probabilities, _ = self._invoke(np.stack(arrays))
+        k = min(top_k, probabilities.shape[1])
+        top = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(probabilities, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return list(zip(top, top_scores))
+
+
+class MicroBatcher:
+    """
+    Shared request queue drained by a pool of interpreter threads
+
+    Each thread takes the first waiting request, then keeps collecting until
+    it has max_batch requests or max_wait_ms has passed since that first one.
+    """
+
+    def __init__(self, model_path: str, workers: int = 2, max_batch: int = 8, max_wait_ms: float = 5.0):
+        self.requests = queue.Queue()
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.workers = [ModelWorker(model_path) for _ in range(workers)]
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'batches': 0, 'errors': 0, 'inference_ms': 0.0}
+        for worker in self.workers:
+            threading.Thread(target=self._loop, args=(worker,), daemon=True).start()
+
+    def preprocess(self, image: Image.Image) -> np.ndarray:
+        return self.workers[0].preprocess(image)
+
+    def submit(self, array: np.ndarray, top_k: int) -> Future:
+        future = Future()
+        self.requests.put((array, top_k, future))
+        return future
+
+    def _collect(self):
+        batch = [self.requests.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self, worker: ModelWorker):
+        while True:
+            batch = self._collect()
+            top_k = max(item[1] for item in batch)
+            start_time = time.perf_counter()
+            try:
+                results = worker.run([item[0] for item in batch], top_k)
+            except Exception as e:
+                with self.lock:
+                    self.stats['errors'] += len(batch)
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+            with self.lock:
+                self.stats['requests'] += len(batch)
+                self.stats['batches'] += 1
+                self.stats['inference_ms'] += elapsed_ms
+            for (_, k, future), (indices, scores) in zip(batch, results):
+                future.set_result((indices[:k], scores[:k]))
+
+    def metrics(self) -> Dict[str, float]:
+        with self.lock:
+            stats = dict(self.stats)
+        stats['mean_batch_size'] = stats['requests'] / max(stats['batches'], 1)
+        stats['queue_depth'] = self.requests.qsize()
+        return stats
+
+
+class InferenceService:
+    """Decode images, run them through the batcher and join labels with nutrition"""
+
+    def __init__(self, model_path: str, labels_path: str, mapping_path: Optional[str],
+                 workers: int, max_batch: int, max_wait_ms: float,
+                 cache: Optional[PredictionCache] = None):
+        self.labels = load_labels(labels_path)
+        self.nutrition = load_nutrition(mapping_path)
+        self.engine = NutritionEngine.from_mapping(self.labels, self.nutrition)
+        self.batcher = MicroBatcher(model_path, workers=workers, max_batch=max_batch,
+                                    max_wait_ms=max_wait_ms)
+        self.cache = cache
+
+    def _predict(self, image_bytes: bytes, top_k: int):
+        image = Image.open(io.BytesIO(image_bytes))
+        array = self.batcher.preprocess(image)
+        return self.batcher.submit(array, top_k).result()
+
+    def classify(self, image_bytes: bytes, top_k: int = 5, grams: Optional[float] = None) -> Dict:
+        start_time = time.perf_counter()
+        if self.cache is None:
+            indices, scores = self._predict(image_bytes, top_k)
+        else:
+            # Compute at least CACHED_TOP_K so smaller top_k requests reuse the entry;
+            # entries narrower than top_k (e.g. top-5 from the test command) are recomputed
+            k = max(top_k, CACHED_TOP_K)
+            indices, scores = self.cache.get_or_compute(image_bytes, lambda: self._predict(image_bytes, k),
+                                                        width=top_k, compute_width=k)
+            indices, scores = indices[:top_k], scores[:top_k]
+
+        predictions = []
+        for idx, score in zip(indices, scores):
+            label = self.labels[int(idx)]
+            predictions.append({
+                'label': label,
+                'score': float(score),
+                'nutrition': self.nutrition.get(label),
+            })
+        result = {'predictions': predictions}
+        if grams is not None:
+            # Probability-weighted over the returned top-k classes
+            estimate = self.engine.estimate_from_topk(indices, scores, grams)
+            result['portion'] = {'grams': grams, **(self.engine.to_dicts(estimate)[0] or {})}
+        result['latency_ms'] = (time.perf_counter() - start_time) * 1000
+        return result
+
+    def metrics(self) -> Dict:
+        metrics = self.batcher.metrics()
+        if self.cache is not None:
+            metrics['cache'] = self.cache.metrics()
+        return metrics
+
+
+def parse_grams(value) -> float:
+    grams = float(value)
+    if not math.isfinite(grams) or grams < 0:
+        raise ValueError("grams must be a finite, non-negative number")
+    return grams
+
+
+def check_photo_url(url: str, allowed_hosts: Optional[List[str]] = None):
+    """Reject non-http(s) URLs and, if allowed_hosts is set, hosts outside it (or their subdomains)"""
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise ValueError("Only http(s) photo URLs are supported")
+    host = parsed.hostname.lower()
+    if allowed_hosts and not any(host == allowed or host.endswith('.' + allowed) for allowed in allowed_hosts):
+        raise ValueError(f"Photo host {host} is not allowed")
+
+
+def check_public_address(sock: socket.socket):
+    """Refuse connections that ended up at loopback, private, link-local or reserved addresses"""
+    address = ipaddress.ip_address(sock.getpeername()[0].split('%', 1)[0])
+    if getattr(address, 'ipv4_mapped', None):
+        address = address.ipv4_mapped
+    if not address.is_global:
+        sock.close()
+        raise ValueError(f"Refusing to fetch photos from non-public address {address}")
+
+
+# The peer address is checked after connecting (and before any TLS handshake or
+# request), so DNS answers that change between lookups cannot reach internal hosts
+class PublicHTTPConnection(http.client.HTTPConnection):
+    def connect(self):
+        super().connect()
+        check_public_address(self.sock)
+
+
+class PublicHTTPSConnection(http.client.HTTPSConnection, PublicHTTPConnection):
+    pass
+
+
+class PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(PublicHTTPConnection, req)
+
+
+class PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(PublicHTTPSConnection, req, context=self._context)
+
+
+def fetch_url(url: str, allowed_hosts: Optional[List[str]] = None) -> bytes:
+    """
+    Download a photo from a public http(s) URL
+
+    Redirects are re-checked, proxies are bypassed, and the download is capped at
+    MAX_BODY_BYTES and URL_TIMEOUT seconds overall.
+    """
+    check_photo_url(url, allowed_hosts)
+
+    class RedirectHandler(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, req, fp, code, msg, headers, newurl):
+            check_photo_url(newurl, allowed_hosts)
+            return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}), PublicHTTPHandler,
+                                         PublicHTTPSHandler, RedirectHandler)
+    deadline = time.monotonic() + URL_TIMEOUT
+    with opener.open(url, timeout=URL_TIMEOUT) as response:
+        if int(response.headers.get('Content-Length') or 0) > MAX_BODY_BYTES:
+            raise ValueError("Photo too large")
+        chunks, size = [], 0
+        while True:
+            if time.monotonic() > deadline:
+                raise ValueError("Photo download timed out")
+            chunk = response.read(64 * 1024)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise ValueError("Photo too large")
+            chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def make_handler(service: InferenceService, allowed_hosts: Optional[List[str]] = None):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send_json(self, status: int, payload: Dict):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = urllib.parse.urlparse(self.path).path
+            if path == '/health':
+                self._send_json(200, {'status': 'ok', 'classes': len(service.labels)})
+            elif path == '/metrics':
+                self._send_json(200, service.metrics())
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            parsed = urllib.parse.urlparse(self.path)
+            if parsed.path != '/classify':
+                self._send_json(404, {'error': 'not found'})
+                return
+
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+            except ValueError:
+                length = 0
+            if length <= 0 or length > MAX_BODY_BYTES:
+                self._send_json(413 if length else 400, {'error': 'missing or oversized body'})
+                return
+            body = self.rfile.read(length)
+
+            try:
+                params = urllib.parse.parse_qs(parsed.query)
+                top_k = int(params.get('top_k', ['5'])[0])
+                grams = parse_grams(params['grams'][0]) if 'grams' in params else None
+                if self.headers.get('Content-Type', '').startswith('application/json'):
+                    request = json.loads(body)
+                    top_k = int(request.get('top_k', top_k))
+                    grams = parse_grams(request['grams']) if 'grams' in request else grams
+                    body = fetch_url(request['url'], allowed_hosts)
+                self._send_json(200, service.classify(body, top_k=max(1, top_k), grams=grams))
+            except (ValueError, TypeError, KeyError, OSError) as e:
+                self._send_json(400, {'error': str(e)})
+            except Exception as e:
+                self._send_json(500, {'error': str(e)})
+
+        def log_message(self, format, *args):
+            pass  # Per-request logging would dominate at high request rates
+
+    return Handler
+
+
+def serve(args):
+    cache = None
+    if args.cache_mb > 0:
+        cache = PredictionCache(model_path=args.model, max_bytes=args.cache_mb * 1024 * 1024,
+                                disk_dir=args.cache_dir)
+    service = InferenceService(args.model, args.labels, args.mapping, workers=args.workers,
+                               max_batch=args.max_batch, max_wait_ms=args.max_wait_ms, cache=cache)
+    allowed_hosts = [host.strip().lower() for host in args.allowed_hosts.split(',') if host.strip()]
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service, allowed_hosts))
+    print(f"✓ Serving {args.model} ({len(service.labels)} classes) on http://{args.host}:{args.port}")
+    print(f"  Interpreters: {args.workers}, max batch: {args.max_batch}, max wait: {args.max_wait_ms}ms")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+        server.server_close()
+
+
+def loadgen(args):
+    with open(args.image, 'rb') as f:
+        image_bytes = f.read()
+    url = args.url.rstrip('/') + f'/classify?top_k={args.top_k}'
+
+    def payload(i):
+        # Decoders stop at the image's end marker, so a unique trailer gives every
+        # request a different cache key without changing the pixels
+        if args.same_payload:
+            return image_bytes
+        return image_bytes + f'loadgen-{os.getpid()}-{i}'.encode('ascii')
+
+    def send_one(i):
+        request = urllib.request.Request(url, data=payload(i), method='POST',
+                                         headers={'Content-Type': 'application/octet-stream'})
+        start_time = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+            return (time.perf_counter() - start_time) * 1000, True
+        except OSError:
+            return (time.perf_counter() - start_time) * 1000, False
+
+    # Warm up every interpreter before measuring
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(send_one, range(args.concurrency)))
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(send_one, range(args.concurrency, args.concurrency + args.requests)))
+    elapsed = time.perf_counter() - start_time
+
+    latencies = np.array([ms for ms, ok in results if ok])
+    errors = sum(1 for _, ok in results if not ok)
+    print(f"\n{'='*60}")
+    print(f"Load test: {args.requests} requests, concurrency {args.concurrency}")
+    print(f"{'='*60}")
+    print(f"  Throughput: {len(latencies) / elapsed:.1f} req/s")
+    print(f"  Errors: {errors}")
+    if len(latencies):
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        print(f"  Latency p50: {p50:.1f}ms  p90: {p90:.1f}ms  p99: {p99:.1f}ms  max: {latencies.max():.1f}ms")
+
+    try:
+        with urllib.request.urlopen(args.url.rstrip('/') + '/metrics', timeout=10) as response:
+            metrics = json.loads(response.read())
+        print(f"  Server mean batch size: {metrics['mean_batch_size']:.2f}")
+        if 'cache' in metrics:
+            cache = metrics['cache']
+            print(f"  Server cache hit rate: {cache['hit_rate']:.1%} ({cache['misses']} misses)")
+    except (OSError, ValueError, KeyError):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batching TFLite inference server')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='Run the HTTP inference server')
+    serve_parser.add_argument('--model', type=str, default='model.tflite', help='TFLite model')
+    serve_parser.add_argument('--labels', type=str, default='labels.txt', help='Labels file')
+    serve_parser.add_argument('--mapping', type=str, default='class_mapping.json',
+                              help='class_mapping.json with nutrition data')
+    serve_parser.add_argument('--host', type=str, default='127.0.0.1', help='Bind address')
+    serve_parser.add_argument('--port', type=int, default=8080, help='Port')
+    serve_parser.add_argument('--workers', type=int, default=2, help='Interpreters in the pool')
+    serve_parser.add_argument('--max-batch', type=int, default=8, help='Maximum micro-batch size')
+    serve_parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                              help='Maximum time to wait for a micro-batch to fill')
+    serve_parser.add_argument('--allowed-hosts', type=str, default='',
+                              help='Comma-separated hosts (and their subdomains) photo URLs may use, '
+                                   'e.g. your Supabase storage host (default: any public host)')
+    serve_parser.add_argument('--cache-mb', type=int, default=64,
+                              help='In-memory prediction cache size in MB (0 = disabled)')
+    serve_parser.add_argument('--cache-dir', type=str, default=None,
+                              help='Also cache predictions on disk in this directory')
+    serve_parser.set_defaults(handler=serve)
+
+    load_parser = subparsers.add_parser('loadgen', help='Benchmark a running server')
+    load_parser.add_argument('--url', type=str, default='http://127.0.0.1:8080', help='Server URL')
+    load_parser.add_argument('--image', type=str, required=True, help='Image to send')
+    load_parser.add_argument('--requests', type=int, default=500, help='Total requests')
+    load_parser.add_argument('--concurrency', type=int, default=16, help='Concurrent clients')
+    load_parser.add_argument('--top-k', type=int, default=5, help='Predictions per request')
+    load_parser.add_argument('--same-payload', action='store_true',
+                             help='Send identical bytes every time (measures prediction-cache hits)')
+    load_parser.set_defaults(handler=loadgen)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Vectorized nutrition estimation over batches of model predictions
+
+Loads labels.txt and class_mapping.json (as written by
+generate_labels_from_database.py) into a (num_classes, 4) table of
+kcal/protein/carbs/fat per 100 g once, then turns batches of softmax vectors
+plus portion weights into calories and macros with array operations.
+
+Usage:
+    python nutrition_engine.py --benchmark 100000
+"""
+import json
+import time
+import argparse
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+
+NUTRIENTS = ('kcal_per_100g', 'protein_g', 'carbs_g', 'fat_g')
+
+
+class NutritionEngine:
+    """
+    Columnar per-100 g nutrition table indexed by model output
+
+    Classes without nutrition data (e.g. a plain {label: index} mapping from
+    the training script) are NaN in the table; weighted estimates ignore them
+    and renormalise over the remaining classes.
+    """
+
+    def __init__(self, labels: List[str], table: np.ndarray):
+        self.labels = labels
+        self.known = ~np.isnan(table).any(axis=1)
+        self.table = np.where(self.known[:, None], table, 0.0)
+
+    @classmethod
+    def from_files(cls, labels_path: str = 'labels.txt', mapping_path: str = 'class_mapping.json'):
+        with open(labels_path, 'r', encoding='utf-8') as f:
+            labels = [line.strip() for line in f]
+        with open(mapping_path, 'r', encoding='utf-8') as f:
+            mapping = json.load(f)
+
+        engine = cls.from_mapping(labels, mapping)
+        missing = len(labels) - int(engine.known.sum())
+        if missing:
+            print(f"⚠️  {missing}/{len(labels)} labels have no nutrition data in {mapping_path}")
+        return engine
+
+    @classmethod
+    def from_mapping(cls, labels: List[str], mapping: dict):
+        """Build from an already loaded {label: {nutrient: value}} mapping"""
+        table = np.full((len(labels), len(NUTRIENTS)), np.nan)
+        for idx, label in enumerate(labels):
+            data = mapping.get(label)
+            if isinstance(data, dict):
+                table[idx] = [data.get(key, np.nan) for key in NUTRIENTS]
+        return cls(labels, table)
+
+    def _scale(self, per_100g: np.ndarray, grams: Union[float, Sequence[float]]) -> np.ndarray:
+        grams = np.asarray(grams, dtype=np.float64)
+        if grams.ndim == 1:
+            grams = grams[:, None]
+        return per_100g * (grams / 100.0)
+
+    def _weighted(self, indices: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        # Drop classes without nutrition data and renormalise the rest
+        weights = weights * self.known[indices]
+        totals = weights.sum(axis=1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weights = weights / totals
+        return np.einsum('nk,nkf->nf', weights, self.table[indices])
+
+    def estimate(self, probabilities: np.ndarray, grams: Union[float, Sequence[float]],
+                 mode: str = 'topk', top_k: int = 3) -> np.ndarray:
+        """
+        Estimate nutrition for a batch of predictions
+
+        Args:
+            probabilities: (N, num_classes) softmax outputs
+            grams: Portion weight per prediction, scalar or (N,)
+            mode: 'topk' for probability-weighted over the top_k classes,
+                  'argmax' for the single most likely class
+            top_k: Classes to weight over in 'topk' mode
+
+        Returns:
+            (N, 4) array of kcal, protein, carbs, fat for each portion
+            (NaN where no candidate class has nutrition data)
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        if mode == 'argmax':
+            indices = probabilities.argmax(axis=1)
+            per_100g = np.where(self.known[indices][:, None], self.table[indices], np.nan)
+            return self._scale(per_100g, grams)
+        if mode != 'topk':
+            raise ValueError(f"Unknown mode '{mode}' (expected 'topk' or 'argmax')")
+
+        k = min(top_k, probabilities.shape[1])
+        indices = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+        weights = np.take_along_axis(probabilities, indices, axis=1)
+        return self._scale(self._weighted(indices, weights), grams)
+
+    def estimate_from_topk(self, indices: np.ndarray, scores: np.ndarray,
+                           grams: Union[float, Sequence[float]]) -> np.ndarray:
+        """
+        Same as estimate(mode='topk') for models that already output top-k
+        (raw-input TFLite exports and the inference server)
+        """
+        indices = np.atleast_2d(np.asarray(indices, dtype=np.int64))
+        scores = np.atleast_2d(np.asarray(scores, dtype=np.float64))
+        return self._scale(self._weighted(indices, scores), grams)
+
+    def to_dicts(self, estimates: np.ndarray) -> List[Optional[dict]]:
+        """Convert (N, 4) estimates to JSON-friendly dicts (None when unknown)"""
+        keys = ('kcal', 'protein_g', 'carbs_g', 'fat_g')
+        return [None if np.isnan(row).any() else dict(zip(keys, np.round(row, 1).tolist()))
+                for row in estimates]
+
+
+def benchmark(engine: NutritionEngine, count: int, top_k: int):
+    rng = np.random.default_rng(0)
+    logits = rng.standard_normal((count, len(engine.labels))).astype(np.float32)
+    probabilities = np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+    grams = rng.uniform(50, 500, size=count)
+
+    print(f"Benchmark: {count} predictions × {len(engine.labels)} classes")
+    for mode in ('argmax', 'topk'):
+        engine.estimate(probabilities[:10], grams[:10], mode=mode, top_k=top_k)  # Warm-up
+        start_time = time.perf_counter()
+        engine.estimate(probabilities, grams, mode=mode, top_k=top_k)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        print(f"  {mode:>6s}: {elapsed_ms:.1f}ms ({count / elapsed_ms * 1000:,.0f} predictions/sec)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vectorized nutrition estimation')
+    parser.add_argument('--labels', type=str, default='labels.txt', help='Labels file')
+    parser.add_argument('--mapping', type=str, default='class_mapping.json',
+                        help='class_mapping.json with nutrition data')
+    parser.add_argument('--benchmark', type=int, default=10000,
+                        help='Number of random predictions to score')
+    parser.add_argument('--top-k', type=int, default=3, help='Classes weighted in topk mode')
+    parser.add_argument('--synthetic-classes', type=int, default=0,
+                        help='Benchmark on a random table with this many classes instead of the files')
+
+    args = parser.parse_args()
+
+    if args.synthetic_classes:
+        rng = np.random.default_rng(0)
+        table = rng.uniform(0, 500, size=(args.synthetic_classes, len(NUTRIENTS)))
+        engine = NutritionEngine([f'class_{i}' for i in range(args.synthetic_classes)], table)
+    else:
+        engine = NutritionEngine.from_files(args.labels, args.mapping)
+    benchmark(engine, args.benchmark, args.top_k)
+
+
+if __name__ == '__main__':
+    main()
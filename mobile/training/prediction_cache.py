@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for model predictions
+
+Entries are keyed by a fast hash of the image bytes plus a checksum of the
+model file, so re-uploaded photos and repeated evaluation images skip
+inference, and swapping the model never serves stale predictions.
+
+Two tiers:
+  - In-memory LRU, evicted by total size in bytes
+  - Optional on-disk tier (one .npz per entry), shared across runs
+
+Each entry records its width: the top-k it was computed for. A lookup that
+needs more predictions than an entry holds is a miss, so a top-5 entry
+written by the test command never answers a top-20 server request.
+
+Used by train_uzbek_food_model.py (test command) and inference_server.py.
+"""
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import xxhash
+
+    def content_hash(data: bytes) -> str:
+        return xxhash.xxh3_128_hexdigest(data)
+except ImportError:
+    def content_hash(data: bytes) -> str:
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+# Rough per-entry bookkeeping overhead on top of the array bytes
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def file_checksum(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Checksum of a file, read in chunks"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """
+    Two-tier prediction cache
+
+    Values are tuples of NumPy arrays (e.g. top-k indices and scores) plus
+    the width they were computed for. Thread-safe; the inference server
+    shares one instance across handlers.
+    """
+
+    def __init__(self, model_path: Optional[str] = None, model_checksum: Optional[str] = None,
+                 max_bytes: int = 64 * 1024 * 1024, disk_dir: Optional[str] = None):
+        if model_checksum is None:
+            model_checksum = file_checksum(model_path)
+        self.model_checksum = model_checksum
+        self.max_bytes = max_bytes
+        self.disk_dir = os.path.join(disk_dir, model_checksum) if disk_dir else None
+        self.entries = OrderedDict()  # key -> (arrays, nbytes, inference_ms, width)
+        self.memory_bytes = 0
+        self.lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'saved_ms': 0.0}
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], key + '.npz')
+
+    def _remember(self, key: str, arrays: Tuple[np.ndarray, ...], inference_ms: float, width: int):
+        nbytes = sum(a.nbytes for a in arrays) + ENTRY_OVERHEAD_BYTES
+        if nbytes > self.max_bytes:
+            return
+        if key in self.entries:
+            self.memory_bytes -= self.entries.pop(key)[1]
+        self.entries[key] = (arrays, nbytes, inference_ms, width)
+        self.memory_bytes += nbytes
+        while self.memory_bytes > self.max_bytes:
+            _, (_, evicted_bytes, _, _) = self.entries.popitem(last=False)
+            self.memory_bytes -= evicted_bytes
+
+    def _load(self, key: str):
+        """(arrays, inference_ms, width) from the disk tier, or None"""
+        try:
+            with np.load(self._disk_path(key)) as data:
+                inference_ms = float(data['inference_ms'])
+                count = sum(1 for name in data.files if name.startswith('arr_'))
+                arrays = tuple(data[f'arr_{i}'] for i in range(count))
+                # Entries written before widths were stored hold at least len(arrays[0])
+                width = int(data['width']) if 'width' in data.files else len(arrays[0]) if arrays else 0
+        except (OSError, KeyError, ValueError):
+            return None
+        return arrays, inference_ms, width
+
+    def get(self, image_bytes: bytes, width: int = 0) -> Optional[Tuple[np.ndarray, ...]]:
+        """Return cached arrays for these image bytes computed for at least width, or None"""
+        key = content_hash(image_bytes)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[3] >= width:
+                self.entries.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                self.stats['saved_ms'] += entry[2]
+                return entry[0]
+
+        loaded = self._load(key) if self.disk_dir else None
+        if loaded is not None and loaded[2] >= width:
+            arrays, inference_ms, stored_width = loaded
+            with self.lock:
+                self._remember(key, arrays, inference_ms, stored_width)
+                self.stats['disk_hits'] += 1
+                self.stats['saved_ms'] += inference_ms
+            return arrays
+
+        with self.lock:
+            self.stats['misses'] += 1
+        return None
+
+    def put(self, image_bytes: bytes, arrays: Tuple[np.ndarray, ...], inference_ms: float,
+            width: Optional[int] = None):
+        """
+        Store arrays computed for these image bytes
+        width is the top-k they were computed for (default: length of the first array)
+        """
+        key = content_hash(image_bytes)
+        arrays = tuple(np.asarray(a) for a in arrays)
+        if width is None:
+            width = len(arrays[0]) if arrays else 0
+        with self.lock:
+            self._remember(key, arrays, inference_ms, width)
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + f'.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, *arrays, inference_ms=np.float64(inference_ms), width=np.int64(width))
+            os.replace(tmp_path, path)
+
+    def get_or_compute(self, image_bytes: bytes, compute: Callable[[], Tuple[np.ndarray, ...]],
+                       width: int = 0, compute_width: Optional[int] = None) -> Tuple[np.ndarray, ...]:
+        """
+        Return cached arrays at least width wide, or call compute() and cache its
+        result as compute_width wide (default: width)
+        """
+        arrays = self.get(image_bytes, width)
+        if arrays is None:
+            start_time = time.perf_counter()
+            arrays = compute()
+            self.put(image_bytes, arrays, (time.perf_counter() - start_time) * 1000,
+                     width=compute_width or width or None)
+        return arrays
+
+    def metrics(self) -> Dict[str, float]:
+        with self.lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self.entries)
+            stats['memory_bytes'] = self.memory_bytes
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['lookups'] = lookups
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def print_metrics(self):
+        stats = self.metrics()
+        print(f"\nPrediction cache: {stats['hit_rate']:.1%} hit rate "
+              f"({stats['memory_hits']} memory, {stats['disk_hits']} disk, {stats['misses']} misses)")
+        print(f"  Inference time saved: {stats['saved_ms'] / 1000:.1f}s")
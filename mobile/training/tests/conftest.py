@@ -0,0 +1,12 @@
+"""
+Shared pytest setup for the training scripts
+
+The scripts import each other as top-level modules (they are run from
+mobile/training), so the tests put that directory on sys.path.
+"""
+import os
+import sys
+
+TRAINING_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if TRAINING_DIR not in sys.path:
+    sys.path.insert(0, TRAINING_DIR)
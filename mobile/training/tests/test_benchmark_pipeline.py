@@ -0,0 +1,74 @@
+"""
+Pipeline benchmark: a tiny synthetic run produces a complete report
+"""
+import json
+import sys
+
+import pytest
+
+pytest.importorskip('PIL.Image')
+pytest.importorskip('requests')
+
+import benchmark_pipeline
+from benchmark_pipeline import compare_results
+
+STAGES = ['download', 'organize', 'scan', 'input_pipeline', 'train_steps', 'convert', 'inference']
+
+
+@pytest.fixture(scope='module')
+def results(tmp_path_factory):
+    folder = tmp_path_factory.mktemp('benchmark')
+    output = folder / 'results.json'
+    argv = sys.argv
+    sys.argv = ['benchmark_pipeline.py', '--classes', '2', '--images', '4', '--image-size', '256x240',
+                '--min-size', '32', '--download-images', '2', '--batch-size', '2', '--batches', '2',
+                '--train-steps', '1', '--runs', '2', '--workdir', str(folder / 'work'),
+                '--output', str(output)]
+    try:
+        assert benchmark_pipeline.main() == 0
+    finally:
+        sys.argv = argv
+    with open(output, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_report_keys(results):
+    assert results['version'] == benchmark_pipeline.RESULTS_VERSION
+    assert set(results['environment']) >= {'python', 'platform', 'cpu_count', 'git_commit',
+                                           'tensorflow', 'numpy', 'PIL'}
+    assert results['environment']['git_commit']
+    assert results['config']['classes'] == 2 and results['config']['image_sizes'] == ['256x240']
+    assert results['corpus']['images'] == 8
+    assert list(results['stages']) == STAGES
+
+
+def test_stage_metrics(results):
+    stages = results['stages']
+    if results['environment']['tensorflow'] is None:
+        assert 'missing dependency' in stages['input_pipeline']['skipped']
+        assert stages['inference'] == {'skipped': 'needs convert'}
+        measured = STAGES[:3]
+    else:
+        measured = STAGES
+    for name in measured:
+        assert stages[name]['seconds'] >= 0, name
+    for name in measured:
+        if name != 'convert':
+            assert stages[name]['items'] > 0 and stages[name]['items_per_sec'] > 0, name
+
+    assert stages['download']['items'] >= 4 and stages['download']['http_requests'] > 0
+    assert stages['organize']['items'] == 8
+    assert stages['scan']['items'] == 8 and 'warm_seconds' in stages['scan']
+    if 'inference' in measured:
+        assert stages['convert']['megabytes'] > 0
+        assert stages['inference']['ms_per_image'] > 0
+
+
+def test_compare_results_flags_slower_stages(results, capsys):
+    baseline = json.loads(json.dumps(results))
+    baseline['stages']['organize']['seconds'] = results['stages']['organize']['seconds'] / 10
+    baseline['stages']['scan']['seconds'] = results['stages']['scan']['seconds'] * 10
+
+    assert compare_results(results, baseline, tolerance=0.25) == ['organize']
+    assert compare_results(results, results, tolerance=0.25) == []
+    assert 'different configuration' not in capsys.readouterr().out
@@ -0,0 +1,57 @@
+"""
+Non-training commands start fast and never load TensorFlow or pandas
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import TRAINING_DIR
+
+SCRIPT = os.path.join(TRAINING_DIR, 'train_uzbek_food_model.py')
+HEAVY_MODULES = ['tensorflow', 'keras', 'pandas', 'matplotlib']
+# Twice the default `benchmark --startup-budget`, leaving room for slow CI machines
+STARTUP_BUDGET = 1.0
+
+RUN_AND_REPORT = """
+import runpy, sys
+sys.argv = sys.argv[1:]
+try:
+    runpy.run_path(sys.argv[0], run_name='__main__')
+except SystemExit as e:
+    if e.code not in (None, 0):
+        raise
+print('HEAVY:' + ','.join(m for m in {heavy!r} if m in sys.modules))
+""".format(heavy=HEAVY_MODULES)
+
+
+def run_cli(*args):
+    result = subprocess.run([sys.executable, '-c', RUN_AND_REPORT, SCRIPT, *args],
+                            capture_output=True, text=True, cwd=TRAINING_DIR, check=True)
+    heavy = result.stdout.rsplit('HEAVY:', 1)[1].strip()
+    return [m for m in heavy.split(',') if m]
+
+
+@pytest.fixture
+def dataset_dir(tmp_path):
+    Image = pytest.importorskip('PIL.Image')
+    for name in ('plov', 'somsa'):
+        (tmp_path / name).mkdir()
+        Image.new('RGB', (8, 8), (200, 120, 40)).save(tmp_path / name / '0.jpg')
+    return tmp_path
+
+
+def test_help_does_not_import_heavy_modules():
+    assert run_cli('--help') == []
+
+
+def test_scan_does_not_import_heavy_modules(dataset_dir):
+    assert run_cli('scan', '--dataset', str(dataset_dir), '--no-cache') == []
+
+
+def test_help_within_startup_budget():
+    from train_uzbek_food_model import measure_startup
+
+    elapsed = measure_startup(['--help'])
+    assert elapsed <= STARTUP_BUDGET, f"--help took {elapsed * 1000:.0f}ms"
@@ -0,0 +1,187 @@
+"""
+collect_images: organizing folders and importing archives into the dataset
+"""
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+from collect_images import VALIDATION_LEVELS, import_archive, organize_images, validate_image
+from hash_index import HashIndex, bytes_digest
+
+MIN_SIZE = 32
+
+
+def image_bytes(seed, size=(48, 40), fmt='JPEG'):
+    """Small image with distinct content per seed"""
+    image = Image.new('RGB', size, (seed * 37 % 256, seed * 11 % 256, seed * 5 % 256))
+    image.putpixel((0, 0), (seed % 256, 0, 0))
+    output = io.BytesIO()
+    image.save(output, fmt)
+    return output.getvalue()
+
+
+def make_source(root, classes):
+    """classes: {name: count}; returns the source folder"""
+    seed = 0
+    for name, count in classes.items():
+        (root / name).mkdir(parents=True)
+        for i in range(count):
+            seed += 1
+            (root / name / f'{i}.jpg').write_bytes(image_bytes(seed))
+    return root
+
+
+def test_rerun_with_hash_index_counts_existing_images(tmp_path, capsys):
+    source = make_source(tmp_path / 'raw', {'plov': 6, 'somsa': 4})
+    output = tmp_path / 'dataset'
+
+    with HashIndex(str(tmp_path / 'hashes.idx')) as index:
+        first = organize_images(str(source), str(output), min_images=3, min_size=MIN_SIZE, hash_index=index)
+    with HashIndex(str(tmp_path / 'hashes.idx')) as index:
+        capsys.readouterr()
+        second = organize_images(str(source), str(output), min_images=3, min_size=MIN_SIZE, hash_index=index)
+    out = capsys.readouterr().out
+
+    assert first['added_images'] == 10 and first['total_images'] == 10
+    assert second['added_images'] == 0
+    assert second['existing_images'] == 10
+    assert second['duplicates'] == 0
+    assert second['total_images'] == 10 and second['incomplete_classes'] == 0
+    assert 'No valid images found' not in out and 'more images' not in out
+    assert 'Dataset is ready for training' in out
+
+
+def test_duplicates_within_a_run_and_invalid_images(tmp_path):
+    source = make_source(tmp_path / 'raw', {'plov': 3})
+    (source / 'plov' / 'copy.jpg').write_bytes((source / 'plov' / '0.jpg').read_bytes())
+    (source / 'plov' / 'tiny.jpg').write_bytes(image_bytes(99, size=(8, 8)))
+    (source / 'plov' / 'broken.jpg').write_bytes(image_bytes(100)[:200])
+
+    stats = organize_images(str(source), str(tmp_path / 'dataset'), min_images=5, min_size=MIN_SIZE)
+
+    assert stats['added_images'] == 3
+    assert stats['duplicates'] == 1
+    assert stats['invalid_images'] == 2
+    assert stats['incomplete_classes'] == 1
+
+
+
+@pytest.fixture(params=['JPEG', 'PNG'])
+def image_files(request, tmp_path):
+    """Good, truncated and non-image files of one format"""
+    suffix = '.jpg' if request.param == 'JPEG' else '.png'
+    data = image_bytes(7, size=(64, 64), fmt=request.param)
+    files = {'good': tmp_path / f'good{suffix}', 'truncated': tmp_path / f'truncated{suffix}',
+             'not_image': tmp_path / f'notes{suffix}'}
+    files['good'].write_bytes(data)
+    files['truncated'].write_bytes(data[:len(data) // 2])
+    files['not_image'].write_bytes(b'just some text, not pixels' * 10)
+    return files
+
+
+@pytest.mark.parametrize('level', VALIDATION_LEVELS)
+def test_validate_image_levels(image_files, level):
+    assert validate_image(str(image_files['good']), MIN_SIZE, level) == (True, None)
+    for kind in ('truncated', 'not_image'):
+        is_valid, error = validate_image(str(image_files[kind]), MIN_SIZE, level)
+        assert not is_valid and error, kind
+
+
+@pytest.mark.parametrize('level', VALIDATION_LEVELS)
+def test_validate_image_bytes_and_size(image_files, level):
+    data = image_files['good'].read_bytes()
+    assert validate_image(io.BytesIO(data), MIN_SIZE, level)[0]
+    assert not validate_image(io.BytesIO(data[:len(data) // 2]), MIN_SIZE, level)[0]
+
+    is_valid, error = validate_image(str(image_files['good']), 128, level)
+    assert not is_valid and error.startswith('Too small')
+
+ARCHIVE_MEMBERS = {
+    'food-101/images/pho/1.jpg': image_bytes(1),
+    'food-101/images/pho/2.jpg': image_bytes(2),
+    'food-101/images/pho/2_copy.jpg': image_bytes(2),
+    'food-101/images/pho/broken.jpg': image_bytes(3)[:200],
+    'food-101/images/samsa/1.png': image_bytes(4, size=(400, 300), fmt='PNG'),
+    'food-101/images/samsa/notes.txt': b'not an image',
+    'food-101/images/sushi/1.jpg': image_bytes(5),
+    'food-101/README.txt': b'readme',
+}
+
+
+def write_archive(path):
+    if str(path).endswith('.zip'):
+        with zipfile.ZipFile(path, 'w') as archive:
+            for name, data in ARCHIVE_MEMBERS.items():
+                archive.writestr(name, data)
+    else:
+        with tarfile.open(path, 'w:gz') as archive:
+            for name, data in ARCHIVE_MEMBERS.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+    return str(path)
+
+
+@pytest.fixture(params=['food.tar.gz', 'food.zip'])
+def archive_path(request, tmp_path):
+    return write_archive(tmp_path / request.param)
+
+
+def listing(output):
+    return sorted(os.path.relpath(os.path.join(root, name), output)
+                  for root, _, files in os.walk(output) for name in files)
+
+
+def test_import_archive_maps_filters_and_resizes(archive_path, tmp_path):
+    output = tmp_path / 'dataset'
+    stats = import_archive(archive_path, str(output), min_images=1, min_size=MIN_SIZE,
+                           label_map={'pho': 'pho_soup', 'samsa': 'somsa'},
+                           labels=['pho_soup', 'somsa'], max_side=200, workers=2)
+
+    # sushi is not in the labels, README and notes.txt are not images
+    assert listing(output) == ['pho_soup/1.jpg', 'pho_soup/2.jpg', 'somsa/1.jpg']
+    assert stats['added_images'] == 3
+    assert stats['duplicates'] == 1
+    assert stats['invalid_images'] == 1
+
+    # The PNG was downscaled to 200px on the longer side and re-encoded as JPEG
+    with Image.open(output / 'somsa' / '1.jpg') as image:
+        assert image.format == 'JPEG' and image.size == (200, 150)
+    # Small images are copied byte for byte
+    assert (output / 'pho_soup' / '1.jpg').read_bytes() == ARCHIVE_MEMBERS['food-101/images/pho/1.jpg']
+
+
+def test_import_archive_respects_min_size_when_resizing(archive_path, tmp_path):
+    output = tmp_path / 'dataset'
+    import_archive(archive_path, str(output), min_images=1, min_size=200, labels=['samsa'], max_side=100)
+    with Image.open(output / 'samsa' / '1.jpg') as image:
+        assert min(image.size) == 200
+
+
+def test_reimport_with_hash_index(archive_path, tmp_path, capsys):
+    output = tmp_path / 'dataset'
+    index_path = str(tmp_path / 'hashes.idx')
+    with HashIndex(index_path) as index:
+        first = import_archive(archive_path, str(output), min_images=1, min_size=MIN_SIZE, hash_index=index)
+    assert first['added_images'] == 4 and first['invalid_images'] == 1
+
+    with HashIndex(index_path) as index:
+        assert index.get(bytes_digest(ARCHIVE_MEMBERS['food-101/images/pho/broken.jpg'])) == 'rejected'
+        capsys.readouterr()
+        second = import_archive(archive_path, str(output), min_images=1, min_size=MIN_SIZE, hash_index=index)
+    out = capsys.readouterr().out
+
+    assert listing(output) == ['pho/1.jpg', 'pho/2.jpg', 'samsa/1.png', 'sushi/1.jpg']
+    assert second['added_images'] == 0
+    # 2_copy.jpg was a duplicate on the first run; its content is now simply in the dataset
+    assert second['existing_images'] == 5
+    assert second['duplicates'] == 0
+    assert second['invalid_images'] == 1  # Rejected on the first run, not decoded again
+    assert second['total_images'] == 4
+    assert 'No valid images found' not in out
+    assert 'Dataset is ready for training' in out
@@ -0,0 +1,80 @@
+"""
+Dataset audit: IVF search agrees with exhaustive search and planted errors are flagged
+"""
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from dataset_audit import IVFIndex, _normalize, find_suspects, self_neighbours
+
+K = 10
+
+
+def clustered_vectors(count, dims=32, num_classes=20, noise=0.6, seed=0):
+    """Unit vectors around one random center per class; returns (vectors, labels)"""
+    rng = np.random.default_rng(seed)
+    centers = _normalize(rng.standard_normal((num_classes, dims)).astype(np.float32))
+    labels = rng.integers(num_classes, size=count)
+    vectors = _normalize(centers[labels] + noise * rng.standard_normal((count, dims)).astype(np.float32)
+                         / np.sqrt(dims))
+    return vectors, labels
+
+
+def exact_neighbours(vectors, k):
+    sims = vectors @ vectors.T
+    np.fill_diagonal(sims, -np.inf)
+    return np.argsort(-sims, axis=1)[:, :k]
+
+
+def recall(ids, exact):
+    return np.mean([len(set(row) & set(expected)) / exact.shape[1] for row, expected in zip(ids, exact)])
+
+
+def test_ivf_recall_against_exhaustive_search():
+    vectors, _ = clustered_vectors(3000)
+    index = IVFIndex().build(vectors)
+    sims, ids = self_neighbours(index, K)
+
+    assert ids.shape == (3000, K) and (ids >= 0).all()
+    assert not (ids == np.arange(3000)[:, None]).any()
+    assert (np.diff(sims, axis=1) <= 0).all()
+    assert recall(ids, exact_neighbours(vectors, K)) >= 0.9
+
+
+def test_probing_every_list_is_exact():
+    vectors, _ = clustered_vectors(1000, noise=2.0, seed=1)
+    index = IVFIndex(n_lists=16, n_probe=16).build(vectors)
+    sims, ids = self_neighbours(index, K)
+
+    exact = exact_neighbours(vectors, K)
+    assert recall(ids, exact) == 1.0
+    np.testing.assert_allclose(sims, np.take_along_axis(vectors @ vectors.T, exact, axis=1), rtol=1e-5)
+
+
+def test_planted_mislabel_and_near_duplicate_are_flagged():
+    vectors, labels = clustered_vectors(600, num_classes=4, noise=0.3, seed=2)
+    classes = ['plov', 'somsa', 'lagman', 'manti']
+    rng = np.random.default_rng(3)
+
+    # A plov image filed under somsa
+    mislabeled = int(np.flatnonzero(labels == 0)[0])
+    labels[mislabeled] = 1
+    # A near-identical copy of a lagman image filed under manti, appended at the end
+    original = int(np.flatnonzero(labels == 2)[0])
+    copy = _normalize(vectors[original:original + 1] + 1e-3 * rng.standard_normal((1, vectors.shape[1])))
+    vectors = np.concatenate([vectors, copy.astype(np.float32)])
+    labels = np.append(labels, 3)
+    relpaths = [f'{classes[label]}/{i}.jpg' for i, label in enumerate(labels)]
+
+    sims, ids = self_neighbours(IVFIndex().build(vectors), K)
+    report = find_suspects(relpaths, labels, classes, sims, ids)
+
+    suspects = {item['file']: item for item in report['suspected_mislabels']}
+    assert suspects[relpaths[mislabeled]]['neighbour_label'] == 'plov'
+    assert suspects[relpaths[-1]]['neighbour_label'] == 'lagman'
+    assert len(suspects) == 2
+
+    assert len(report['cross_class_duplicates']) == 1
+    pair = report['cross_class_duplicates'][0]
+    assert {pair['a'], pair['b']} == {relpaths[original], relpaths[-1]}
+    assert pair['similarity'] >= 0.97
@@ -0,0 +1,75 @@
+"""
+Split manifest: assignments stay put as the dataset grows
+"""
+import os
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+from dataset_splits import (assign_split, load_split_manifest, split_counts, split_entries,
+                            update_split_manifest)
+
+
+def add_images(dataset_dir, class_name, count, start=0):
+    os.makedirs(dataset_dir / class_name, exist_ok=True)
+    for i in range(start, start + count):
+        # Distinct pixels per image, so every file has its own content hash
+        color = (i % 256, (i * 7) % 256, sum(map(ord, class_name)) % 256)
+        Image.new('RGB', (32, 32), color).save(dataset_dir / class_name / f'{i}.png')
+
+
+def splits_by_hash(manifest):
+    return {entry['hash']: entry['split'] for entry in manifest['files'].values()}
+
+
+def test_assign_split_depends_only_on_digest():
+    fractions = {'validation': 0.2, 'test': 0.1}
+    assert assign_split('00000000' + 'f' * 24, fractions) == 'validation'
+    assert assign_split('20000000' + '0' * 24, fractions) == 'validation'
+    assert assign_split('40000000' + '0' * 24, fractions) == 'test'
+    assert assign_split('ffffffff' + '0' * 24, fractions) == 'train'
+
+
+def test_adding_classes_and_images_keeps_existing_splits(tmp_path):
+    add_images(tmp_path, 'plov', 40)
+    add_images(tmp_path, 'somsa', 40)
+    manifest, changes = update_split_manifest(str(tmp_path), val_fraction=0.25, test_fraction=0.1)
+    before = splits_by_hash(manifest)
+    assert changes['added'] == 80
+    assert {'train', 'validation', 'test'} <= set(before.values())
+
+    add_images(tmp_path, 'lagman', 40)
+    add_images(tmp_path, 'plov', 10, start=40)
+    manifest, changes = update_split_manifest(str(tmp_path))
+    after = splits_by_hash(manifest)
+
+    assert changes == {'added': 50, 'modified': 0, 'removed': 0, 'unchanged': 80}
+    assert set(manifest['classes']) == {'plov', 'somsa', 'lagman'}
+    assert {digest: after[digest] for digest in before} == before
+    assert sum(counts['train'] for counts in split_counts(manifest).values()) == \
+        sum(1 for split in after.values() if split == 'train')
+
+
+def test_renamed_files_keep_split_and_fractions_are_frozen(tmp_path):
+    add_images(tmp_path, 'plov', 30)
+    manifest, _ = update_split_manifest(str(tmp_path), val_fraction=0.3)
+    before = dict(manifest['files'])
+
+    os.rename(tmp_path / 'plov' / '0.png', tmp_path / 'plov' / 'renamed.png')
+    manifest, changes = update_split_manifest(str(tmp_path), val_fraction=0.5)
+
+    assert manifest['fractions']['validation'] == 0.3
+    assert changes['added'] == 1 and changes['removed'] == 1
+    assert manifest['files']['plov/renamed.png']['split'] == before['plov/0.png']['split']
+    assert load_split_manifest(str(tmp_path))['files'] == manifest['files']
+
+
+def test_split_entries(tmp_path):
+    add_images(tmp_path, 'plov', 20)
+    manifest, _ = update_split_manifest(str(tmp_path), val_fraction=0.3)
+    entries = {split: split_entries(manifest, split) for split in ('train', 'validation', 'test')}
+
+    assert sum(len(items) for items in entries.values()) == 20
+    assert entries['test'] == []
+    assert all(class_name == 'plov' for _, class_name in entries['validation'])
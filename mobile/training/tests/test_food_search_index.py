@@ -0,0 +1,70 @@
+"""
+FoodSearchIndex: prefix, fuzzy and cross-script matching
+"""
+from food_search_index import FoodSearchIndex, search_key, synthetic_foods
+
+FOODS = [
+    {'label': 'plov', 'local_names': ['плов', 'palov', 'палов']},
+    {'label': 'wedding plov', 'local_names': ['тўй оши', "to'y oshi"]},
+    {'label': 'shashlik', 'local_names': ['шашлык', 'shashlyk']},
+    {'label': 'khachapuri', 'local_names': ['хачапури']},
+    {'label': 'somsa', 'local_names': ['самса', 'somsa']},
+    {'label': 'lagman', 'local_names': ['лагман', "lag'mon"]},
+]
+
+
+def labels(results):
+    return [result['label'] for result in results]
+
+
+def test_search_key_folds_script_and_spelling():
+    assert search_key('Плов') == search_key('plov')
+    assert search_key('тўй оши') == search_key("To'y Oshi") == search_key('to‘y oshi')
+    assert search_key('хачапури') == search_key('Khachapuri') == search_key('xachapuri')
+    assert search_key('Shashlikk!!') == search_key('shashlik')
+
+
+def test_exact_match_ranks_first():
+    index = FoodSearchIndex.build(FOODS)
+    results = index.search('plov')
+    assert results[0] == {'label': 'plov', 'name': 'plov', 'score': 0.0, 'match': 'exact'}
+    # A later word of a multi-word name is found too, ranked behind
+    assert labels(results)[:2] == ['plov', 'wedding plov']
+
+
+def test_prefix_completion():
+    index = FoodSearchIndex.build(FOODS)
+    results = index.search('shash')
+    assert results[0]['label'] == 'shashlik' and results[0]['match'] == 'prefix'
+    assert labels(index.search('lag')) == ['lagman']
+
+
+def test_fuzzy_matches_typos():
+    index = FoodSearchIndex.build(FOODS)
+    results = index.search('shashlk')
+    assert results[0]['label'] == 'shashlik' and results[0]['match'] == 'fuzzy'
+    assert index.search('khachapry')[0]['label'] == 'khachapuri'
+    # Short queries get no typo budget
+    assert index.search('pk') == []
+
+
+def test_transliterated_queries_find_the_same_food():
+    index = FoodSearchIndex.build(FOODS)
+    for query in ('плов', 'ПЛОВ', 'palov', 'палов'):
+        assert index.search(query)[0]['label'] == 'plov', query
+    assert index.search('хачапури')[0]['label'] == 'khachapuri'
+    assert index.search('xachapuri')[0]['label'] == 'khachapuri'
+    assert index.search('туй оши')[0]['label'] == 'wedding plov'
+    assert index.search('самс')[0]['label'] == 'somsa'
+
+
+def test_save_and_load_round_trip(tmp_path):
+    foods = synthetic_foods(300)
+    index = FoodSearchIndex.build(foods)
+    path = str(tmp_path / 'search_index.json')
+    index.save(path)
+    loaded = FoodSearchIndex.load(path)
+
+    for food in foods[:50]:
+        assert loaded.search(food['local_names'][0]) == index.search(food['local_names'][0])
+        assert loaded.search(food['label'])[0]['label'] == food['label']
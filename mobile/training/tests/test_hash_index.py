@@ -0,0 +1,75 @@
+"""
+HashIndex: growth, persistence across runs and tags
+"""
+import pytest
+
+from hash_index import HashIndex, TAGS, bytes_digest, file_digest
+
+
+def digests(count, prefix='image'):
+    return [bytes_digest(f'{prefix}-{i}'.encode()) for i in range(count)]
+
+
+@pytest.mark.parametrize('on_disk', [False, True])
+def test_grows_past_initial_capacity(tmp_path, on_disk):
+    path = str(tmp_path / 'hashes.idx') if on_disk else None
+    keys = digests(100)
+    with HashIndex(path, capacity=16) as index:
+        for key in keys:
+            assert index.add(key) is None
+        assert index.capacity >= 128
+        assert len(index) == 100
+        assert all(key in index for key in keys)
+        assert bytes_digest(b'never added') not in index
+
+
+def test_persists_across_runs(tmp_path):
+    path = str(tmp_path / 'hashes.idx')
+    keys = digests(50)
+    with HashIndex(path, capacity=16) as index:
+        for key in keys:
+            index.add(key, 'dataset')
+
+    with HashIndex(path) as index:
+        assert len(index) == 50
+        assert all(index.get(key) == 'dataset' for key in keys)
+        index.add(bytes_digest(b'second run'), 'test')
+
+    with HashIndex(path) as index:
+        assert len(index) == 51
+        assert index.get(bytes_digest(b'second run')) == 'test'
+
+
+def test_tags():
+    with HashIndex() as index:
+        key = bytes_digest(b'plov')
+        assert index.add(key, 'validation') is None
+        # add() keeps the first tag and reports it; set() replaces it
+        assert index.add(key, 'dataset') == 'validation'
+        assert index.get(key) == 'validation'
+        index.set(key, 'rejected')
+        assert index.get(key) == 'rejected'
+        assert len(index) == 1
+
+        index.set(bytes_digest(b'somsa'), 'reference')
+        counts = index.tag_counts()
+        assert counts == {**{name: 0 for name in TAGS}, 'rejected': 1, 'reference': 1}
+
+
+def test_index_directory_skips_duplicates(tmp_path):
+    (tmp_path / 'plov').mkdir()
+    (tmp_path / 'plov' / 'a.jpg').write_bytes(b'same bytes')
+    (tmp_path / 'plov' / 'b.JPG').write_bytes(b'same bytes')
+    (tmp_path / 'plov' / 'c.png').write_bytes(b'other bytes')
+    (tmp_path / 'plov' / 'notes.txt').write_bytes(b'not an image')
+
+    with HashIndex() as index:
+        assert index.index_directory(str(tmp_path), 'dataset') == 2
+        assert index.get(file_digest(str(tmp_path / 'plov' / 'a.jpg'))) == 'dataset'
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'not_an_index.idx'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        HashIndex(str(path))
@@ -0,0 +1,44 @@
+"""
+Incremental training: a base model whose labels don't match is reported, not raised
+"""
+import pytest
+
+tf = pytest.importorskip('tensorflow')
+Image = pytest.importorskip('PIL.Image')
+
+from train_uzbek_food_model import train_model
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for class_name in ('plov', 'somsa', 'lagman'):
+        (tmp_path / 'dataset' / class_name).mkdir(parents=True)
+        for i in range(3):
+            Image.new('RGB', (32, 32), (i * 40, len(class_name) * 20, 0)).save(
+                tmp_path / 'dataset' / class_name / f'{i}.png')
+    # A grown 3-class model next to the 2-class labels.txt of the run before it,
+    # as left behind by an interrupted incremental run
+    model = tf.keras.Sequential([tf.keras.layers.Input((4,)), tf.keras.layers.Dense(3)])
+    model.save(tmp_path / 'best_model.h5')
+    (tmp_path / 'labels.txt').write_text('plov\nsomsa\n', encoding='utf-8')
+    return tmp_path
+
+
+def test_label_mismatch_exits_with_error(workdir, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        train_model('dataset', init_from='best_model.h5', init_labels='labels.txt')
+    out = capsys.readouterr().out
+
+    assert exit_info.value.code == 1
+    assert '❌ ERROR: labels.txt has 2 labels but best_model.h5 has 3 outputs' in out
+    assert not (workdir / 'checkpoints' / 'base_model.h5').exists()
+
+
+def test_label_mismatch_points_to_saved_base_model(workdir, capsys):
+    (workdir / 'checkpoints').mkdir()
+    (workdir / 'checkpoints' / 'base_model.h5').write_bytes(b'')
+    with pytest.raises(SystemExit):
+        train_model('dataset', init_from='best_model.h5', init_labels='labels.txt')
+    assert '--init-from checkpoints/base_model.h5 --init-labels checkpoints/base_labels.txt' \
+        in capsys.readouterr().out
@@ -0,0 +1,79 @@
+"""
+Request validation in inference_server: query parsing and photo URL fetching
+"""
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('PIL')
+
+from inference_server import check_photo_url, fetch_url, make_handler, parse_grams
+
+
+class FakeService:
+    labels = ['plov']
+
+    def classify(self, image_bytes, top_k=5, grams=None):
+        return {'top_k': top_k, 'grams': grams}
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(FakeService()))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def post(url, body=b'photo', content_type='application/octet-stream'):
+    request = urllib.request.Request(url, data=body, method='POST', headers={'Content-Type': content_type})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@pytest.mark.parametrize('query', ['top_k=abc', 'grams=abc', 'grams=nan', 'grams=inf', 'grams=-5'])
+def test_bad_query_is_400(server_url, query):
+    status, payload = post(f'{server_url}/classify?{query}')
+    assert status == 400 and 'error' in payload
+
+
+def test_valid_query(server_url):
+    assert post(f'{server_url}/classify?top_k=3&grams=250') == (200, {'top_k': 3, 'grams': 250.0})
+
+
+def test_json_url_to_loopback_is_refused(server_url):
+    body = json.dumps({'url': f'{server_url}/health'}).encode()
+    status, payload = post(f'{server_url}/classify', body, 'application/json')
+    assert status == 400 and 'non-public' in payload['error']
+
+
+def test_parse_grams():
+    assert parse_grams('0') == 0.0
+    for value in ('nan', 'inf', '-1'):
+        with pytest.raises(ValueError):
+            parse_grams(value)
+
+
+def test_photo_url_checks():
+    check_photo_url('https://abc.supabase.co/storage/meal.jpg', ['supabase.co'])
+    with pytest.raises(ValueError):
+        check_photo_url('https://evil.example/meal.jpg', ['supabase.co'])
+    with pytest.raises(ValueError):
+        check_photo_url('https://notsupabase.co/meal.jpg', ['supabase.co'])
+    with pytest.raises(ValueError):
+        check_photo_url('file:///etc/passwd')
+
+
+def test_fetch_refuses_loopback(server_url):
+    with pytest.raises(ValueError, match='non-public'):
+        fetch_url(f'{server_url}/health')
@@ -0,0 +1,84 @@
+"""
+NutritionEngine: vectorized estimates match a per-item reference
+"""
+import json
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from nutrition_engine import NUTRIENTS, NutritionEngine
+
+LABELS = ['plov', 'somsa', 'lagman', 'unknown_food']
+MAPPING = {
+    'plov': {'kcal_per_100g': 180, 'protein_g': 6, 'carbs_g': 25, 'fat_g': 7},
+    'somsa': {'kcal_per_100g': 300, 'protein_g': 9, 'carbs_g': 30, 'fat_g': 15},
+    'lagman': {'kcal_per_100g': 150, 'protein_g': 7, 'carbs_g': 20, 'fat_g': 5},
+    'unknown_food': 3,  # Plain {label: index} entry from the training script
+}
+
+
+@pytest.fixture
+def engine():
+    return NutritionEngine.from_mapping(LABELS, MAPPING)
+
+
+def reference_topk(probabilities, grams, top_k):
+    """Loop-and-dict version of estimate(mode='topk')"""
+    results = []
+    for row, portion in zip(probabilities, grams):
+        top = [i for i in np.argsort(-row)[:top_k] if isinstance(MAPPING[LABELS[i]], dict)]
+        total = sum(row[i] for i in top)
+        results.append([sum(row[i] / total * MAPPING[LABELS[i]][key] for i in top) * portion / 100
+                        for key in NUTRIENTS])
+    return np.array(results)
+
+
+def test_topk_matches_reference(engine):
+    rng = np.random.default_rng(0)
+    logits = rng.standard_normal((200, len(LABELS)))
+    probabilities = np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+    grams = rng.uniform(50, 500, size=200)
+
+    estimates = engine.estimate(probabilities, grams, mode='topk', top_k=3)
+    np.testing.assert_allclose(estimates, reference_topk(probabilities, grams, 3))
+
+
+def test_argmax_and_scalar_grams(engine):
+    probabilities = np.array([[0.7, 0.2, 0.1, 0.0],
+                              [0.1, 0.1, 0.1, 0.7]])
+    estimates = engine.estimate(probabilities, 200, mode='argmax')
+
+    np.testing.assert_allclose(estimates[0], [360, 12, 50, 14])
+    assert np.isnan(estimates[1]).all()  # Most likely class has no nutrition data
+    assert engine.to_dicts(estimates) == [
+        {'kcal': 360.0, 'protein_g': 12.0, 'carbs_g': 50.0, 'fat_g': 14.0}, None]
+
+
+def test_unknown_classes_are_renormalised_away(engine):
+    # Only the unknown class and plov in the top 2: the estimate is pure plov
+    probabilities = np.array([[0.3, 0.0, 0.1, 0.6]])
+    estimates = engine.estimate(probabilities, [100], mode='topk', top_k=2)
+    np.testing.assert_allclose(estimates[0], [180, 6, 25, 7])
+
+
+def test_estimate_from_topk_matches_estimate(engine):
+    probabilities = np.array([[0.5, 0.3, 0.15, 0.05]])
+    expected = engine.estimate(probabilities, 250, mode='topk', top_k=3)
+    estimates = engine.estimate_from_topk([0, 1, 2], [0.5, 0.3, 0.15], 250)
+    np.testing.assert_allclose(estimates, expected)
+
+
+def test_unknown_mode(engine):
+    with pytest.raises(ValueError):
+        engine.estimate(np.ones((1, len(LABELS))), 100, mode='mean')
+
+
+def test_from_files(tmp_path, capsys):
+    (tmp_path / 'labels.txt').write_text('\n'.join(LABELS) + '\n', encoding='utf-8')
+    (tmp_path / 'class_mapping.json').write_text(json.dumps(MAPPING), encoding='utf-8')
+
+    engine = NutritionEngine.from_files(str(tmp_path / 'labels.txt'), str(tmp_path / 'class_mapping.json'))
+    assert engine.labels == LABELS
+    assert engine.known.tolist() == [True, True, True, False]
+    assert '1/4 labels have no nutrition data' in capsys.readouterr().out
@@ -0,0 +1,68 @@
+"""
+PredictionCache: LRU eviction, disk partitions per model, top-k width
+"""
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from prediction_cache import ENTRY_OVERHEAD_BYTES, PredictionCache
+
+
+def top_k(k):
+    return np.arange(k, dtype=np.int32), np.linspace(1, 0, k, dtype=np.float32)
+
+
+def entry_bytes(k):
+    return sum(a.nbytes for a in top_k(k)) + ENTRY_OVERHEAD_BYTES
+
+
+def test_lru_evicts_least_recently_used():
+    cache = PredictionCache(model_checksum='m', max_bytes=2 * entry_bytes(5))
+    cache.put(b'a', top_k(5), 1.0)
+    cache.put(b'b', top_k(5), 1.0)
+    assert cache.get(b'a') is not None  # a is now the most recent
+    cache.put(b'c', top_k(5), 1.0)
+
+    assert cache.get(b'b') is None
+    assert cache.get(b'a') is not None
+    assert cache.get(b'c') is not None
+    assert cache.memory_bytes <= cache.max_bytes
+
+
+def test_disk_tier_is_partitioned_by_model_checksum(tmp_path):
+    PredictionCache(model_checksum='model-v1', disk_dir=str(tmp_path)).put(b'photo', top_k(5), 12.0)
+
+    same_model = PredictionCache(model_checksum='model-v1', disk_dir=str(tmp_path))
+    indices, scores = same_model.get(b'photo')
+    np.testing.assert_array_equal(indices, top_k(5)[0])
+    assert same_model.metrics()['disk_hits'] == 1
+    assert same_model.metrics()['saved_ms'] == pytest.approx(12.0)
+
+    other_model = PredictionCache(model_checksum='model-v2', disk_dir=str(tmp_path))
+    assert other_model.get(b'photo') is None
+    assert (tmp_path / 'model-v1').is_dir() and not (tmp_path / 'model-v2').exists()
+
+
+@pytest.mark.parametrize('disk', [False, True])
+def test_narrower_entry_is_recomputed(tmp_path, disk):
+    disk_dir = str(tmp_path) if disk else None
+    cache = PredictionCache(model_checksum='m', disk_dir=disk_dir)
+    cache.put(b'photo', top_k(5), 1.0, width=5)
+    if disk:
+        cache = PredictionCache(model_checksum='m', disk_dir=disk_dir)
+
+    assert cache.get(b'photo', width=20) is None
+    calls = []
+    indices, _ = cache.get_or_compute(b'photo', lambda: calls.append(1) or top_k(20), width=20)
+    assert calls and len(indices) == 20
+
+    # The wider entry replaces the narrow one and serves smaller requests
+    assert len(cache.get(b'photo', width=5)[0]) == 20
+    assert len(cache.get_or_compute(b'photo', lambda: pytest.fail('recomputed'), width=20)[0]) == 20
+
+
+def test_get_or_compute_stores_compute_width():
+    cache = PredictionCache(model_checksum='m')
+    cache.get_or_compute(b'photo', lambda: top_k(10), width=3, compute_width=10)
+    assert cache.get(b'photo', width=10) is not None
+    assert cache.get(b'photo', width=11) is None
@@ -0,0 +1,144 @@
+"""
+A run resumed from a ResumableCheckpoint draws the same batches as an uninterrupted one
+"""
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+tf = pytest.importorskip('tensorflow')
+Image = pytest.importorskip('PIL.Image')
+
+from training_utils import BalancedSequence, ResumableCheckpoint, enable_gradient_accumulation
+
+CLASSES = ['lagman', 'plov', 'somsa']
+BATCH_SIZE = 4
+EPOCHS = 4
+INTERRUPT_AT = 2
+
+
+class RecordingSequence(tf.keras.utils.Sequence):
+    """
+    Pass batches through and remember which images (and pixels) each one had
+
+    Only batches drawn after on_train_begin are recorded; fit() also draws
+    one batch up front to inspect its shape.
+    """
+
+    def __init__(self, iterator):
+        super().__init__()
+        self.iterator = iterator
+        self.batches = []
+        self.recording = False
+        self.callback = tf.keras.callbacks.LambdaCallback(
+            on_train_begin=lambda logs: setattr(self, 'recording', True))
+
+    def __len__(self):
+        return len(self.iterator)
+
+    def __getitem__(self, index):
+        batch_x, batch_y = self.iterator[index]
+        if not self.recording:
+            return batch_x, batch_y
+        order = self.iterator.order if isinstance(self.iterator, BalancedSequence) else self.iterator.index_array
+        indices = order[index * BATCH_SIZE:(index + 1) * BATCH_SIZE]
+        self.batches.append((tuple(int(i) for i in indices), round(float(batch_x.sum()), 3)))
+        return batch_x, batch_y
+
+    def on_epoch_end(self):
+        self.iterator.on_epoch_end()
+
+
+@pytest.fixture
+def dataset_dir(tmp_path):
+    rng = np.random.default_rng(0)
+    for name in CLASSES:
+        (tmp_path / name).mkdir()
+        for i in range(5):
+            pixels = rng.integers(0, 255, (16, 16, 3), dtype=np.uint8)
+            Image.fromarray(pixels).save(tmp_path / name / f'{i}.png')
+    return tmp_path
+
+
+def make_run(dataset_dir, accum_steps=1, balanced=False):
+    frame = pd.DataFrame([(f'{name}/{i}.png', name) for name in CLASSES for i in range(5)],
+                         columns=['filename', 'class'])
+    datagen = tf.keras.preprocessing.image.ImageDataGenerator(rescale=1./255, horizontal_flip=True,
+                                                              rotation_range=30)
+    iterator = datagen.flow_from_dataframe(frame, directory=str(dataset_dir), classes=CLASSES,
+                                           target_size=(8, 8), batch_size=BATCH_SIZE,
+                                           class_mode='categorical', shuffle=True,
+                                           validate_filenames=False)
+    if balanced:
+        # 10 draws per epoch from 5 images per class: streams stop mid-way between epochs
+        iterator = BalancedSequence(iterator, {name: 1.0 for name in CLASSES}, epoch_size=10)
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input((8, 8, 3)),
+        tf.keras.layers.Flatten(),
+        tf.keras.layers.Dense(len(CLASSES), activation='softmax'),
+    ])
+    model.compile(optimizer='adam', loss='categorical_crossentropy')
+    accumulation = enable_gradient_accumulation(model, accum_steps)
+    return iterator, RecordingSequence(iterator), model, accumulation
+
+
+def seed(value):
+    random.seed(value)
+    np.random.seed(value)
+    tf.random.set_seed(value)
+
+
+@pytest.mark.parametrize('balanced', [False, True])
+def test_resumed_run_draws_same_batches(dataset_dir, tmp_path, balanced):
+    seed(0)
+    iterator, data, model, _ = make_run(dataset_dir, balanced=balanced)
+    checkpoint = ResumableCheckpoint(str(tmp_path / 'full'), iterator)
+    model.fit(data, epochs=EPOCHS, callbacks=[data.callback, checkpoint], verbose=0)
+    uninterrupted = data.batches
+
+    seed(0)
+    iterator, data, model, _ = make_run(dataset_dir, balanced=balanced)
+    checkpoint = ResumableCheckpoint(str(tmp_path / 'interrupted'), iterator)
+    model.fit(data, epochs=INTERRUPT_AT, callbacks=[data.callback, checkpoint], verbose=0)
+    before_interrupt = data.batches
+
+    # A fresh process: different RNG state, new iterator and model
+    seed(123)
+    iterator, data, model, _ = make_run(dataset_dir, balanced=balanced)
+    checkpoint = ResumableCheckpoint(str(tmp_path / 'interrupted'), iterator)
+    checkpoint.set_model(model)
+    initial_epoch = checkpoint.restore()
+    model.fit(data, epochs=EPOCHS, initial_epoch=initial_epoch, callbacks=[data.callback, checkpoint],
+              verbose=0)
+
+    assert initial_epoch == INTERRUPT_AT
+    assert before_interrupt + data.batches == uninterrupted
+
+
+def test_resume_continues_partial_accumulation_group(dataset_dir, tmp_path):
+    # 4 batches per epoch with groups of 3: every epoch ends mid-group
+    seed(0)
+    iterator, data, model, accumulation = make_run(dataset_dir, accum_steps=3)
+    checkpoint = ResumableCheckpoint(str(tmp_path / 'full'), iterator,
+                                     extra_state={'gradient_accumulation': accumulation})
+    model.fit(data, epochs=EPOCHS, callbacks=[checkpoint], verbose=0)
+    uninterrupted = model.get_weights()
+
+    seed(0)
+    iterator, data, model, accumulation = make_run(dataset_dir, accum_steps=3)
+    checkpoint = ResumableCheckpoint(str(tmp_path / 'interrupted'), iterator,
+                                     extra_state={'gradient_accumulation': accumulation})
+    model.fit(data, epochs=INTERRUPT_AT, callbacks=[checkpoint], verbose=0)
+
+    seed(123)
+    iterator, data, model, accumulation = make_run(dataset_dir, accum_steps=3)
+    checkpoint = ResumableCheckpoint(str(tmp_path / 'interrupted'), iterator,
+                                     extra_state={'gradient_accumulation': accumulation})
+    checkpoint.set_model(model)
+    initial_epoch = checkpoint.restore()
+    assert int(accumulation.pending.numpy()) == INTERRUPT_AT * len(data)
+    model.fit(data, epochs=EPOCHS, initial_epoch=initial_epoch, callbacks=[checkpoint], verbose=0)
+
+    for resumed, expected in zip(model.get_weights(), uninterrupted):
+        np.testing.assert_allclose(resumed, expected, rtol=1e-5, atol=1e-6)
@@ -0,0 +1,51 @@
+"""
+sync_foods against a real Postgres (set TEST_DATABASE_URL, e.g. a local `supabase start`)
+
+Every sync runs with dry_run=True, so the schema and rows created here are
+rolled back and the database is left as it was.
+"""
+import os
+
+import pytest
+
+psycopg2 = pytest.importorskip('psycopg2')
+
+from sync_foods_to_supabase import FOODS_SCHEMA_SQL, sync_foods
+
+DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason='TEST_DATABASE_URL not set')
+
+INSERT_FOOD_SQL = """
+INSERT INTO public.foods (name, brand, calories, protein, carbs, fats, serving_size, serving_unit)
+VALUES (%s, %s, %s, %s, %s, %s, 100, 'g')
+"""
+
+
+@pytest.fixture
+def connection():
+    connection = psycopg2.connect(DATABASE_URL)
+    with connection.cursor() as cursor:
+        cursor.execute(FOODS_SCHEMA_SQL)
+        cursor.execute("DELETE FROM public.foods WHERE name LIKE 'test-sync-%'")
+    yield connection
+    connection.rollback()
+    connection.close()
+
+
+def test_duplicate_unbranded_rows_count_once(connection):
+    with connection.cursor() as cursor:
+        # Two stale unbranded rows for one food, one branded row that must be ignored
+        cursor.execute(INSERT_FOOD_SQL, ('test-sync-plov', None, 100, 1, 1, 1))
+        cursor.execute(INSERT_FOOD_SQL, ('test-sync-plov', None, 120, 1, 1, 1))
+        cursor.execute(INSERT_FOOD_SQL, ('test-sync-plov', 'Brand', 100, 1, 1, 1))
+        cursor.execute(INSERT_FOOD_SQL, ('test-sync-somsa', None, 300, 9, 30, 15))
+
+    rows = [
+        ('test-sync-plov', 180, 6, 25, 7, 100, 'g'),
+        ('test-sync-plov', 180, 6, 25, 7, 100, 'g'),  # duplicate catalogue entry
+        ('test-sync-somsa', 300, 9, 30, 15, 100, 'g'),
+        ('test-sync-lagman', 150, 7, 20, 5, 100, 'g'),
+    ]
+    result = sync_foods(connection, rows, dry_run=True)
+
+    assert result == {'total': 3, 'inserted': 1, 'updated': 1, 'updated_rows': 2, 'unchanged': 1}
@@ -0,0 +1,72 @@
+"""
+Raw-input TFLite export: named top-k outputs that agree with the standard export
+"""
+import pytest
+
+np = pytest.importorskip('numpy')
+tf = pytest.importorskip('tensorflow')
+
+from train_uzbek_food_model import DEFAULT_IMG_SIZE, convert_to_tflite, read_top_predictions
+
+NUM_CLASSES = 7
+TOP_K = 3
+
+
+@pytest.fixture(scope='module')
+def exports(tmp_path_factory):
+    """(keras model, standard interpreter, raw-input interpreter)"""
+    tf.keras.utils.set_random_seed(0)
+    inputs = tf.keras.Input((DEFAULT_IMG_SIZE, DEFAULT_IMG_SIZE, 3))
+    x = tf.keras.layers.Conv2D(8, 3, strides=4, activation='relu')(inputs)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    model = tf.keras.Model(inputs, tf.keras.layers.Dense(NUM_CLASSES, activation='softmax')(x))
+
+    folder = tmp_path_factory.mktemp('tflite')
+    standard = convert_to_tflite(model, quantize=False, output_file=str(folder / 'standard.tflite'))
+    raw = convert_to_tflite(model, quantize=False, output_file=str(folder / 'raw.tflite'),
+                            raw_input=True, top_k=TOP_K)
+    return model, tf.lite.Interpreter(model_path=standard), tf.lite.Interpreter(model_path=raw)
+
+
+def run_raw(interpreter, frame):
+    input_index = interpreter.get_input_details()[0]['index']
+    interpreter.resize_tensor_input(input_index, frame.shape)
+    interpreter.allocate_tensors()
+    interpreter.set_tensor(input_index, frame)
+    interpreter.invoke()
+
+
+def test_raw_input_outputs_are_named(exports):
+    _, _, raw = exports
+    outputs = {detail['name']: detail['dtype'] for detail in raw.get_output_details()}
+    assert outputs == {'scores': np.float32, 'indices': np.int32}
+    assert raw.get_input_details()[0]['dtype'] == np.uint8
+
+
+def test_raw_input_topk_matches_standard_export(exports):
+    _, standard, raw = exports
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, size=(1, DEFAULT_IMG_SIZE, DEFAULT_IMG_SIZE, 3), dtype=np.uint8)
+
+    standard.allocate_tensors()
+    standard.set_tensor(standard.get_input_details()[0]['index'], (frame / 255.0).astype(np.float32))
+    standard.invoke()
+    expected_indices, expected_scores = read_top_predictions(standard, TOP_K)
+
+    run_raw(raw, frame)
+    indices, scores = read_top_predictions(raw, TOP_K)
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+
+def test_raw_input_resizes_camera_frames(exports):
+    model, _, raw = exports
+    frame = np.random.default_rng(1).integers(0, 256, size=(1, 480, 640, 3), dtype=np.uint8)
+
+    run_raw(raw, frame)
+    indices, scores = read_top_predictions(raw, TOP_K)
+
+    resized = tf.image.resize(frame.astype(np.float32), (DEFAULT_IMG_SIZE, DEFAULT_IMG_SIZE), method='nearest')
+    probabilities = model(resized / 255.0).numpy()[0]
+    np.testing.assert_array_equal(indices, np.argsort(-probabilities)[:TOP_K])
+    np.testing.assert_allclose(scores, np.sort(probabilities)[::-1][:TOP_K], rtol=1e-5)
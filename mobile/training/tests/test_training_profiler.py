@@ -0,0 +1,47 @@
+"""
+TrainingProfiler measures data wait against a deliberately slow Sequence
+"""
+import json
+import time
+
+import pytest
+
+np = pytest.importorskip('numpy')
+tf = pytest.importorskip('tensorflow')
+
+from training_utils import TimedSequence, TrainingProfiler
+
+BATCHES = 6
+LOAD_SECONDS = 0.05
+
+
+class SlowSequence(tf.keras.utils.Sequence):
+    """Tiny batches that take LOAD_SECONDS each to produce"""
+
+    def __len__(self):
+        return BATCHES
+
+    def __getitem__(self, index):
+        time.sleep(LOAD_SECONDS)
+        return np.zeros((4, 8), dtype='float32'), np.zeros((4, 1), dtype='float32')
+
+
+def test_slow_input_is_reported_as_input_bound(tmp_path):
+    model = tf.keras.Sequential([tf.keras.layers.Input((8,)), tf.keras.layers.Dense(1)])
+    model.compile(optimizer='sgd', loss='mse')
+    data = TimedSequence(SlowSequence())
+    log_path = tmp_path / 'profile.jsonl'
+    profiler = TrainingProfiler(data, log_path=str(log_path))
+
+    model.fit(data, epochs=2, callbacks=[profiler], verbose=0)
+
+    records = [json.loads(line) for line in log_path.read_text().splitlines()]
+    steps = [record for record in records if record['type'] == 'step']
+    epochs = [record for record in records if record['type'] == 'epoch']
+    assert len(steps) == 2 * BATCHES and len(epochs) == 2
+    assert all(step['images'] == 4 for step in steps)
+    assert sum(step['data_wait_ms'] > 0 for step in steps) >= BATCHES
+    for epoch in epochs:
+        assert epoch['data_wait_fraction'] > profiler.input_bound_threshold
+        assert epoch['input_bound'] is True
+    assert len(data.ready) == 0
@@ -4,39 +4,58 @@ Train a custom TFLite model for Uzbek food recognition
 Supports transfer learning from MobileNetV2
 
 Usage:
-    python train_uzbek_food_model.py --dataset ./dataset --epochs 50
+    python train_uzbek_food_model.py train --dataset ./dataset --epochs 50
+    python train_uzbek_food_model.py train --dataset ./dataset --init-from best_model.h5
+    python train_uzbek_food_model.py scan --dataset ./dataset
+    python train_uzbek_food_model.py split --dataset ./dataset --test-fraction 0.1
+    python train_uzbek_food_model.py audit --dataset ./dataset
+    python train_uzbek_food_model.py convert --model best_model.h5
+    python train_uzbek_food_model.py test --model model.tflite --image plov.jpg
+    python train_uzbek_food_model.py benchmark --model model.tflite
+
+TensorFlow, NumPy and matplotlib are imported inside the functions that need
+them, so commands like `scan` and `--help` start without loading them.
 """
 
 import os
-import argparse
-import tensorflow as tf
-from tensorflow.keras import layers, models
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
-from tensorflow.keras.applications import MobileNetV2
-from tensorflow.keras.callbacks import ModelCheckpoint, EarlyStopping, ReduceLROnPlateau
-import numpy as np
+import sys
+import gzip
 import json
-import matplotlib.pyplot as plt
+import time
+import shutil
+import argparse
+import subprocess
+
+from dataset_scanner import scan_dataset_tree, print_report
+from dataset_splits import (load_split_manifest, update_split_manifest, split_entries,
+                            replay_entries, print_split_summary, SPLITS)
 
 # Default configuration
 DEFAULT_IMG_SIZE = 224
 DEFAULT_BATCH_SIZE = 16
 DEFAULT_EPOCHS = 50
 DEFAULT_VALIDATION_SPLIT = 0.2
+DEFAULT_INCREMENTAL_EPOCHS = 10
+DEFAULT_REPLAY_PER_CLASS = 20
+REGRESSION_WARNING = 0.02  # Old-class accuracy drop (absolute) that gets a warning
 
-def create_model(num_classes, trainable_layers=20):
+def create_model(num_classes, trainable_layers=20, weights='imagenet'):
     """
     Create a MobileNetV2 transfer learning model
     
     Args:
         num_classes: Number of food classes
         trainable_layers: Number of top layers to fine-tune (0 = freeze all)
+        weights: Backbone weights ('imagenet', or None for random init offline)
     """
+    from tensorflow.keras import layers, models
+    from tensorflow.keras.applications import MobileNetV2
+    
     # Load pre-trained MobileNetV2 (trained on ImageNet)
     base_model = MobileNetV2(
         input_shape=(DEFAULT_IMG_SIZE, DEFAULT_IMG_SIZE, 3),
         include_top=False,
-        weights='imagenet'
+        weights=weights
     )
     
     # Freeze most layers, fine-tune top layers
@@ -59,11 +78,62 @@ def create_model(num_classes, trainable_layers=20):
     
     return model
 
-def create_data_generators(dataset_dir, batch_size=DEFAULT_BATCH_SIZE, val_split=DEFAULT_VALIDATION_SPLIT):
+def grow_model(old_model, num_classes, trainable_layers=20):
+    """
+    Copy a trained create_model() model into one with more output classes
+    
+    The backbone and head weights are copied as is, and the first rows of the
+    new classifier are the old ones, so old label indices keep their meaning.
+    Rows for new classes start from the default initializer with the mean old bias.
+    """
+    model = create_model(num_classes, trainable_layers=trainable_layers, weights=None)
+    if len(model.layers) != len(old_model.layers):
+        raise ValueError("Model to grow does not have the create_model() architecture")
+    
+    for layer, old_layer in zip(model.layers[:-1], old_model.layers[:-1]):
+        layer.set_weights(old_layer.get_weights())
+    
+    old_kernel, old_bias = old_model.layers[-1].get_weights()
+    kernel, bias = model.layers[-1].get_weights()
+    old_classes = old_kernel.shape[1]
+    kernel[:, :old_classes] = old_kernel
+    bias[:old_classes] = old_bias
+    bias[old_classes:] = old_bias.mean()
+    model.layers[-1].set_weights([kernel, bias])
+    return model
+
+def read_labels(labels_path):
+    with open(labels_path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+def create_data_generators(dataset_dir, batch_size=DEFAULT_BATCH_SIZE, val_split=DEFAULT_VALIDATION_SPLIT,
+                           manifest=None, classes=None, train_entries=None):
     """
     Create augmented data generators for training
     Augmentation helps with small datasets
+    
+    Files come from the split manifest (dataset/splits.json) rather than a
+    directory listing, so the validation set does not shift when images are
+    added. The manifest is created with val_split if it does not exist yet.
+    
+    Args:
+        classes: Class order for the label indices (default: manifest order)
+        train_entries: (relative path, class) pairs to train on instead of the whole train split
     """
+    import pandas as pd
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+    
+    if manifest is None:
+        manifest = load_split_manifest(dataset_dir)
+    if manifest is None:
+        manifest, _ = update_split_manifest(dataset_dir, val_fraction=val_split)
+    
+    classes = classes or manifest['classes']
+    
+    def split_frame(split):
+        entries = train_entries if split == 'train' and train_entries is not None else split_entries(manifest, split)
+        return pd.DataFrame(entries, columns=['filename', 'class'])
+    
     train_datagen = ImageDataGenerator(
         rescale=1./255,
         rotation_range=30,
@@ -73,33 +143,35 @@ def create_data_generators(dataset_dir, batch_size=DEFAULT_BATCH_SIZE, val_split
         zoom_range=0.2,
         horizontal_flip=True,
         brightness_range=[0.8, 1.2],
-        fill_mode='nearest',
-        validation_split=val_split
+        fill_mode='nearest'
     )
     
-    # Load training data
-    train_generator = train_datagen.flow_from_directory(
-        dataset_dir,
+    # Load training data (files were validated when the manifest was built)
+    train_generator = train_datagen.flow_from_dataframe(
+        split_frame('train'),
+        directory=dataset_dir,
+        classes=classes,
         target_size=(DEFAULT_IMG_SIZE, DEFAULT_IMG_SIZE),
         batch_size=batch_size,
         class_mode='categorical',
-        subset='training',
-        shuffle=True
+        shuffle=True,
+        validate_filenames=False
     )
     
     # Load validation data (no augmentation)
     val_datagen = ImageDataGenerator(
-        rescale=1./255,
-        validation_split=val_split
+        rescale=1./255
     )
     
-    val_generator = val_datagen.flow_from_directory(
-        dataset_dir,
+    val_generator = val_datagen.flow_from_dataframe(
+        split_frame('validation'),
+        directory=dataset_dir,
+        classes=classes,
         target_size=(DEFAULT_IMG_SIZE, DEFAULT_IMG_SIZE),
         batch_size=batch_size,
         class_mode='categorical',
-        subset='validation',
-        shuffle=False
+        shuffle=False,
+        validate_filenames=False
     )
     
     return train_generator, val_generator
@@ -108,6 +180,10 @@ def plot_training_history(history, output_file='training_history.png'):
     """
     Plot training metrics
     """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    
     fig, axes = plt.subplots(1, 2, figsize=(12, 4))
     
     # Plot accuracy
@@ -132,26 +208,137 @@ def plot_training_history(history, output_file='training_history.png'):
     plt.savefig(output_file, dpi=150, bbox_inches='tight')
     print(f"Training plot saved to {output_file}")
 
-def train_model(dataset_dir, epochs=DEFAULT_EPOCHS, batch_size=DEFAULT_BATCH_SIZE, trainable_layers=20):
+def subset_accuracy(model, dataset_dir, entries, class_names, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Top-1 accuracy over (relative path, class) entries, labels indexed by class_names
+    Works for models with fewer outputs than class_names (e.g. before adding classes)
+    """
+    import numpy as np
+    import pandas as pd
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+    
+    if not entries:
+        return None
+    generator = ImageDataGenerator(rescale=1./255).flow_from_dataframe(
+        pd.DataFrame(entries, columns=['filename', 'class']),
+        directory=dataset_dir,
+        classes=class_names,
+        target_size=(DEFAULT_IMG_SIZE, DEFAULT_IMG_SIZE),
+        batch_size=batch_size,
+        class_mode='categorical',
+        shuffle=False,
+        validate_filenames=False
+    )
+    predictions = model.predict(generator, verbose=0)
+    return float(np.mean(np.argmax(predictions, axis=1) == generator.classes))
+
+def train_model(dataset_dir, epochs=DEFAULT_EPOCHS, batch_size=DEFAULT_BATCH_SIZE, trainable_layers=20,
+                plot=True, profile_log=None, trace_steps=None, trace_dir='profile_trace',
+                checkpoint_dir='checkpoints', checkpoint_every=1, keep_checkpoints=3, resume=False,
+                init_from=None, init_labels='labels.txt', replay_per_class=DEFAULT_REPLAY_PER_CLASS,
+                accum_steps=1, balance=None, epoch_size=None, balance_cache_mb=256):
     """
     Main training function
+    Returns (model, class_names, history); history is None when --resume finds a
+    checkpoint that already reached `epochs`
+    
+    Args:
+        profile_log: Write per-step timing, data-wait and resource usage to this JSONL file
+        trace_steps: (first, last) global steps to capture a TensorFlow profiler trace for
+        trace_dir: Output directory for the profiler trace
+        checkpoint_dir: Directory for full-state checkpoints (model, optimizer, callbacks, RNG)
+        checkpoint_every: Save a full-state checkpoint every N epochs (0 = disabled)
+        keep_checkpoints: Number of most recent checkpoints to keep
+        resume: Continue from the latest checkpoint in checkpoint_dir
+        init_from: Keras model to warm-start from; classes missing from init_labels are
+            added as new output rows and trained on with a replay sample of the old classes
+        init_labels: labels.txt that init_from was trained with (its class order is kept);
+            both are copied to checkpoint_dir as base_model.h5/base_labels.txt, which
+            --resume uses instead, since best_model.h5 is overwritten during training
+        replay_per_class: Training images per old class replayed alongside the new classes
+        accum_steps: Apply gradients every N batches (effective batch size batch_size * N
+            at the memory cost of one batch)
+        balance: Rebalance classes while sampling: 'uniform', 'sqrt' or a JSON file of
+            {class: weight} (see training_utils.BalancedSequence)
+        epoch_size: Images drawn per balanced epoch (default: number of training images)
+        balance_cache_mb: Memory for decoded images of oversampled classes
     """
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import ModelCheckpoint, EarlyStopping, ReduceLROnPlateau
+    
+    manifest = load_split_manifest(dataset_dir)
+    if manifest is None:
+        manifest, _ = update_split_manifest(dataset_dir)
+    
+    old_classes, train_entries = [], None
+    if init_from:
+        base_model_path = os.path.join(checkpoint_dir, 'base_model.h5')
+        base_labels_path = os.path.join(checkpoint_dir, 'base_labels.txt')
+        if resume and os.path.exists(base_model_path) and os.path.exists(base_labels_path):
+            # best_model.h5 may already hold the grown model of the interrupted run
+            print(f"Resuming incremental training from the base model saved in {checkpoint_dir}")
+            init_from, init_labels = base_model_path, base_labels_path
+        
+        print(f"Loading {init_from} for incremental training...")
+        old_model = tf.keras.models.load_model(init_from, compile=False)
+        old_classes = read_labels(init_labels)
+        if len(old_classes) != old_model.output_shape[-1]:
+            print(f"❌ ERROR: {init_labels} has {len(old_classes)} labels but {init_from} "
+                  f"has {old_model.output_shape[-1]} outputs")
+            if os.path.exists(base_model_path) and os.path.abspath(init_from) != os.path.abspath(base_model_path):
+                print("   An interrupted incremental run overwrites best_model.h5 before labels.txt.")
+                print(f"   Continue it with --resume, or start again from the saved base model:")
+                print(f"   --init-from {base_model_path} --init-labels {base_labels_path}")
+            else:
+                print("   Pass the labels.txt the model was trained with (--init-labels)")
+            sys.exit(1)
+        
+        # ModelCheckpoint overwrites best_model.h5 with the grown model after the
+        # first epoch, but labels.txt is only written at the end; keep the pair
+        if os.path.abspath(init_from) != os.path.abspath(base_model_path):
+            os.makedirs(checkpoint_dir, exist_ok=True)
+            shutil.copyfile(init_from, base_model_path)
+            shutil.copyfile(init_labels, base_labels_path)
+        new_classes = [name for name in manifest['classes'] if name not in old_classes]
+        class_names = old_classes + new_classes
+        train_entries = ([entry for entry in split_entries(manifest, 'train') if entry[1] in new_classes]
+                         + replay_entries(manifest, 'train', old_classes, replay_per_class))
+    else:
+        class_names = manifest['classes']
+    
     print("Creating data generators...")
-    train_gen, val_gen = create_data_generators(dataset_dir, batch_size)
+    train_gen, val_gen = create_data_generators(dataset_dir, batch_size, manifest=manifest,
+                                                classes=class_names, train_entries=train_entries)
     
-    num_classes = len(train_gen.class_indices)
-    class_names = list(train_gen.class_indices.keys())
+    num_classes = len(class_names)
     
     print(f"\nFound {num_classes} food classes:")
     for i, name in enumerate(class_names):
-        print(f"  {i}: {name}")
+        print(f"  {i}: {name}{' (new)' if old_classes and name not in old_classes else ''}")
     
     print(f"\nTraining images: {train_gen.samples}")
     print(f"Validation images: {val_gen.samples}")
     
+    train_data = train_gen
+    if balance:
+        from collections import Counter
+        from training_utils import BalancedSequence, balance_weights
+        counts = Counter(train_gen.classes)
+        weights = balance_weights(balance, {name: counts[i] for i, name in enumerate(class_names)})
+        train_data = BalancedSequence(train_gen, weights, epoch_size=epoch_size, cache_mb=balance_cache_mb)
+        train_data.print_summary()
+    
     # Create model
-    print("\nCreating model...")
-    model = create_model(num_classes, trainable_layers=trainable_layers)
+    if init_from:
+        old_val_entries = [entry for entry in split_entries(manifest, 'validation') if entry[1] in old_classes]
+        print(f"\nMeasuring old-class accuracy of {init_from} on {len(old_val_entries)} validation images...")
+        baseline_old_acc = subset_accuracy(old_model, dataset_dir, old_val_entries, class_names, batch_size)
+        print(f"\nGrowing classifier from {len(old_classes)} to {num_classes} classes...")
+        model = grow_model(old_model, num_classes, trainable_layers=trainable_layers)
+        del old_model
+    else:
+        print("\nCreating model...")
+        model = create_model(num_classes, trainable_layers=trainable_layers)
     
     # Compile with optimizer
     model.compile(
@@ -160,6 +347,13 @@ def train_model(dataset_dir, epochs=DEFAULT_EPOCHS, batch_size=DEFAULT_BATCH_SIZ
         metrics=['accuracy', tf.keras.metrics.TopKCategoricalAccuracy(k=3, name='top_3_accuracy')]
     )
     
+    accumulation = None
+    if accum_steps > 1:
+        from training_utils import enable_gradient_accumulation
+        accumulation = enable_gradient_accumulation(model, accum_steps)
+        print(f"\nGradient accumulation: {accum_steps} steps x {batch_size} = "
+              f"{accum_steps * batch_size} effective batch size")
+    
     print("\nModel architecture:")
     model.summary()
     
@@ -186,11 +380,44 @@ def train_model(dataset_dir, epochs=DEFAULT_EPOCHS, batch_size=DEFAULT_BATCH_SIZ
         )
     ]
     
+    from training_utils import PeakMemoryMonitor
+    callbacks.append(PeakMemoryMonitor())
+    
+    initial_epoch = 0
+    if checkpoint_every > 0 or resume:
+        from training_utils import ResumableCheckpoint
+        resumable = ResumableCheckpoint(
+            checkpoint_dir,
+            train_data,
+            stateful_callbacks=callbacks,
+            every_epochs=max(checkpoint_every, 1),
+            keep=keep_checkpoints,
+            extra_state={'gradient_accumulation': accumulation} if accumulation else None
+        )
+        callbacks.append(resumable)
+        if resume:
+            resumable.set_model(model)
+            initial_epoch = resumable.restore()
+            if initial_epoch >= epochs:
+                print(f"Checkpoint already reached epoch {initial_epoch}/{epochs}; nothing to train")
+                return model, class_names, None
+    
+    if profile_log or trace_steps:
+        from training_utils import TimedSequence, TrainingProfiler
+        train_data = TimedSequence(train_data)
+        callbacks.append(TrainingProfiler(
+            train_data,
+            log_path=profile_log or 'training_profile.jsonl',
+            trace_steps=trace_steps,
+            trace_dir=trace_dir
+        ))
+    
     # Train
     print("\nStarting training...")
     history = model.fit(
-        train_gen,
+        train_data,
         epochs=epochs,
+        initial_epoch=initial_epoch,
         validation_data=val_gen,
         callbacks=callbacks,
         verbose=1
@@ -216,12 +443,208 @@ def train_model(dataset_dir, epochs=DEFAULT_EPOCHS, batch_size=DEFAULT_BATCH_SIZ
     print(f"Final validation accuracy: {val_acc:.2%}")
     print(f"Final validation top-3 accuracy: {val_top3:.2%}")
     
+    if init_from:
+        old_acc = subset_accuracy(model, dataset_dir, old_val_entries, class_names, batch_size)
+        if old_acc is None:
+            print("⚠️  No old-class validation images; cannot check for regression")
+        else:
+            change = old_acc - baseline_old_acc
+            status = "⚠️ " if -change > REGRESSION_WARNING else "✓"
+            print(f"{status} Old-class validation accuracy: {baseline_old_acc:.2%} -> {old_acc:.2%} "
+                  f"({change * 100:+.1f} pts)")
+            if -change > REGRESSION_WARNING:
+                print("   Increase --replay-per-class or retrain from scratch without --init-from")
+    
     # Plot training history
-    plot_training_history(history)
+    if plot:
+        plot_training_history(history)
     
     return model, class_names, history
 
-def convert_to_tflite(model, quantize=True, output_file='model.tflite'):
+def compress_model(model, dataset_dir, batch_size=DEFAULT_BATCH_SIZE, prune=True, cluster=False,
+                   target_sparsity=0.5, num_clusters=16, epochs=3, classes=None):
+    """
+    Fine-tune the trained model with magnitude pruning and/or weight clustering
+    
+    Only the Dense(256) head and the trainable top of the MobileNetV2 backbone
+    are wrapped; the frozen backbone and the final classifier are left as is.
+    The returned model has the wrappers stripped and can be passed straight
+    to convert_to_tflite().
+    
+    Returns:
+        (model, compressed) - compressed is False, and the model unchanged, when
+        tensorflow-model-optimization is not installed
+    
+    Args:
+        model: Trained Keras model from train_model()
+        dataset_dir: Dataset used for the fine-tuning passes
+        prune: Apply polynomial-decay magnitude pruning up to target_sparsity
+        cluster: Apply k-means++ weight clustering (sparsity-preserving if prune)
+        target_sparsity: Final fraction of zeroed weights in pruned layers
+        num_clusters: Number of shared weight values per clustered layer
+        epochs: Fine-tuning epochs per compression pass
+        classes: Class order the model was trained with (default: manifest order)
+    """
+    import tensorflow as tf
+    from tensorflow.keras import layers
+    
+    try:
+        import tensorflow_model_optimization as tfmot
+    except ImportError:
+        print("⚠️  tensorflow-model-optimization not installed. Skipping compression.")
+        print("   Install: pip install tensorflow-model-optimization")
+        return model, False
+    
+    train_gen, val_gen = create_data_generators(dataset_dir, batch_size, classes=classes)
+    classifier = model.layers[-1]
+    
+    def clone_with(wrap):
+        def clone_layer(layer):
+            if isinstance(layer, tf.keras.Model):
+                return tf.keras.models.clone_model(layer, clone_function=clone_layer)
+            if layer is not classifier and layer.trainable and isinstance(
+                    layer, (layers.Dense, layers.Conv2D, layers.DepthwiseConv2D)):
+                return wrap(layer)
+            return layer
+        return tf.keras.models.clone_model(model, clone_function=clone_layer)
+    
+    def fine_tune(compressed, extra_callbacks):
+        compressed.compile(
+            optimizer=tf.keras.optimizers.Adam(learning_rate=0.00001),
+            loss='categorical_crossentropy',
+            metrics=['accuracy']
+        )
+        compressed.fit(
+            train_gen,
+            epochs=epochs,
+            validation_data=val_gen,
+            callbacks=extra_callbacks,
+            verbose=1
+        )
+    
+    if prune:
+        print(f"\nPruning to {target_sparsity:.0%} sparsity over {epochs} epochs...")
+        end_step = max(1, len(train_gen) * epochs)
+        schedule = tfmot.sparsity.keras.PolynomialDecay(
+            initial_sparsity=0.0,
+            final_sparsity=target_sparsity,
+            begin_step=0,
+            end_step=end_step
+        )
+        model = clone_with(lambda layer: tfmot.sparsity.keras.prune_low_magnitude(
+            layer, pruning_schedule=schedule))
+        fine_tune(model, [tfmot.sparsity.keras.UpdatePruningStep()])
+        model = tfmot.sparsity.keras.strip_pruning(model)
+        classifier = model.layers[-1]
+    
+    if cluster:
+        print(f"\nClustering weights into {num_clusters} centroids over {epochs} epochs...")
+        clustering = tfmot.clustering.keras
+        cluster_params = {
+            'number_of_clusters': num_clusters,
+            'cluster_centroids_init': clustering.CentroidInitialization.KMEANS_PLUS_PLUS
+        }
+        if prune:
+            # Keep the zeros introduced by pruning instead of clustering them away
+            model = clone_with(lambda layer: clustering.experimental.cluster_weights(
+                layer, preserve_sparsity=True, **cluster_params))
+        else:
+            model = clone_with(lambda layer: clustering.cluster_weights(layer, **cluster_params))
+        fine_tune(model, [])
+        model = clustering.strip_clustering(model)
+    
+    # Recompile so evaluate() reports the same metrics as the original model
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=0.0001),
+        loss='categorical_crossentropy',
+        metrics=['accuracy', tf.keras.metrics.TopKCategoricalAccuracy(k=3, name='top_3_accuracy')]
+    )
+    return model, True
+
+def benchmark_tflite_model(model_path, runs=50):
+    """
+    Measure average single-image TFLite inference latency in milliseconds
+    """
+    import numpy as np
+    import tensorflow as tf
+    
+    interpreter = tf.lite.Interpreter(model_path=model_path)
+    input_details = interpreter.get_input_details()[0]
+    
+    if input_details['dtype'] == np.uint8:
+        # Raw-input model: benchmark on a typical camera frame
+        shape = (1, 480, 640, 3)
+        interpreter.resize_tensor_input(input_details['index'], shape)
+        sample = np.random.randint(0, 256, size=shape, dtype=np.uint8)
+    else:
+        sample = np.random.rand(*input_details['shape']).astype(input_details['dtype'])
+    interpreter.allocate_tensors()
+    interpreter.set_tensor(input_details['index'], sample)
+    interpreter.invoke()  # Warm-up
+    
+    start_time = time.perf_counter()
+    for _ in range(runs):
+        interpreter.set_tensor(input_details['index'], sample)
+        interpreter.invoke()
+    return (time.perf_counter() - start_time) * 1000 / runs
+
+def report_compression(baseline_path, compressed_path, baseline_acc, compressed_acc):
+    """
+    Print size, download size (gzip), latency and accuracy deltas
+    """
+    def sizes(path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        return len(data) / (1024 * 1024), len(gzip.compress(data)) / (1024 * 1024)
+    
+    base_size, base_gz = sizes(baseline_path)
+    comp_size, comp_gz = sizes(compressed_path)
+    base_ms = benchmark_tflite_model(baseline_path)
+    comp_ms = benchmark_tflite_model(compressed_path)
+    
+    print("\n" + "=" * 70)
+    print("Compression Report".center(70))
+    print("=" * 70)
+    print(f"  {'':16s}{'Baseline':>14s}{'Compressed':>14s}{'Delta':>14s}")
+    print(f"  {'Size (MB)':16s}{base_size:14.2f}{comp_size:14.2f}{comp_size - base_size:+14.2f}")
+    print(f"  {'Gzipped (MB)':16s}{base_gz:14.2f}{comp_gz:14.2f}{comp_gz - base_gz:+14.2f}")
+    print(f"  {'Latency (ms)':16s}{base_ms:14.1f}{comp_ms:14.1f}{comp_ms - base_ms:+14.1f}")
+    print(f"  {'Val accuracy':16s}{baseline_acc:14.2%}{compressed_acc:14.2%}{compressed_acc - baseline_acc:+14.2%}")
+    print("=" * 70)
+
+def build_raw_input_signature(model, top_k=5):
+    """
+    Wrap the model so it takes raw uint8 RGB frames of any resolution
+    
+    Resize and rescale run inside the graph, and the output is the top-k
+    class indices and scores instead of the full softmax vector, so the
+    app does no per-pixel work or sorting in JavaScript. The TFLite output
+    tensors are named 'scores' and 'indices'.
+    """
+    import tensorflow as tf
+    
+    top_k = min(top_k, model.output_shape[-1])
+    image_spec = tf.TensorSpec([1, None, None, 3], tf.uint8, name='image')
+    
+    @tf.function(input_signature=[image_spec])
+    def serve(image):
+        # Nearest-neighbour matches load_img() used by the training generators
+        x = tf.image.resize(tf.cast(image, tf.float32), (DEFAULT_IMG_SIZE, DEFAULT_IMG_SIZE),
+                            method='nearest')
+        probabilities = model(x / 255.0, training=False)
+        scores, indices = tf.math.top_k(probabilities, k=top_k)
+        return {'scores': scores, 'indices': indices}
+    
+    # Outputs of a tf.function reach TFLite as StatefulPartitionedCall:0/1 (the
+    # dict keys only survive in the signature def); named Identity ops in a
+    # wrapped graph keep the names on the tensors themselves
+    def named_outputs(image):
+        return {name: tf.identity(tensor, name=name) for name, tensor in serve(image).items()}
+    
+    return tf.compat.v1.wrap_function(named_outputs, [image_spec])
+
+def convert_to_tflite(model, quantize=True, output_file='model.tflite', sparsity=False,
+                      raw_input=False, top_k=5):
     """
     Convert Keras model to TFLite format
     
@@ -229,13 +652,29 @@ def convert_to_tflite(model, quantize=True, output_file='model.tflite'):
         model: Trained Keras model
         quantize: Apply int8 quantization for smaller size and faster inference
         output_file: Output filename
+        sparsity: Encode pruned weights in a sparse format (use after pruning)
+        raw_input: Export a model taking uint8 frames and returning top-k indices/scores
+        top_k: Number of predictions returned by a raw_input model
     """
+    import tensorflow as tf
+    
     print("\nConverting to TFLite...")
-    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if raw_input:
+        print(f"Baking resize/rescale into the graph (uint8 input, top-{top_k} output)...")
+        converter = tf.lite.TFLiteConverter.from_concrete_functions(
+            [build_raw_input_signature(model, top_k)], model)
+    else:
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
     
+    optimizations = []
     if quantize:
         print("Applying dynamic range quantization (int8)...")
-        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        optimizations.append(tf.lite.Optimize.DEFAULT)
+    if sparsity:
+        print("Applying sparse weight encoding...")
+        optimizations.append(tf.lite.Optimize.EXPERIMENTAL_SPARSITY)
+    if optimizations:
+        converter.optimizations = optimizations
     
     tflite_model = converter.convert()
     
@@ -248,125 +687,358 @@ def convert_to_tflite(model, quantize=True, output_file='model.tflite'):
     
     return output_file
 
-def test_tflite_model(model_path, test_image_path, labels_path='labels.txt'):
+def read_top_predictions(interpreter, top_k=5):
     """
-    Test the TFLite model on a single image
+    Return (indices, scores) of the best predictions for either export format
+    
+    Standard models output the full softmax vector, which is sorted here;
+    raw-input models already output top-k indices and scores.
     """
-    print(f"\nTesting model on: {test_image_path}")
+    import numpy as np
     
-    # Load TFLite model
-    interpreter = tf.lite.Interpreter(model_path=model_path)
-    interpreter.allocate_tensors()
+    output_details = interpreter.get_output_details()
+    
+    if len(output_details) == 1:
+        predictions = interpreter.get_tensor(output_details[0]['index'])[0]
+        top_indices = np.argsort(predictions)[-top_k:][::-1]
+        return top_indices, predictions[top_indices]
+    
+    for detail in output_details:
+        if np.issubdtype(detail['dtype'], np.integer):
+            top_indices = interpreter.get_tensor(detail['index'])[0]
+        else:
+            top_scores = interpreter.get_tensor(detail['index'])[0]
+    return top_indices[:top_k], top_scores[:top_k]
+
+def run_tflite_on_image(interpreter, image_path, top_k=5):
+    """
+    Preprocess one image for the interpreter's input format and run it
+    Returns (top_indices, top_scores, inference_ms)
+    """
+    import numpy as np
+    import tensorflow as tf
     
     input_details = interpreter.get_input_details()
-    output_details = interpreter.get_output_details()
     
     # Load and preprocess image
-    img = tf.keras.preprocessing.image.load_img(
-        test_image_path,
-        target_size=(DEFAULT_IMG_SIZE, DEFAULT_IMG_SIZE)
-    )
-    img_array = tf.keras.preprocessing.image.img_to_array(img)
-    img_array = np.expand_dims(img_array, 0) / 255.0
+    if input_details[0]['dtype'] == np.uint8:
+        # Raw-input model: resize/rescale happen inside the graph
+        img = tf.keras.preprocessing.image.load_img(image_path)
+        img_array = np.expand_dims(np.asarray(img, dtype=np.uint8), 0)
+        interpreter.resize_tensor_input(input_details[0]['index'], img_array.shape)
+        interpreter.allocate_tensors()
+    else:
+        img = tf.keras.preprocessing.image.load_img(
+            image_path,
+            target_size=(DEFAULT_IMG_SIZE, DEFAULT_IMG_SIZE)
+        )
+        img_array = tf.keras.preprocessing.image.img_to_array(img)
+        img_array = (np.expand_dims(img_array, 0) / 255.0).astype(np.float32)
     
     # Run inference
-    import time
     start_time = time.time()
-    interpreter.set_tensor(input_details[0]['index'], img_array.astype(np.float32))
+    interpreter.set_tensor(input_details[0]['index'], img_array)
     interpreter.invoke()
     inference_time = (time.time() - start_time) * 1000
     
-    # Get predictions
-    predictions = interpreter.get_tensor(output_details[0]['index'])[0]
+    top_indices, top_scores = read_top_predictions(interpreter, top_k=top_k)
+    return top_indices, top_scores, inference_time
+
+def classify_with_cache(interpreter, image_path, cache=None, top_k=5):
+    """
+    Run one image through the interpreter, consulting the prediction cache
+    Returns (top_indices, top_scores, inference_ms or None when cached)
+    """
+    if cache is None:
+        return run_tflite_on_image(interpreter, image_path, top_k)
+    
+    with open(image_path, 'rb') as f:
+        image_bytes = f.read()
+    cached = cache.get(image_bytes, width=top_k)
+    if cached is not None:
+        return cached[0][:top_k], cached[1][:top_k], None
+    
+    top_indices, top_scores, inference_time = run_tflite_on_image(interpreter, image_path, top_k)
+    cache.put(image_bytes, (top_indices, top_scores), inference_time, width=top_k)
+    return top_indices, top_scores, inference_time
+
+def test_tflite_model(model_path, test_image_path, labels_path='labels.txt', cache=None):
+    """
+    Test the TFLite model on a single image
+    """
+    import tensorflow as tf
+    
+    print(f"\nTesting model on: {test_image_path}")
+    
+    # Load TFLite model
+    interpreter = tf.lite.Interpreter(model_path=model_path)
+    interpreter.allocate_tensors()
+    
+    top_indices, top_scores, inference_time = classify_with_cache(interpreter, test_image_path, cache)
     
     # Load labels
     with open(labels_path, 'r', encoding='utf-8') as f:
         labels = [line.strip() for line in f]
     
-    # Top 5 predictions
-    top_indices = np.argsort(predictions)[-5:][::-1]
+    if inference_time is None:
+        print("Inference time: cached")
+    else:
+        print(f"Inference time: {inference_time:.1f}ms")
+    print(f"\nTop {len(top_indices)} predictions:")
+    for idx, score in zip(top_indices, top_scores):
+        print(f"  {labels[idx]}: {score:.2%}")
+    
+    return top_indices, top_scores
+
+def evaluate_tflite_model(model_path, dataset_dir, labels_path='labels.txt', cache=None, split=None):
+    """
+    Measure top-1/top-3 accuracy of a TFLite model over a dataset/<class>/ tree
+    Classes not present in labels.txt are skipped
+    
+    split: Only evaluate images in this split of the dataset's split manifest
+    """
+    import tensorflow as tf
+    
+    with open(labels_path, 'r', encoding='utf-8') as f:
+        label_index = {line.strip(): idx for idx, line in enumerate(f)}
+    
+    if split:
+        manifest = load_split_manifest(dataset_dir)
+        if manifest is None:
+            print(f"❌ No split manifest in {dataset_dir}; run the split command first")
+            return None
+        entries = split_entries(manifest, split)
+    else:
+        report = scan_dataset_tree(dataset_dir)
+        entries = [(f"{class_name}/{filename}", class_name)
+                   for class_name, info in report['classes'].items()
+                   for filename, _, _ in info['images']]
     
-    print(f"Inference time: {inference_time:.1f}ms")
-    print("\nTop 5 predictions:")
-    for idx in top_indices:
-        print(f"  {labels[idx]}: {predictions[idx]:.2%}")
+    interpreter = tf.lite.Interpreter(model_path=model_path)
+    interpreter.allocate_tensors()
+    
+    total = top1 = top3 = 0
+    skipped = set()
+    start_time = time.perf_counter()
+    for relpath, class_name in entries:
+        if class_name not in label_index:
+            if class_name not in skipped:
+                print(f"  ⚠️  Skipping {class_name}: not in {labels_path}")
+                skipped.add(class_name)
+            continue
+        expected = label_index[class_name]
+        image_path = os.path.join(dataset_dir, *relpath.split('/'))
+        top_indices, _, _ = classify_with_cache(interpreter, image_path, cache)
+        total += 1
+        top1 += int(top_indices[0] == expected)
+        top3 += int(expected in list(top_indices[:3]))
+    elapsed = time.perf_counter() - start_time
+    
+    if not total:
+        print("❌ No labelled images to evaluate")
+        return None
     
-    return predictions
+    print(f"\nEvaluated {total} images in {elapsed:.1f}s ({total / elapsed:.1f} images/sec)")
+    print(f"  Top-1 accuracy: {top1 / total:.2%}")
+    print(f"  Top-3 accuracy: {top3 / total:.2%}")
+    if cache is not None:
+        cache.print_metrics()
+    return top1 / total
 
-def scan_dataset(dataset_dir):
+def scan_dataset(dataset_dir, use_cache=True):
     """
     Scan dataset and show statistics
+    Returns the dataset_scanner report
     """
     print(f"Scanning dataset in '{dataset_dir}'...")
     
-    total_images = 0
-    min_images = float('inf')
-    max_images = 0
-    class_counts = []
-    
-    for food_dir in sorted(os.listdir(dataset_dir)):
-        food_path = os.path.join(dataset_dir, food_dir)
-        if os.path.isdir(food_path):
-            image_count = len([f for f in os.listdir(food_path) 
-                             if f.lower().endswith(('.jpg', '.jpeg', '.png'))])
-            total_images += image_count
-            min_images = min(min_images, image_count)
-            max_images = max(max_images, image_count)
-            class_counts.append((food_dir, image_count))
-            
-            status = "✓" if image_count >= 20 else "⚠️"
-            print(f"  {status} {food_dir}: {image_count} images")
+    report = scan_dataset_tree(dataset_dir, use_cache=use_cache)
+    print_report(report)
+    
+    counts = [info['count'] for info in report['classes'].values()]
+    if not counts:
+        print("\n⚠️  No class folders found!")
+        return report
+    
+    total_images = report['total_images']
+    min_images = min(counts)
+    max_images = max(counts)
     
     print(f"\nDataset statistics:")
-    print(f"  Total classes: {len(class_counts)}")
+    print(f"  Total classes: {len(counts)}")
     print(f"  Total images: {total_images}")
-    print(f"  Images per class: {min_images}-{max_images} (avg: {total_images/len(class_counts):.1f})")
+    print(f"  Images per class: {min_images}-{max_images} (avg: {total_images/len(counts):.1f})")
+    if report['total_corrupt']:
+        print(f"  ❌ Corrupt or truncated images: {report['total_corrupt']} (remove before training)")
     
     # Warn about imbalanced dataset
     if max_images > min_images * 2:
         print(f"\n⚠️  Warning: Dataset is imbalanced!")
         print(f"  Some classes have 2x more images than others.")
-        print(f"  Consider balancing by adding more images to smaller classes.")
+        print(f"  Add images to smaller classes, or train with --balance uniform (or sqrt)")
+        print(f"  to rebalance while sampling instead of copying files.")
+    
+    return report
 
-def main():
-    parser = argparse.ArgumentParser(description='Train Uzbek food recognition model')
-    parser.add_argument('--dataset', type=str, default='dataset', 
-                       help='Path to dataset directory')
-    parser.add_argument('--epochs', type=int, default=DEFAULT_EPOCHS,
-                       help='Number of training epochs')
-    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
-                       help='Batch size for training')
-    parser.add_argument('--trainable-layers', type=int, default=20,
-                       help='Number of top layers to fine-tune')
+def print_banner(title):
+    print("=" * 70)
+    print(title.center(70))
+    print("=" * 70)
+
+def find_test_image(report):
+    """
+    Return the first valid image from a scan report, or None
+    """
+    for name, info in report['classes'].items():
+        if info['images']:
+            return os.path.join(report['dataset_dir'], name, info['images'][0][0])
+    return None
+
+def measure_startup(args_list, runs=3):
+    """
+    Best-of-N wall time in seconds for running this script in a fresh interpreter
+    """
+    best = float('inf')
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        subprocess.run([sys.executable, os.path.abspath(__file__)] + args_list,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        best = min(best, time.perf_counter() - start_time)
+    return best
+
+def check_lazy_imports():
+    """
+    Import this module in a fresh interpreter and list heavy modules it pulled in
+    """
+    heavy = ['tensorflow', 'keras', 'numpy', 'matplotlib']
+    code = (
+        "import sys; sys.path.insert(0, {dir!r}); import {module}; "
+        "print(','.join(m for m in {heavy!r} if m in sys.modules))"
+    ).format(
+        dir=os.path.dirname(os.path.abspath(__file__)),
+        module=os.path.splitext(os.path.basename(__file__))[0],
+        heavy=heavy
+    )
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return [m for m in result.stdout.strip().split(',') if m]
+
+def parse_step_range(value):
+    try:
+        first, last = (int(part) for part in value.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected FIRST:LAST, got '{value}'")
+    if first < 0 or last < first:
+        raise argparse.ArgumentTypeError(f"invalid step range '{value}'")
+    return first, last
+
+def add_conversion_arguments(parser):
     parser.add_argument('--quantize', action='store_true', default=True,
                        help='Apply quantization to TFLite model')
-    parser.add_argument('--test-image', type=str, default=None,
-                       help='Test image path for inference demo')
+    parser.add_argument('--no-quantize', dest='quantize', action='store_false',
+                       help='Export a float32 TFLite model')
+    parser.add_argument('--raw-input', action='store_true',
+                       help='Export a TFLite model taking raw uint8 frames with in-graph resize/rescale')
+    parser.add_argument('--top-k', type=int, default=5,
+                       help='Predictions returned by a --raw-input model')
+
+def add_split_arguments(parser):
+    parser.add_argument('--val-fraction', type=float, default=None,
+                       help=f'Validation fraction for a new split manifest (default: {DEFAULT_VALIDATION_SPLIT})')
+    parser.add_argument('--test-fraction', type=float, default=None,
+                       help='Held-out test fraction for a new split manifest (default: 0)')
+
+def command_scan(args):
+    if not os.path.exists(args.dataset):
+        print(f"❌ ERROR: Dataset directory '{args.dataset}' not found!")
+        return 1
+    scan_dataset(args.dataset, use_cache=not args.no_cache)
+    return 0
+
+def command_split(args):
+    if not os.path.exists(args.dataset):
+        print(f"❌ ERROR: Dataset directory '{args.dataset}' not found!")
+        return 1
+    manifest, changes = update_split_manifest(args.dataset, args.val_fraction, args.test_fraction)
+    print_split_summary(manifest, changes)
+    return 0
+
+def command_audit(args):
+    if not os.path.exists(args.dataset):
+        print(f"❌ ERROR: Dataset directory '{args.dataset}' not found!")
+        return 1
     
-    args = parser.parse_args()
+    from dataset_audit import audit_dataset, print_audit
+    print_banner("Dataset Audit")
+    report = audit_dataset(args.dataset, k=args.neighbours, min_share=args.min_share,
+                           dup_threshold=args.dup_threshold, batch_size=args.batch_size,
+                           use_cache=not args.no_cache)
+    print_audit(report)
     
-    print("=" * 70)
-    print("Uzbek Food Recognition Model Training".center(70))
-    print("=" * 70)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nReport saved to {args.output}")
+    return 0
+
+def command_train(args):
+    print_banner("Uzbek Food Recognition Model Training")
     
     # Check if dataset exists
     if not os.path.exists(args.dataset):
         print(f"\n❌ ERROR: Dataset directory '{args.dataset}' not found!")
         print("Please create the dataset structure as shown in TRAINING_GUIDE.md")
-        return
+        return 1
     
     # Scan dataset
-    scan_dataset(args.dataset)
+    report = scan_dataset(args.dataset)
     
-    print("\n" + "=" * 70)
-    print("Training Configuration".center(70))
-    print("=" * 70)
+    # Refresh the split manifest: new images are assigned, existing ones stay put
+    print()
+    manifest, changes = update_split_manifest(args.dataset, args.val_fraction, args.test_fraction)
+    print_split_summary(manifest, changes)
+    
+    if args.init_from:
+        for path in (args.init_from, args.init_labels):
+            if not os.path.exists(path):
+                print(f"\n❌ ERROR: '{path}' not found (needed by --init-from)")
+                return 1
+        old_classes = read_labels(args.init_labels)
+        new_classes = [name for name in manifest['classes'] if name not in old_classes]
+        if not new_classes:
+            print(f"\n❌ ERROR: No classes in '{args.dataset}' beyond the {len(old_classes)} in {args.init_labels}")
+            print("Add folders for the new foods, or train without --init-from")
+            return 1
+        missing = [name for name in old_classes if name not in manifest['classes']]
+        if missing:
+            print(f"\n⚠️  {len(missing)} old classes have no images and are kept without replay: {', '.join(missing)}")
+    if args.accum_steps < 1:
+        print("\n❌ ERROR: --accum-steps must be at least 1")
+        return 1
+    if args.epochs is None:
+        args.epochs = DEFAULT_INCREMENTAL_EPOCHS if args.init_from else DEFAULT_EPOCHS
+    
+    print()
+    print_banner("Training Configuration")
     print(f"  Dataset: {args.dataset}")
     print(f"  Epochs: {args.epochs}")
     print(f"  Batch size: {args.batch_size}")
+    if args.balance:
+        print(f"  Class balancing: {args.balance}"
+              f"{f' ({args.epoch_size} images per epoch)' if args.epoch_size else ''}")
+    if args.accum_steps > 1:
+        print(f"  Gradient accumulation: {args.accum_steps} steps "
+              f"(effective batch size {args.batch_size * args.accum_steps})")
     print(f"  Trainable layers: {args.trainable_layers}")
+    if args.init_from:
+        print(f"  Warm start: {args.init_from} (+{len(new_classes)} classes, "
+              f"{args.replay_per_class} replay images per old class)")
+    print(f"  Checkpoints: {args.checkpoint_dir if args.checkpoint_every > 0 else 'Disabled'}"
+          f"{' (resuming)' if args.resume else ''}")
     print(f"  Image size: {DEFAULT_IMG_SIZE}x{DEFAULT_IMG_SIZE}")
     print(f"  Quantization: {'Enabled' if args.quantize else 'Disabled'}")
+    print(f"  TFLite input: {f'raw uint8 frames, top-{args.top_k} output' if args.raw_input else 'float32 224x224'}")
+    if args.prune or args.cluster:
+        print(f"  Pruning: {f'{args.target_sparsity:.0%} sparsity' if args.prune else 'Disabled'}")
+        print(f"  Clustering: {f'{args.clusters} clusters' if args.cluster else 'Disabled'}")
     print("=" * 70)
     
     # Train model
@@ -374,37 +1046,75 @@ def main():
         args.dataset, 
         epochs=args.epochs,
         batch_size=args.batch_size,
-        trainable_layers=args.trainable_layers
+        trainable_layers=args.trainable_layers,
+        plot=not args.no_plot,
+        profile_log=args.profile_log,
+        trace_steps=args.profile_steps,
+        trace_dir=args.profile_dir,
+        checkpoint_dir=args.checkpoint_dir,
+        checkpoint_every=args.checkpoint_every,
+        keep_checkpoints=args.keep_checkpoints,
+        resume=args.resume,
+        init_from=args.init_from,
+        init_labels=args.init_labels,
+        replay_per_class=args.replay_per_class,
+        accum_steps=args.accum_steps,
+        balance=args.balance,
+        epoch_size=args.epoch_size,
+        balance_cache_mb=args.balance_cache_mb
     )
     
+    if history is None:
+        print("\nRaise --epochs to continue training, or export the saved model with:")
+        print("  python train_uzbek_food_model.py convert --model best_model.h5")
+        return 0
+    
     # Convert to TFLite
-    tflite_path = convert_to_tflite(model, quantize=args.quantize)
+    if args.prune or args.cluster:
+        _, val_gen = create_data_generators(args.dataset, args.batch_size, manifest=manifest,
+                                            classes=class_names)
+        baseline_acc = model.evaluate(val_gen, verbose=0)[1]
+        baseline_path = convert_to_tflite(model, quantize=args.quantize,
+                                          output_file='model_uncompressed.tflite',
+                                          raw_input=args.raw_input, top_k=args.top_k)
+        model, compressed = compress_model(
+            model, args.dataset,
+            batch_size=args.batch_size,
+            prune=args.prune,
+            cluster=args.cluster,
+            target_sparsity=args.target_sparsity,
+            num_clusters=args.clusters,
+            epochs=args.compress_epochs,
+            classes=class_names
+        )
+        if compressed:
+            compressed_acc = model.evaluate(val_gen, verbose=0)[1]
+            tflite_path = convert_to_tflite(model, quantize=args.quantize, sparsity=args.prune,
+                                            raw_input=args.raw_input, top_k=args.top_k)
+            report_compression(baseline_path, tflite_path, baseline_acc, compressed_acc)
+        else:
+            # Nothing was pruned or clustered: export the model as is, without a compression report
+            tflite_path = 'model.tflite'
+            os.replace(baseline_path, tflite_path)
+            print(f"TFLite model moved to {tflite_path} (uncompressed)")
+    else:
+        tflite_path = convert_to_tflite(model, quantize=args.quantize,
+                                        raw_input=args.raw_input, top_k=args.top_k)
     
     # Test on sample image
-    test_image = args.test_image
-    if not test_image:
-        # Find first image in dataset
-        for food_dir in os.listdir(args.dataset):
-            food_path = os.path.join(args.dataset, food_dir)
-            if os.path.isdir(food_path):
-                images = [f for f in os.listdir(food_path) 
-                         if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-                if images:
-                    test_image = os.path.join(food_path, images[0])
-                    break
-    
+    test_image = args.test_image or find_test_image(report)
     if test_image and os.path.exists(test_image):
         test_tflite_model(tflite_path, test_image)
     
-    print("\n" + "=" * 70)
-    print("Training Complete!".center(70))
-    print("=" * 70)
+    print()
+    print_banner("Training Complete!")
     print(f"\nGenerated files:")
     print(f"  ✓ best_model.h5 - Keras model (for further training)")
     print(f"  ✓ model.tflite - TFLite model (for mobile deployment)")
     print(f"  ✓ labels.txt - Class names (one per line)")
     print(f"  ✓ class_mapping.json - Class name to index mapping")
-    print(f"  ✓ training_history.png - Training metrics plot")
+    if not args.no_plot:
+        print(f"  ✓ training_history.png - Training metrics plot")
     
     print(f"\nNext steps:")
     print(f"  1. Review training_history.png to check for overfitting")
@@ -415,6 +1125,213 @@ def main():
     print(f"  4. See TFLITE_SETUP.md for integration instructions")
     print(f"  5. Rebuild app: npx expo run:android / npx expo run:ios")
     print("=" * 70)
+    return 0
+
+def command_convert(args):
+    if not os.path.exists(args.model):
+        print(f"❌ ERROR: Keras model '{args.model}' not found!")
+        return 1
+    
+    import tensorflow as tf
+    model = tf.keras.models.load_model(args.model)
+    convert_to_tflite(model, quantize=args.quantize, output_file=args.output,
+                      raw_input=args.raw_input, top_k=args.top_k)
+    return 0
+
+def command_test(args):
+    for path in (args.model, args.image or args.dataset, args.labels):
+        if not os.path.exists(path):
+            print(f"❌ ERROR: '{path}' not found!")
+            return 1
+    
+    cache = None
+    if args.cache_dir:
+        from prediction_cache import PredictionCache
+        cache = PredictionCache(model_path=args.model, max_bytes=args.cache_mb * 1024 * 1024,
+                                disk_dir=args.cache_dir)
+    
+    if args.image:
+        test_tflite_model(args.model, args.image, labels_path=args.labels, cache=cache)
+    else:
+        evaluate_tflite_model(args.model, args.dataset, labels_path=args.labels, cache=cache,
+                              split=args.split)
+    return 0
+
+def command_benchmark(args):
+    print_banner("Benchmark")
+    failed = False
+    
+    # Startup regression check: non-training commands must not load TensorFlow
+    heavy = check_lazy_imports()
+    if heavy:
+        print(f"  ❌ Module import pulled in: {', '.join(heavy)}")
+        failed = True
+    else:
+        print(f"  ✓ Module import loads no heavy dependencies")
+    
+    help_time = measure_startup(['--help'])
+    status = "✓" if help_time <= args.startup_budget else "❌"
+    print(f"  {status} --help startup: {help_time * 1000:.0f}ms (budget: {args.startup_budget * 1000:.0f}ms)")
+    failed = failed or help_time > args.startup_budget
+    
+    if args.dataset and os.path.exists(args.dataset):
+        scan_time = measure_startup(['scan', '--dataset', args.dataset])
+        print(f"  • scan {args.dataset}: {scan_time * 1000:.0f}ms")
+    
+    if args.model:
+        if not os.path.exists(args.model):
+            print(f"  ❌ TFLite model '{args.model}' not found!")
+            return 1
+        latency = benchmark_tflite_model(args.model, runs=args.runs)
+        print(f"  • TFLite inference: {latency:.1f}ms/image (avg of {args.runs} runs)")
+    
+    print("=" * 70)
+    return 1 if failed else 0
+
+COMMANDS = ('scan', 'split', 'audit', 'train', 'convert', 'test', 'benchmark')
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Train Uzbek food recognition model')
+    subparsers = parser.add_subparsers(dest='command', metavar='{' + ','.join(COMMANDS) + '}')
+    
+    scan = subparsers.add_parser('scan', help='Show dataset statistics')
+    scan.add_argument('--dataset', type=str, default='dataset',
+                      help='Path to dataset directory')
+    scan.add_argument('--no-cache', action='store_true',
+                      help='Rescan every class folder instead of using the scan cache')
+    scan.set_defaults(handler=command_scan)
+    
+    split = subparsers.add_parser('split', help='Create or refresh the train/validation/test split manifest')
+    split.add_argument('--dataset', type=str, default='dataset',
+                       help='Path to dataset directory')
+    add_split_arguments(split)
+    split.set_defaults(handler=command_split)
+    
+    audit = subparsers.add_parser('audit', help='Flag likely mislabeled images and cross-class near-duplicates')
+    audit.add_argument('--dataset', type=str, default='dataset',
+                       help='Path to dataset directory')
+    audit.add_argument('--output', type=str, default='audit_report.json',
+                       help='Write the full report to this JSON file')
+    audit.add_argument('--neighbours', type=int, default=10,
+                       help='Nearest neighbours checked per image')
+    audit.add_argument('--min-share', type=float, default=0.6,
+                       help='Flag an image when at least this share of neighbours is one other class')
+    audit.add_argument('--dup-threshold', type=float, default=0.97,
+                       help='Cosine similarity for cross-class near-duplicates')
+    audit.add_argument('--batch-size', type=int, default=64,
+                       help='Embedding batch size')
+    audit.add_argument('--no-cache', action='store_true',
+                       help='Recompute all embeddings')
+    audit.set_defaults(handler=command_audit)
+    
+    train = subparsers.add_parser('train', help='Train, convert and test a model (default)')
+    train.add_argument('--dataset', type=str, default='dataset', 
+                       help='Path to dataset directory')
+    train.add_argument('--epochs', type=int, default=None,
+                       help=f'Number of training epochs (default: {DEFAULT_EPOCHS}, '
+                            f'{DEFAULT_INCREMENTAL_EPOCHS} with --init-from)')
+    train.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                       help='Batch size for training')
+    train.add_argument('--accum-steps', type=int, default=1,
+                       help='Accumulate gradients over N batches (effective batch size N x --batch-size)')
+    train.add_argument('--balance', type=str, default=None,
+                       help="Rebalance classes while sampling: 'uniform', 'sqrt' or a JSON file of class weights")
+    train.add_argument('--epoch-size', type=int, default=None,
+                       help='Images per epoch with --balance (default: number of training images)')
+    train.add_argument('--balance-cache-mb', type=int, default=256,
+                       help='Memory for decoded images of oversampled classes with --balance')
+    train.add_argument('--trainable-layers', type=int, default=20,
+                       help='Number of top layers to fine-tune')
+    add_split_arguments(train)
+    train.add_argument('--resume', action='store_true',
+                       help='Continue from the latest checkpoint in --checkpoint-dir')
+    train.add_argument('--checkpoint-dir', type=str, default='checkpoints',
+                       help='Directory for full-state training checkpoints')
+    train.add_argument('--checkpoint-every', type=int, default=1,
+                       help='Save a full-state checkpoint every N epochs (0 = disabled)')
+    train.add_argument('--keep-checkpoints', type=int, default=3,
+                       help='Number of most recent checkpoints to keep')
+    train.add_argument('--init-from', type=str, default=None,
+                       help='Warm-start from this Keras model and only add the new classes')
+    train.add_argument('--init-labels', type=str, default='labels.txt',
+                       help='labels.txt the --init-from model was trained with')
+    train.add_argument('--replay-per-class', type=int, default=DEFAULT_REPLAY_PER_CLASS,
+                       help='Training images per old class mixed in with --init-from')
+    train.add_argument('--test-image', type=str, default=None,
+                       help='Test image path for inference demo')
+    train.add_argument('--no-plot', action='store_true',
+                       help='Skip training_history.png (matplotlib is not loaded)')
+    train.add_argument('--profile-log', type=str, default=None,
+                       help='Log per-step timing, data-wait, CPU and memory to this JSONL file')
+    train.add_argument('--profile-steps', type=parse_step_range, default=None,
+                       help='Capture a TensorFlow profiler trace for global steps FIRST:LAST')
+    train.add_argument('--profile-dir', type=str, default='profile_trace',
+                       help='Output directory for --profile-steps traces')
+    add_conversion_arguments(train)
+    train.add_argument('--prune', action='store_true',
+                       help='Fine-tune with magnitude pruning before TFLite conversion')
+    train.add_argument('--cluster', action='store_true',
+                       help='Fine-tune with weight clustering before TFLite conversion')
+    train.add_argument('--target-sparsity', type=float, default=0.5,
+                       help='Final sparsity for --prune')
+    train.add_argument('--clusters', type=int, default=16,
+                       help='Number of weight clusters for --cluster')
+    train.add_argument('--compress-epochs', type=int, default=3,
+                       help='Fine-tuning epochs per compression pass')
+    train.set_defaults(handler=command_train)
+    
+    convert = subparsers.add_parser('convert', help='Convert a saved Keras model to TFLite')
+    convert.add_argument('--model', type=str, default='best_model.h5',
+                         help='Keras model to convert')
+    convert.add_argument('--output', type=str, default='model.tflite',
+                         help='Output TFLite file')
+    add_conversion_arguments(convert)
+    convert.set_defaults(handler=command_convert)
+    
+    test = subparsers.add_parser('test', help='Run a TFLite model on one image or a whole dataset')
+    test.add_argument('--model', type=str, default='model.tflite',
+                      help='TFLite model to test')
+    test_input = test.add_mutually_exclusive_group(required=True)
+    test_input.add_argument('--image', type=str,
+                            help='Image to classify')
+    test_input.add_argument('--dataset', type=str,
+                            help='Evaluate accuracy over a dataset/<class>/ tree')
+    test.add_argument('--labels', type=str, default='labels.txt',
+                      help='Labels file (one class per line)')
+    test.add_argument('--split', choices=SPLITS, default=None,
+                      help='With --dataset, only evaluate this split from the split manifest')
+    test.add_argument('--cache-dir', type=str, default=None,
+                      help='Cache predictions on disk here, keyed by image content and model checksum')
+    test.add_argument('--cache-mb', type=int, default=64,
+                      help='In-memory prediction cache size in MB')
+    test.set_defaults(handler=command_test)
+    
+    benchmark = subparsers.add_parser('benchmark', help='Check CLI startup time and TFLite latency')
+    benchmark.add_argument('--model', type=str, default=None,
+                           help='TFLite model to benchmark')
+    benchmark.add_argument('--runs', type=int, default=50,
+                           help='Inference runs to average')
+    benchmark.add_argument('--dataset', type=str, default=None,
+                           help='Also time the scan command on this dataset')
+    benchmark.add_argument('--startup-budget', type=float, default=0.5,
+                           help='Maximum allowed --help startup time in seconds')
+    benchmark.set_defaults(handler=command_benchmark)
+    
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    
+    # Keep the pre-subcommand usage working: no command means `train`
+    if not argv or (argv[0] not in COMMANDS and argv[0] not in ('-h', '--help')):
+        argv = ['train'] + argv
+    
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 1
+    return args.handler(args)
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,648 @@
+#!/usr/bin/env python3
+"""
+Training helpers for train_uzbek_food_model.py
+
+Imports TensorFlow at module load, so the training script only imports this
+module from inside the commands that actually train.
+"""
+import os
+import json
+import math
+import time
+import random
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import tensorflow as tf
+
+
+def read_process_stats() -> Tuple[float, float]:
+    """
+    Return (cpu_seconds, rss_mb) for the current process
+    Uses psutil when installed, otherwise /proc or getrusage
+    """
+    try:
+        import psutil
+        process = psutil.Process()
+        cpu = process.cpu_times()
+        return cpu.user + cpu.system, process.memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+
+    times = os.times()
+    cpu_seconds = times.user + times.system
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            rss_pages = int(f.read().split()[1])
+        return cpu_seconds, rss_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        # ru_maxrss is the peak (KB on Linux, bytes on macOS), the best we can do here
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return cpu_seconds, peak / (1024 * 1024 if os.uname().sysname == 'Darwin' else 1024)
+
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's RSS high-water mark for this process (Linux 4.0+)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def read_peak_rss_mb() -> Optional[float]:
+    """Peak RSS since process start or the last reset_peak_rss() (VmHWM), None if unavailable"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class TimedSequence(tf.keras.utils.Sequence):
+    """
+    Wrap a Keras Sequence and record when each batch becomes ready
+
+    Keras prefetches batches in order, so the k-th ready batch is the one the
+    k-th training step consumes. TrainingProfiler compares its ready time with
+    the step start to tell data-wait from compute.
+    """
+
+    def __init__(self, sequence):
+        super().__init__()
+        self.sequence = sequence
+        self.ready = deque()
+
+    def __len__(self):
+        return len(self.sequence)
+
+    def __getitem__(self, index):
+        start_time = time.perf_counter()
+        batch = self.sequence[index]
+        end_time = time.perf_counter()
+        self.ready.append((end_time, end_time - start_time, len(batch[0])))
+        return batch
+
+    def on_epoch_end(self):
+        self.sequence.on_epoch_end()
+
+    def __getattr__(self, name):
+        # samples, class_indices, batch_size... come from the wrapped iterator
+        return getattr(self.sequence, name)
+
+
+BALANCE_MODES = ('uniform', 'sqrt')
+
+
+def balance_weights(mode: str, counts: Dict[str, int]) -> Dict[str, float]:
+    """
+    Per-class sampling weights for BalancedSequence
+
+    mode is 'uniform' (every class equally often), 'sqrt' (proportional to the
+    square root of the class size, a softer correction) or the path of a JSON
+    file {class: weight}; classes missing from the file get weight 1.
+    """
+    if mode == 'uniform':
+        return {name: 1.0 for name in counts}
+    if mode == 'sqrt':
+        return {name: math.sqrt(count) for name, count in counts.items()}
+    with open(mode, 'r', encoding='utf-8') as f:
+        ratios = json.load(f)
+    unknown = set(ratios) - set(counts)
+    if unknown:
+        raise ValueError(f"{mode} has weights for unknown classes: {', '.join(sorted(unknown))}")
+    return {name: float(ratios.get(name, 1.0)) for name in counts}
+
+
+def class_quotas(weights: List[float], epoch_size: int) -> List[int]:
+    """Split epoch_size draws between classes in proportion to weights (largest remainder)"""
+    total = sum(weights)
+    shares = [epoch_size * weight / total for weight in weights]
+    quotas = [int(share) for share in shares]
+    by_remainder = sorted(range(len(shares)), key=lambda i: shares[i] - quotas[i], reverse=True)
+    for i in by_remainder[:epoch_size - sum(quotas)]:
+        quotas[i] += 1
+    return quotas
+
+
+class BalancedSequence(tf.keras.utils.Sequence):
+    """
+    Class-balanced batches drawn from a Keras DataFrameIterator
+
+    Every class is an endless stream of its own images, reshuffled each time
+    it is exhausted. Each epoch draws a per-class quota from the streams in
+    proportion to the class weights and interleaves them evenly, so every
+    batch has roughly the target mix. Large classes continue where they left
+    off in the next epoch instead of restarting. Small classes repeat within
+    an epoch.
+
+    Images come from the iterator's files and are augmented with its
+    ImageDataGenerator, so nothing is copied on disk. Images of classes drawn
+    more often than they have images are decoded once and kept (as uint8, up
+    to cache_mb) so repeats only pay for augmentation.
+
+    get_state()/set_state() expose the stream order and positions, which
+    ResumableCheckpoint saves so a resumed run continues each stream.
+    """
+
+    def __init__(self, iterator, weights: Dict[str, float], epoch_size: Optional[int] = None,
+                 cache_mb: int = 256):
+        super().__init__()
+        import numpy as np
+        self.iterator = iterator
+        self.batch_size = iterator.batch_size
+        self.epoch_size = epoch_size or iterator.samples
+        self.class_names = list(iterator.class_indices)
+        class_weights = [weights.get(name, 0.0) for name in self.class_names]
+
+        classes = np.asarray(iterator.classes)
+        self.streams = [np.flatnonzero(classes == index) for index in range(len(self.class_names))]
+        present = [i for i, stream in enumerate(self.streams) if len(stream) and class_weights[i] > 0]
+        if not present:
+            raise ValueError("No training images in classes with a positive weight")
+        quotas = class_quotas([class_weights[i] for i in present], self.epoch_size)
+        self.quotas = [0] * len(self.class_names)
+        for i, quota in zip(present, quotas):
+            self.quotas[i] = quota
+
+        self.positions = [0] * len(self.streams)
+        for stream in self.streams:
+            np.random.shuffle(stream)
+        self.cache = {}
+        self.cache_bytes = 0
+        self.cache_limit = cache_mb * 1024 * 1024
+        self.cacheable = {i for i, quota in enumerate(self.quotas) if quota > len(self.streams[i])}
+        self.decodes = 0
+        self.cache_hits = 0
+        self._build_order()
+
+    def _draw(self, class_index: int, count: int):
+        import numpy as np
+        stream = self.streams[class_index]
+        drawn = []
+        while len(drawn) < count:
+            if self.positions[class_index] == len(stream):
+                np.random.shuffle(stream)
+                self.positions[class_index] = 0
+            take = min(count - len(drawn), len(stream) - self.positions[class_index])
+            drawn.extend(stream[self.positions[class_index]:self.positions[class_index] + take])
+            self.positions[class_index] += take
+        return drawn
+
+    def _build_order(self):
+        """Interleave each class's draws at evenly spaced, randomly offset positions"""
+        import numpy as np
+        slots = []
+        for class_index, quota in enumerate(self.quotas):
+            if quota:
+                offset = np.random.random()
+                draws = self._draw(class_index, quota)
+                slots.extend(((k + offset) / quota, sample) for k, sample in enumerate(draws))
+        slots.sort(key=lambda slot: slot[0])
+        self.order = [sample for _, sample in slots]
+
+    def __len__(self):
+        return math.ceil(self.epoch_size / self.batch_size)
+
+    def _load(self, sample: int):
+        image = self.cache.get(sample)
+        if image is not None:
+            self.cache_hits += 1
+            return image
+        iterator = self.iterator
+        image = tf.keras.utils.img_to_array(
+            tf.keras.utils.load_img(iterator.filepaths[sample], color_mode=iterator.color_mode,
+                                    target_size=iterator.target_size,
+                                    interpolation=iterator.interpolation),
+            dtype='uint8')
+        self.decodes += 1
+        if self.iterator.classes[sample] in self.cacheable and self.cache_bytes + image.nbytes <= self.cache_limit:
+            self.cache[sample] = image
+            self.cache_bytes += image.nbytes
+        return image
+
+    def __getitem__(self, index):
+        import numpy as np
+        samples = self.order[index * self.batch_size:(index + 1) * self.batch_size]
+        generator = self.iterator.image_data_generator
+        batch_x = np.zeros((len(samples),) + self.iterator.image_shape, dtype=self.iterator.dtype)
+        batch_y = np.zeros((len(samples), len(self.class_names)), dtype=self.iterator.dtype)
+        for i, sample in enumerate(samples):
+            x = self._load(sample).astype(self.iterator.dtype)
+            x = generator.apply_transform(x, generator.get_random_transform(x.shape))
+            batch_x[i] = generator.standardize(x)
+            batch_y[i, self.iterator.classes[sample]] = 1
+        return batch_x, batch_y
+
+    def get_state(self) -> Dict:
+        """JSON-serializable stream order and positions"""
+        return {
+            'streams': [[int(sample) for sample in stream] for stream in self.streams],
+            'positions': list(self.positions),
+        }
+
+    def set_state(self, state: Dict):
+        """Restore get_state(); takes effect from the next _build_order()"""
+        import numpy as np
+        if [sorted(stream) for stream in state['streams']] != [sorted(stream) for stream in self.streams]:
+            raise ValueError("Balanced sampler state does not match the training images")
+        self.streams = [np.asarray(stream, dtype=self.streams[i].dtype) for i, stream in enumerate(state['streams'])]
+        self.positions = list(state['positions'])
+        self.decodes = 0
+        self.cache_hits = 0
+
+    def on_epoch_end(self):
+        if self.decodes:
+            print(f"\nBalanced sampler: {self.decodes} images decoded, {self.cache_hits} repeats from cache "
+                  f"({self.cache_bytes / (1024 * 1024):.0f} MB)")
+        self.decodes = 0
+        self.cache_hits = 0
+        self._build_order()
+
+    @property
+    def samples(self):
+        return self.epoch_size
+
+    @property
+    def class_indices(self):
+        return self.iterator.class_indices
+
+    def print_summary(self):
+        print(f"\nClass-balanced sampling: {self.epoch_size} draws per epoch in {len(self)} batches")
+        for name, stream, quota in zip(self.class_names, self.streams, self.quotas):
+            if not len(stream):
+                continue
+            ratio = quota / len(stream)
+            status = "⚠️ " if ratio > 5 else "✓"
+            print(f"  {status} {name}: {len(stream)} images -> {quota} draws/epoch ({ratio:.1f}x)")
+        unique = sum(min(quota, len(stream)) for stream, quota in zip(self.streams, self.quotas))
+        print(f"Effective epoch: {self.epoch_size} samples, {unique} distinct images (of {self.iterator.samples})")
+        if self.cacheable:
+            print(f"Repeated images of {len(self.cacheable)} small classes are decoded once "
+                  f"(cache up to {self.cache_limit // (1024 * 1024)} MB)")
+
+
+class TrainingProfiler(tf.keras.callbacks.Callback):
+    """
+    Log per-step timing and resource usage to a JSONL file
+
+    Each step record has step_ms, data_wait_ms (time the step waited for its
+    batch), compute_ms, load_ms (time spent producing the batch), images/sec,
+    CPU and RSS. Each epoch record summarises them and sets input_bound when
+    more than input_bound_threshold of step time was spent waiting for data.
+    Optionally captures a TensorFlow profiler trace for steps in trace_steps.
+    """
+
+    def __init__(self, timed_sequence: TimedSequence, log_path: str = 'training_profile.jsonl',
+                 input_bound_threshold: float = 0.2, trace_steps: Optional[Tuple[int, int]] = None,
+                 trace_dir: str = 'profile_trace'):
+        super().__init__()
+        self.timed_sequence = timed_sequence
+        self.log_path = log_path
+        self.input_bound_threshold = input_bound_threshold
+        self.trace_steps = trace_steps
+        self.trace_dir = trace_dir
+        self.global_step = 0
+        self.tracing = False
+        self.log_file = None
+
+    def _write(self, record):
+        self.log_file.write(json.dumps(record) + '\n')
+
+    def on_train_begin(self, logs=None):
+        self.log_file = open(self.log_path, 'a', encoding='utf-8')
+        self.cpu_count = os.cpu_count() or 1
+        # fit() reads one batch to learn the input shapes before training starts;
+        # drop its timestamp so the k-th ready batch lines up with the k-th step
+        self.timed_sequence.ready.clear()
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch = epoch
+        self.epoch_start = time.perf_counter()
+        self.epoch_cpu_start, _ = read_process_stats()
+        self.totals = {'step_ms': 0.0, 'data_wait_ms': 0.0, 'load_ms': 0.0, 'images': 0, 'steps': 0}
+        self.peak_rss_mb = 0.0
+
+    def on_train_batch_begin(self, batch, logs=None):
+        if self.trace_steps and self.global_step == self.trace_steps[0] and not self.tracing:
+            tf.profiler.experimental.start(self.trace_dir)
+            self.tracing = True
+        self.step_start = time.perf_counter()
+        self.step_cpu_start, _ = read_process_stats()
+
+    def on_train_batch_end(self, batch, logs=None):
+        end_time = time.perf_counter()
+        cpu_seconds, rss_mb = read_process_stats()
+        step_seconds = end_time - self.step_start
+
+        if self.timed_sequence.ready:
+            ready_time, load_seconds, images = self.timed_sequence.ready.popleft()
+        else:
+            ready_time, load_seconds, images = self.step_start, 0.0, 0
+        wait_seconds = min(max(0.0, ready_time - self.step_start), step_seconds)
+
+        record = {
+            'type': 'step',
+            'epoch': self.epoch,
+            'step': batch,
+            'global_step': self.global_step,
+            'step_ms': step_seconds * 1000,
+            'data_wait_ms': wait_seconds * 1000,
+            'compute_ms': (step_seconds - wait_seconds) * 1000,
+            'load_ms': load_seconds * 1000,
+            'images': images,
+            'images_per_sec': images / step_seconds if step_seconds > 0 else 0.0,
+            'cpu_percent': 100 * (cpu_seconds - self.step_cpu_start) / step_seconds if step_seconds > 0 else 0.0,
+            'rss_mb': rss_mb,
+        }
+        self._write(record)
+
+        self.totals['step_ms'] += record['step_ms']
+        self.totals['data_wait_ms'] += record['data_wait_ms']
+        self.totals['load_ms'] += record['load_ms']
+        self.totals['images'] += images
+        self.totals['steps'] += 1
+        self.peak_rss_mb = max(self.peak_rss_mb, rss_mb)
+
+        if self.tracing and self.global_step >= self.trace_steps[1]:
+            tf.profiler.experimental.stop()
+            self.tracing = False
+            print(f"\nProfiler trace saved to {self.trace_dir} (view with TensorBoard)")
+        self.global_step += 1
+
+    def on_epoch_end(self, epoch, logs=None):
+        wall_seconds = time.perf_counter() - self.epoch_start
+        cpu_seconds, _ = read_process_stats()
+        step_ms = max(self.totals['step_ms'], 1e-9)
+        wait_fraction = self.totals['data_wait_ms'] / step_ms
+        input_bound = wait_fraction > self.input_bound_threshold
+
+        self._write({
+            'type': 'epoch',
+            'epoch': epoch,
+            'steps': self.totals['steps'],
+            'wall_s': wall_seconds,
+            'train_s': step_ms / 1000,
+            'data_wait_fraction': wait_fraction,
+            'mean_load_ms': self.totals['load_ms'] / max(self.totals['steps'], 1),
+            'images_per_sec': self.totals['images'] / (step_ms / 1000),
+            'cpu_percent': 100 * (cpu_seconds - self.epoch_cpu_start) / wall_seconds,
+            'cpu_count': self.cpu_count,
+            'peak_rss_mb': self.peak_rss_mb,
+            'input_bound': input_bound,
+        })
+        self.log_file.flush()
+
+        if input_bound:
+            print(f"\n⚠️  Input-bound: {wait_fraction:.0%} of step time spent waiting for data "
+                  f"(mean batch load {self.totals['load_ms'] / max(self.totals['steps'], 1):.0f}ms)")
+            print("   Consider more loader workers, smaller source images or caching decoded data.")
+
+    def on_train_end(self, logs=None):
+        if self.tracing:
+            tf.profiler.experimental.stop()
+            self.tracing = False
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+        print(f"Training profile saved to {self.log_path}")
+
+
+class PeakMemoryMonitor(tf.keras.callbacks.Callback):
+    """
+    Report the peak RSS of each epoch and add it to the logs as peak_rss_mb
+
+    Uses the kernel high-water mark, reset at the start of every epoch, so
+    short allocation spikes between batches are counted. Where that is not
+    available it falls back to sampling RSS after every batch.
+    """
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.kernel_peak = reset_peak_rss()
+        self.sampled_peak_mb = read_process_stats()[1]
+
+    def on_train_batch_end(self, batch, logs=None):
+        if not self.kernel_peak:
+            self.sampled_peak_mb = max(self.sampled_peak_mb, read_process_stats()[1])
+
+    def on_epoch_end(self, epoch, logs=None):
+        peak_mb = read_peak_rss_mb() if self.kernel_peak else None
+        if peak_mb is None:
+            peak_mb = self.sampled_peak_mb
+        if logs is not None:
+            logs['peak_rss_mb'] = peak_mb
+        print(f"Epoch {epoch + 1} peak RSS: {peak_mb:.0f} MB")
+
+
+# Attributes that Keras callbacks reset in on_train_begin and that we carry across a resume
+CALLBACK_STATE_ATTRS = {
+    'ModelCheckpoint': ('best',),
+    'EarlyStopping': ('wait', 'best', 'stopped_epoch'),
+    'ReduceLROnPlateau': ('wait', 'best', 'cooldown_counter'),
+}
+
+
+class ResumableCheckpoint(tf.keras.callbacks.Callback):
+    """
+    Periodically save the full training state and resume from it
+
+    A tf.train checkpoint holds the model weights, optimizer slots, learning
+    rate and epoch counter, plus any extra_state trackables (e.g. the
+    gradient accumulators from enable_gradient_accumulation()); it is
+    written asynchronously where TensorFlow supports it. A JSON sidecar next
+    to it holds the state of the other callbacks (ReduceLROnPlateau,
+    EarlyStopping, ModelCheckpoint), the NumPy RNG that drives augmentation
+    and the iterator's shuffling, and the Python RNG Keras uses to order a
+    Sequence's batches. Both are captured before the end-of-epoch reshuffle,
+    which restore() replays, so a resumed run draws the same batches as an
+    uninterrupted one. If train_iterator has get_state()/set_state() (e.g.
+    BalancedSequence), its state is saved too. Only the last `keep`
+    checkpoints are retained.
+
+    Resuming continues at the start of the epoch after the last checkpoint;
+    work done in a partially completed epoch is repeated. EarlyStopping's
+    best weights are not saved, so after a resume it can only restore weights
+    from the resumed part of the run.
+
+    Add this callback after the callbacks whose state it restores.
+    """
+
+    def __init__(self, checkpoint_dir: str, train_iterator, stateful_callbacks=(),
+                 every_epochs: int = 1, keep: int = 3, extra_state: Optional[Dict] = None):
+        super().__init__()
+        self.checkpoint_dir = checkpoint_dir
+        self.train_iterator = train_iterator
+        self.stateful_callbacks = [c for c in stateful_callbacks
+                                   if type(c).__name__ in CALLBACK_STATE_ATTRS]
+        self.every_epochs = every_epochs
+        self.keep = keep
+        self.epoch = tf.Variable(0, dtype=tf.int64, trainable=False, name='epoch')
+        self.extra_state = extra_state or {}
+        self.checkpoint = None
+        self.pending_state = None
+
+    def set_model(self, model):
+        super().set_model(model)
+        if self.checkpoint is None:
+            self.checkpoint = tf.train.Checkpoint(model=model, optimizer=model.optimizer, epoch=self.epoch,
+                                                  **self.extra_state)
+            self.manager = tf.train.CheckpointManager(self.checkpoint, self.checkpoint_dir,
+                                                      max_to_keep=self.keep)
+            # manager.checkpoints lags behind async saves, so track the kept paths here
+            self.kept_paths = deque(self.manager.checkpoints, maxlen=self.keep)
+            try:
+                self.options = tf.train.CheckpointOptions(experimental_enable_async_checkpoint=True)
+            except TypeError:
+                self.options = None  # TensorFlow < 2.11: synchronous saves
+
+    def _sidecar_path(self, checkpoint_path):
+        return checkpoint_path + '.state.json'
+
+    def restore(self) -> int:
+        """
+        Restore the latest checkpoint; returns the epoch to resume from (0 if none)
+        Call after model.compile() and before model.fit().
+        """
+        latest = self.manager.latest_checkpoint
+        if not latest:
+            print(f"No checkpoint found in {self.checkpoint_dir}, starting from epoch 0")
+            return 0
+
+        self.checkpoint.restore(latest)
+        with open(self._sidecar_path(latest), 'r', encoding='utf-8') as f:
+            self.pending_state = json.load(f)
+
+        epoch = int(self.epoch.numpy())
+        print(f"Resuming from {latest} at epoch {epoch}")
+        return epoch
+
+    def on_train_begin(self, logs=None):
+        if not self.pending_state:
+            return
+        # RNG state is restored here rather than in restore(): fit() draws a first
+        # (augmented) batch to inspect its shape before calling on_train_begin
+        import numpy as np
+        rng = self.pending_state['numpy_rng']
+        np.random.set_state((rng[0], np.array(rng[1], dtype=np.uint32), rng[2], rng[3], rng[4]))
+        python_rng = self.pending_state.get('python_rng')
+        if python_rng:
+            random.setstate((python_rng[0], tuple(python_rng[1]), python_rng[2]))
+        self.train_iterator.total_batches_seen = self.pending_state.get('total_batches_seen', 0)
+        if 'iterator' in self.pending_state and hasattr(self.train_iterator, 'set_state'):
+            self.train_iterator.set_state(self.pending_state['iterator'])
+        # The checkpoint was written before the iterator reshuffled for the next
+        # epoch; reshuffle from the restored RNG as the interrupted run did
+        self.train_iterator.on_epoch_end()
+
+        # Other callbacks reset their counters in on_train_begin; put them back
+        for callback in self.stateful_callbacks:
+            saved = self.pending_state['callbacks'].get(type(callback).__name__)
+            if saved:
+                for attr, value in saved.items():
+                    setattr(callback, attr, value)
+        self.pending_state = None
+
+    def on_epoch_end(self, epoch, logs=None):
+        if (epoch + 1) % self.every_epochs != 0:
+            return
+
+        import numpy as np
+        self.epoch.assign(epoch + 1)
+        path = self.manager.save(checkpoint_number=epoch + 1, options=self.options)
+
+        rng = np.random.get_state()
+        python_rng = random.getstate()
+        state = {
+            'epoch': epoch + 1,
+            'callbacks': {
+                type(callback).__name__: {attr: float(getattr(callback, attr))
+                                          for attr in CALLBACK_STATE_ATTRS[type(callback).__name__]}
+                for callback in self.stateful_callbacks
+            },
+            'numpy_rng': [rng[0], rng[1].tolist(), int(rng[2]), int(rng[3]), float(rng[4])],
+            'python_rng': [python_rng[0], list(python_rng[1]), python_rng[2]],
+            'total_batches_seen': int(getattr(self.train_iterator, 'total_batches_seen', 0)),
+        }
+        if hasattr(self.train_iterator, 'get_state'):
+            state['iterator'] = self.train_iterator.get_state()
+        # An async save may not have created the directory yet
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        tmp_path = self._sidecar_path(path) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._sidecar_path(path))
+
+        # Drop sidecars whose checkpoints the manager has rotated out
+        self.kept_paths.append(path)
+        kept = {os.path.abspath(self._sidecar_path(p)) for p in self.kept_paths}
+        for name in os.listdir(self.checkpoint_dir):
+            full_path = os.path.abspath(os.path.join(self.checkpoint_dir, name))
+            if name.endswith('.state.json') and full_path not in kept:
+                os.remove(full_path)
+
+    def on_train_end(self, logs=None):
+        # Wait for in-flight async writes before the process can exit
+        sync = getattr(self.checkpoint, 'sync', None)
+        if sync:
+            sync()
+
+
+def enable_gradient_accumulation(model: tf.keras.Model, accum_steps: int):
+    """
+    Make model.fit() update the weights once every accum_steps batches
+
+    Gradients of each batch are averaged into accumulators and applied
+    together, so the effective batch size is batch_size * accum_steps while
+    peak memory stays that of a single batch (plus one copy of the trainable
+    weights). BatchNorm statistics are still computed per batch. A partial
+    group at the end of an epoch carries over into the next one.
+
+    The training step is replaced on this model instance rather than through
+    a Model subclass, so best_model.h5 and checkpoints stay plain Sequential
+    models that load without custom objects. Call after model.compile().
+
+    Returns the accumulator state as a tf.train.Checkpoint (None if
+    accum_steps <= 1); pass it to ResumableCheckpoint's extra_state so a
+    resumed run continues the partial group it stopped in.
+    """
+    if accum_steps <= 1:
+        return None
+
+    variables = model.trainable_variables
+    optimizer = model.optimizer
+    # Slot variables cannot be created inside the tf.cond branch below
+    if hasattr(optimizer, 'build'):
+        optimizer.build(variables)
+    else:
+        optimizer._create_all_weights(variables)
+
+    accumulators = [tf.Variable(tf.zeros_like(variable), trainable=False) for variable in variables]
+    pending = tf.Variable(0, dtype=tf.int64, trainable=False)
+
+    def apply_accumulated():
+        optimizer.apply_gradients(zip([accumulator.read_value() for accumulator in accumulators], variables))
+        for accumulator in accumulators:
+            accumulator.assign(tf.zeros_like(accumulator))
+        return tf.constant(True)
+
+    def train_step(data):
+        x, y, sample_weight = tf.keras.utils.unpack_x_y_sample_weight(data)
+        with tf.GradientTape() as tape:
+            y_pred = model(x, training=True)
+            loss = model.compute_loss(x, y, y_pred, sample_weight)
+        gradients = tape.gradient(loss, variables)
+        for accumulator, gradient in zip(accumulators, gradients):
+            if gradient is not None:
+                accumulator.assign_add(tf.convert_to_tensor(gradient) / accum_steps)
+        pending.assign_add(1)
+        tf.cond(pending % accum_steps == 0, apply_accumulated, lambda: tf.constant(False))
+        return model.compute_metrics(x, y, y_pred, sample_weight)
+
+    model.train_step = train_step
+    model.train_function = None
+    return tf.train.Checkpoint(accumulators=accumulators, pending=pending)